@@ -6,8 +6,14 @@ import io
 import logging
 from langchain.llms import OpenAI
 import os
+import sys
 from urllib.parse import urlparse, urljoin
 
+# El script se lanza desde backup/: el paquete compartido está en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from webscraper_gpt.coincidencias import BuscadorPalabras, palabras_de_consulta
+from webscraper_gpt.fragmentos import SelectorFragmentos, fragmentar
+
 # Configuración de OpenAI
 openai_api_key = os.getenv("OPENAI_API_KEY")
 llm = OpenAI(temperature=0, api_key=openai_api_key)
@@ -41,6 +47,9 @@ uploaded_file = st.file_uploader("Sube tu archivo Excel", type=["xlsx"])
 selected_column = st.text_input("Nombre de la columna de links", "WEBSITE")
 consulta_input = st.text_area("Describe lo que quieres encontrar", "Necesito encontrar información referente a: denuncia, denuncias, canal de denuncias, canal ético, compliance, Channel, ethics, complaint, canaldenuncias, canaletico, etico, ético, código de conducta, code of conduct, whistleblower channel, Reporting channel, Whistleblowing channel, canal de ética, ética, Complaints Channel, Sistema Interno de Información, Canal del informante, Canal de información, Canal de comunicación interno, General conditions of sale, buen gobierno")
 
+# Solo los fragmentos con más palabras clave llegan al LLM
+selector = SelectorFragmentos(BuscadorPalabras(palabras_de_consulta(consulta_input)), mejores=3)
+
 headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
 
 def make_request(url):
@@ -52,18 +61,11 @@ def make_request(url):
         logging.error(f"Error al acceder a {url}: {e}")
         return None
 
-def dividir_en_fragmentos(texto, max_tokens=1000):
-    """Divide el texto en fragmentos pequeños que no excedan el límite de tokens."""
-    fragmentos = []
-    tokens = texto.split()
-    while tokens:
-        fragmentos.append(" ".join(tokens[:max_tokens]))
-        tokens = tokens[max_tokens:]
-    return fragmentos
-
 def buscar_con_ia(texto, consulta, enlaces, url):
-    # Dividir el texto en fragmentos más pequeños
-    fragmentos = dividir_en_fragmentos(texto, max_tokens=700)
+    # Dividir el texto en fragmentos por tokens y quedarse con los más relevantes
+    fragmentos = selector.seleccionar(fragmentar(texto, max_tokens=700, solape=70), consulta)
+    if not fragmentos:
+        return "❌ No se encontró información relevante.", "No se encontró información relevante relacionada con la consulta", []
     
     respuestas = []
     enlaces_relevantes = []
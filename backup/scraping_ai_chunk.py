@@ -1,16 +1,31 @@
 import streamlit as st
-import requests
 from bs4 import BeautifulSoup
 from openpyxl import load_workbook
 import io
 import logging
-from langchain.llms import OpenAI
 from langchain.prompts import PromptTemplate
 import os
-
-# Configuración de OpenAI
+import sys
+
+# El script se lanza desde backup/: el paquete compartido está en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from webscraper_gpt.cache_llm import CacheLLM, LLMConCache, LLMStub
+from webscraper_gpt.coincidencias import BuscadorPalabras, palabras_de_consulta
+from webscraper_gpt.descargas import MotorDescargas
+from webscraper_gpt.despachador import ConfiguracionDespachador, DespachadorLLM
+from webscraper_gpt.embeddings import CacheEmbeddings, EmbeddingsConCache, EmbeddingsHash
+from webscraper_gpt.fragmentos import SelectorFragmentos, fragmentar
+from webscraper_gpt.resumen import ConfiguracionResumen, ResumidorMapReduce
+
+# Configuración de OpenAI (respuestas cacheadas; WEBSCRAPER_GPT_REPETICION=1 repite solo desde la caché)
 openai_api_key = os.getenv("OPENAI_API_KEY")
-llm = OpenAI(temperature=0, api_key=openai_api_key)
+modelo_openai = "gpt-3.5-turbo-instruct"
+if os.getenv("WEBSCRAPER_GPT_REPETICION") == "1":
+    llm = LLMConCache(LLMStub(), CacheLLM(), solo_cache=True, modelo=modelo_openai, temperatura=0)
+else:
+    # Peticiones concurrentes: los fragmentos de una página se resumen en paralelo
+    despachador = DespachadorLLM(ConfiguracionDespachador(modelo=modelo_openai, api_key=openai_api_key))
+    llm = LLMConCache(despachador, CacheLLM(), modelo=modelo_openai, temperatura=0)
 
 # Estilos personalizados
 st.markdown(
@@ -41,44 +56,26 @@ uploaded_file = st.file_uploader("Sube tu archivo Excel", type=["xlsx"])
 selected_column = st.text_input("Nombre de la columna de links", "WEBSITE")
 consulta_input = st.text_area("Describe lo que quieres encontrar", "Necesito encontrar información referente a: denuncia, denuncias, canal de denuncias, canal ético, compliance, Channel, ethics, complaint, canaldenuncias, canaletico, etico, ético, código de conducta, code of conduct, whistleblower channel, Reporting channel, Whistleblowing channel, canal de ética, ética, Complaints Channel, Sistema Interno de Información, Canal del informante, Canal de información, Canal de comunicación interno, General conditions of sale, buen gobierno")
 
-headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+# Solo los fragmentos con más palabras clave y más parecidos a la consulta llegan al LLM
+selector = SelectorFragmentos(
+    BuscadorPalabras(palabras_de_consulta(consulta_input)),
+    EmbeddingsConCache(EmbeddingsHash(), CacheEmbeddings()),
+    mejores=3,
+)
+resumidor = ResumidorMapReduce(llm, ConfiguracionResumen(tam_fragmento=1500, max_fragmentos=3, max_tokens_fila=8000))
+
+# Descargas con reintentos ante 429/503 y cortesía por dominio (ver PlanificadorHosts)
+motor = MotorDescargas()
 
 def make_request(url):
-    try:
-        response = requests.get(url, headers=headers, timeout=10, verify=False)
-        response.raise_for_status()
-        return response
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error al acceder a {url}: {e}")
-        return None
-
-def dividir_en_fragmentos(texto, max_tokens=1500):
-    """Divide el texto en fragmentos pequeños que no excedan el límite de tokens."""
-    fragmentos = []
-    tokens = texto.split()
-    while tokens:
-        fragmentos.append(" ".join(tokens[:max_tokens]))
-        tokens = tokens[max_tokens:]
-    return fragmentos
+    return motor.descargar_filas({url: [url]})[url]
 
 def buscar_con_ia(texto, consulta, url):
-    # Dividir el texto en fragmentos pequeños
-    fragmentos = dividir_en_fragmentos(texto)
-    
-    respuestas = []
-    for fragmento in fragmentos:
-        prompt = f"""
-            Lee el siguiente contenido: "{fragmento}". La consulta es: "{consulta}".
-            1. Si el contenido menciona o responde a la consulta, resume la información más relevante en un máximo de 1000 caracteres.
-            2. Si es relevante, proporciona enlaces útiles relacionados con la consulta, incluyendo el enlace proporcionado: {url}.
-            3. Si no se encuentra información relevante, indica: "No se encontró información relevante relacionada con la consulta".
-        """
-        
-        # Limitar la longitud de la respuesta a 100 tokens
-        respuesta = llm(prompt, max_tokens=100)
-        respuestas.append(respuesta.strip())
+    # Dividir el texto en fragmentos por tokens y quedarse con los más relevantes
+    fragmentos = selector.seleccionar(fragmentar(texto, max_tokens=1500, solape=150), consulta)
     
-    return " ".join(respuestas)
+    # Los fragmentos se resumen en paralelo y una última llamada da el veredicto y el resumen de la página
+    return resumidor.resumir(fragmentos, consulta, url).resumen
 
 def verificar_url(url):
     if not url.startswith("http://") and not url.startswith("https://"):
@@ -118,7 +115,7 @@ if st.button("Ejecutar búsqueda") and uploaded_file and selected_column and con
             response = make_request(url_https) or make_request(url_http) if url_http else None
 
             if response:
-                soup = BeautifulSoup(response.content, "html.parser")
+                soup = BeautifulSoup(response.contenido, "html.parser")
                 text = soup.get_text()
                 resultado = buscar_con_ia(text, consulta_input, url_https)
                 sheet.cell(row=row, column=result_col_index, value=resultado)
@@ -132,6 +129,9 @@ if st.button("Ejecutar búsqueda") and uploaded_file and selected_column and con
         output.seek(0)
 
         st.success("Archivo procesado con éxito.")
+        st.info(selector.resumen())
+        st.info(resumidor.resumen())
+        st.info(llm.resumen())
         st.download_button(
             label="Descargar archivo procesado",
             data=output,
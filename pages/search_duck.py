@@ -1,30 +1,32 @@
-from duckduckgo_search import DDGS
+from webscraper_gpt.empresas import BusquedaDuckDuckGo, PLANTILLA_CONSULTA, puntuar_resultados
 
-def obtener_sitio_web(empresa):
+def obtener_sitio_web(empresa, max_resultados=8):
     """
     Obtiene el sitio web de una empresa utilizando DuckDuckGo.
 
+    Los resultados se ordenan por su parecido con el sitio oficial: los
+    directorios de empresas y las redes sociales se descartan.
+
     Args:
         empresa (str): Nombre o razón social de la empresa.
+        max_resultados (int): Resultados de DuckDuckGo que se comparan.
 
     Returns:
-        None: Imprime todos los enlaces encontrados en la búsqueda.
+        str: Portada del mejor resultado, o None si no hay ninguno.
     """
-    # Crear una instancia de DDGS
-    ddgs = DDGS()
-
     # Realizar búsqueda de la empresa en DuckDuckGo
-    resultados = ddgs.text(f"sitio oficial {empresa}", max_results=3)
+    resultados = BusquedaDuckDuckGo().buscar(PLANTILLA_CONSULTA.format(empresa=empresa), max_resultados)
+    candidatos = puntuar_resultados(empresa, resultados)
     
     # Verificar si hay resultados
-    if resultados:
+    if candidatos:
         print(f"Resultados para {empresa}:")
-        for i, resultado in enumerate(resultados):
-            print(f"{i+1}. {resultado['href']}")
-    else:
-        print(f"No se encontraron resultados para {empresa}.")
+        for i, (puntuacion, url, _) in enumerate(candidatos):
+            print(f"{i+1}. {url} ({puntuacion:.2f})")
+        return candidatos[0][1]
+    print(f"No se encontraron resultados para {empresa}.")
+    return None
 
 # Ejemplo de uso
 empresa = "ABGAM, S.A."
 obtener_sitio_web(empresa)
-
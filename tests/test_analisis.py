@@ -0,0 +1,38 @@
+"""Pruebas de la extracción de texto y enlaces con cada analizador HTML."""
+import pytest
+
+from webscraper_gpt.analisis import BACKENDS, Documento, extraer_documento
+
+PAGINA = """<!DOCTYPE html>
+<html><head><title>Canal de denuncias</title><style>p { color: red; }</style></head>
+<body><!-- menú --><nav><a href="/inicio">Inicio</a> | <a href="http://[roto">Roto</a></nav>
+<h1>Empresa  S.A.</h1><p>Nuestro can<i>al</i> &eacute;tico<br>y m&aacute;s</p>
+<script>var canal = "denuncias";</script>
+<ul><li><a href="compliance.html">C&oacute;digo <b>de</b>
+conducta</a></li><li>Dos</li></ul><div>fin<span> </span>texto</div></body></html>
+""".encode("utf-8")
+
+ESPERADO = Documento(
+    "Inicio | Roto\nEmpresa S.A.\nNuestro canal ético\ny más\nCódigo de conducta\nDos\nfin texto",
+    [("Inicio", "https://empresa.es/inicio"), ("Código de conducta", "https://empresa.es/legal/compliance.html")],
+)
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_todos_los_analizadores_dan_el_mismo_documento(backend):
+    assert extraer_documento(PAGINA, "https://empresa.es/legal/", "utf-8", backend) == ESPERADO
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_el_titulo_no_es_texto_visible(backend):
+    documento = extraer_documento(b"<html><head><title>Canal de denuncias</title></head><body>Hola</body></html>",
+                                  backend=backend)
+    assert documento.texto == "Hola"
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_un_enlace_mal_formado_no_estropea_la_pagina(backend):
+    contenido = b'<body><p>Canal de denuncias</p><a href="http://[bad">Mal</a> <a href="/etica">Etica</a></body>'
+    documento = extraer_documento(contenido, "https://empresa.es/", backend=backend)
+    assert documento.texto == "Canal de denuncias\nMal Etica"
+    assert documento.enlaces == [("Etica", "https://empresa.es/etica")]
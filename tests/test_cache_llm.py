@@ -0,0 +1,62 @@
+"""Pruebas de la caché del LLM y del modo de repetición."""
+import threading
+
+from webscraper_gpt.cache_llm import CacheLLM, LLMConCache, LLMStub, _escrituras
+
+
+class LLMContador:
+    """LLM falso que responde con el número de llamadas recibidas."""
+
+    model_name = "modelo-real"
+    temperature = 0
+
+    def __init__(self):
+        self.llamadas = 0
+
+    def __call__(self, prompt, max_tokens=None):
+        self.llamadas += 1
+        return f"respuesta {self.llamadas}"
+
+
+def test_repeticion_usa_lo_guardado_por_el_modelo_real(tmp_path):
+    cache = CacheLLM(str(tmp_path / "llm.sqlite"))
+    real = LLMContador()
+    llm = LLMConCache(real, cache)
+    assert llm("¿Es  un canal de denuncias?", max_tokens=5) == "respuesta 1"
+    assert llm("¿Es un canal de denuncias?", max_tokens=5) == "respuesta 1"
+    assert real.llamadas == 1
+
+    repeticion = LLMConCache(LLMStub("no"), cache, solo_cache=True, modelo="modelo-real", temperatura=0)
+    assert repeticion("¿Es un canal de denuncias?", max_tokens=5) == "respuesta 1"
+    assert repeticion.enviar("¿Es un canal de denuncias?", max_tokens=5).result() == "respuesta 1"
+    assert (repeticion.aciertos, repeticion.fallos) == (2, 0)
+
+
+def test_repeticion_no_llama_ni_guarda_los_fallos(tmp_path):
+    cache = CacheLLM(str(tmp_path / "llm.sqlite"))
+    repeticion = LLMConCache(LLMStub("no"), cache, solo_cache=True, modelo="modelo-real", temperatura=0)
+    assert repeticion("Prompt nuevo") == "no"
+    assert repeticion.enviar("Prompt nuevo").result() == "no"
+    assert repeticion.fallos == 2
+    assert cache.consultar("SELECT COUNT(*) FROM respuestas") == [(0,)]
+
+
+def test_poda_las_respuestas_menos_usadas(tmp_path):
+    cache = CacheLLM(str(tmp_path / "llm.sqlite"), max_entradas=3, intervalo_poda=2)
+    for numero in range(6):
+        cache.guardar("modelo", 0, f"prompt {numero}", f"respuesta {numero}")
+    assert cache.consultar("SELECT COUNT(*) FROM respuestas") == [(3,)]
+    assert cache.obtener("modelo", 0, "prompt 0") is None
+    assert cache.obtener("modelo", 0, "prompt 5") == "respuesta 5"
+
+
+def test_enviar_guarda_la_respuesta_fuera_del_hilo_que_la_recibe(tmp_path):
+    cache = CacheLLM(str(tmp_path / "llm.sqlite"))
+    hilos = []
+    guardar = cache.guardar
+    cache.guardar = lambda *args, **kwargs: (hilos.append(threading.current_thread().name), guardar(*args, **kwargs))
+    llm = LLMConCache(LLMContador(), cache)
+    assert llm.enviar("¿Es un canal de denuncias?").result() == "respuesta 1"
+    _escrituras.submit(lambda: None).result()  # Espera a que termine la escritura
+    assert hilos and hilos[0].startswith("cache-llm")
+    assert cache.obtener("modelo-real", 0, "¿Es un canal de denuncias?") == "respuesta 1"
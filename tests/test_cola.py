@@ -0,0 +1,123 @@
+"""Pruebas de la cola de trabajo en SQLite: concesiones, reintentos, reanudación y combinación."""
+import time
+
+from openpyxl import Workbook, load_workbook
+
+from webscraper_gpt.cola import ColaSQLite, Trabajador, _Latido, combinar, repartir
+from webscraper_gpt.procesamiento import Proceso
+
+LOTE = "lote"
+URLS = ["a.es", "b.es", "c.es", "d.es", "e.es"]
+
+
+class ProcesoFalso(Proceso):
+    """Pasa la URL a mayúsculas; las de `fallan` dan un error reintentable las primeras `veces` que se procesan."""
+
+    nombre = "prueba"
+    columnas = ["RESULTADO"]
+
+    def __init__(self, fallan=(), veces=1):
+        super().__init__(motor=None)
+        self.fallos = {url: veces for url in fallan}
+        self.procesadas = []
+
+    def _procesar(self, lector, salida, columna):
+        for fila, valores in lector.filas():
+            if salida.original(fila, valores):
+                continue
+            self.procesadas.append(fila)
+            url = valores[columna]
+            if self.fallos.get(url, 0) > 0:
+                self.fallos[url] -= 1
+                salida.completar(fila, "error de red", reintentar=True)
+            else:
+                salida.completar(fila, url.upper())
+
+
+def _excel(tmp_path):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(["EMPRESA", "WEBSITE"])
+    for numero, url in enumerate(URLS):
+        hoja.append([f"Empresa {numero}", url])
+    ruta = tmp_path / "entrada.xlsx"
+    libro.save(ruta)
+    return ruta
+
+
+def _lote(tmp_path, proceso, max_intentos=3, tam_shard=2):
+    cola = ColaSQLite(tmp_path / "cola.sqlite", max_intentos=max_intentos)
+    origen = _excel(tmp_path)
+    repartir(cola, proceso, origen, LOTE, tam_shard=tam_shard)
+    return cola, origen
+
+
+def test_una_concesion_vencida_la_toma_otro_trabajador(tmp_path):
+    cola, _ = _lote(tmp_path, ProcesoFalso(), tam_shard=10)
+    assert cola.tomar(LOTE, "uno", 0.05)[0] == 0
+    assert cola.tomar(LOTE, "dos", 0.05) is None
+
+    time.sleep(0.1)
+    assert cola.tomar(LOTE, "dos", 60)[0] == 0
+    assert not cola.renovar(LOTE, 0, "uno", 60)
+    assert cola.estado(LOTE)["asignado"] == 1
+
+
+def test_el_latido_mantiene_la_concesion(tmp_path):
+    cola, _ = _lote(tmp_path, ProcesoFalso(), tam_shard=10)
+    cola.tomar(LOTE, "uno", 0.3)
+    latido = _Latido(cola, LOTE, 0, "uno", 0.3)
+    latido.start()
+    try:
+        time.sleep(0.5)
+        assert cola.tomar(LOTE, "dos", 60) is None
+    finally:
+        latido.parar.set()
+        latido.join()
+    assert not latido.perdida
+
+
+def test_un_shard_que_agota_los_intentos_queda_fallido(tmp_path):
+    proceso = ProcesoFalso(fallan={"c.es"}, veces=10)
+    cola, _ = _lote(tmp_path, proceso, max_intentos=2)
+    trabajador = Trabajador(cola, LOTE, proceso, espera=0)
+
+    assert trabajador.ejecutar() == 2
+    assert cola.estado(LOTE) == {"pendiente": 0, "asignado": 0, "hecho": 2, "fallido": 1, "total": 3}
+    # Lo publicado en los intentos del shard fallido se conserva
+    assert cola.resultados(LOTE, [4, 5]) == {5: ("D.ES",)}
+
+
+def test_al_reanudar_solo_se_repiten_las_filas_sin_terminar(tmp_path):
+    proceso = ProcesoFalso(fallan={"c.es"})
+    cola, _ = _lote(tmp_path, proceso)
+
+    assert Trabajador(cola, LOTE, proceso, espera=0).ejecutar() == 3
+    # El shard 1 vuelve a la cola y se retoma antes que el 2, pero solo con la fila que falló
+    assert proceso.procesadas == [2, 3, 4, 5, 4, 6]
+    assert cola.resultados(LOTE) == {fila: (url.upper(),) for fila, url in enumerate(URLS, start=2)}
+
+
+def test_combinar_escribe_las_filas_en_el_orden_de_entrada(tmp_path):
+    proceso = ProcesoFalso()
+    cola, origen = _lote(tmp_path, proceso)
+    trabajador = Trabajador(cola, LOTE, proceso)
+    shards = []
+    while (tarea := cola.tomar(LOTE, "uno", 60)) is not None:
+        shards.append(tarea)
+    # Se publican al revés y sin el shard 1: sus filas quedan sin resultado
+    for shard, filas in reversed(shards):
+        if shard != 1:
+            cola.completar(LOTE, shard, "uno", trabajador.procesar_shard(shard, filas)[0])
+
+    ruta, sin_resultado = combinar(cola, LOTE, origen, str(tmp_path / "salida.xlsx"))
+    assert sin_resultado == 2
+    hoja = load_workbook(ruta).active
+    assert [list(fila) for fila in hoja.iter_rows(values_only=True)] == [
+        ["EMPRESA", "WEBSITE", "RESULTADO"],
+        ["Empresa 0", "a.es", "A.ES"],
+        ["Empresa 1", "b.es", "B.ES"],
+        ["Empresa 2", "c.es", None],
+        ["Empresa 3", "d.es", None],
+        ["Empresa 4", "e.es", "E.ES"],
+    ]
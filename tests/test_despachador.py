@@ -0,0 +1,135 @@
+"""Pruebas del despachador de peticiones al LLM contra un servidor falso local."""
+import json
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from webscraper_gpt.despachador import (
+    ConfiguracionDespachador,
+    DespachadorLLM,
+    ErrorLLM,
+    combinar,
+    encadenar,
+)
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    """API de completions falsa: responde 429 a las primeras `saturadas` peticiones."""
+
+    daemon_threads = True
+
+    def __init__(self, saturadas=0, retry_after="0"):
+        super().__init__(("127.0.0.1", 0), ManejadorFalso)
+        self.saturadas = saturadas
+        self.retry_after = retry_after
+        self.peticiones = []
+        self.cerrojo = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class ManejadorFalso(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, cuerpo, cabeceras=()):
+        datos = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for nombre, valor in cabeceras:
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_POST(self):
+        cuerpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.cerrojo:
+            self.server.peticiones.append(cuerpo)
+            saturado = len(self.server.peticiones) <= self.server.saturadas
+        if saturado:
+            self._responder(429, {"error": "rate limit"}, [("Retry-After", self.server.retry_after)])
+        elif cuerpo["prompt"] == "rechazar":
+            self._responder(400, {"error": "prompt inválido"})
+        else:
+            self._responder(200, {"choices": [{"text": cuerpo["prompt"].upper()}]})
+
+
+@pytest.fixture
+def servidor():
+    def crear(**opciones):
+        servidor = ServidorFalso(**opciones)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        servidores.append(servidor)
+        return servidor
+
+    servidores = []
+    yield crear
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def despachador(servidor, **opciones):
+    opciones = {"espera_base": 0.01, "reintentos": 3, **opciones}
+    return DespachadorLLM(ConfiguracionDespachador(url_base=servidor.url, api_key="prueba", **opciones))
+
+
+def test_peticiones_concurrentes(servidor):
+    llm = despachador(servidor(), max_paralelas=4)
+    futuros = [llm.enviar(f"prompt {numero}", max_tokens=5) for numero in range(20)]
+    assert [futuro.result(timeout=10) for futuro in futuros] == [f"PROMPT {numero}" for numero in range(20)]
+    assert llm.llamadas == 20
+
+
+def test_reintenta_los_429(servidor):
+    falso = servidor(saturadas=2)
+    llm = despachador(falso)
+    assert llm("hola", max_tokens=5) == "HOLA"
+    assert (llm.llamadas, llm.reintentos) == (3, 2)
+
+
+def test_retry_after_no_supera_la_espera_maxima(servidor):
+    llm = despachador(servidor(saturadas=1, retry_after="3600"), espera_max=0.05)
+    assert llm._espera(0, "3600") == 0.05
+    assert llm("hola", max_tokens=5) == "HOLA"
+
+
+def test_no_reintenta_los_4xx(servidor):
+    falso = servidor()
+    with pytest.raises(ErrorLLM):
+        despachador(falso)("rechazar", max_tokens=5)
+    assert len(falso.peticiones) == 1
+
+
+def test_combinar_desde_varios_hilos():
+    futuros = [Future() for _ in range(200)]
+    combinado = combinar(futuros, sum)
+    hilos = [threading.Thread(target=futuro.set_result, args=(1,)) for futuro in futuros]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert combinado.result(timeout=1) == 200
+
+
+def test_cancelacion_se_propaga():
+    origen = Future()
+    pendiente = Future()
+    encadenado = encadenar(origen, lambda resultado: Future())
+    combinado = combinar([origen, pendiente], list)
+    origen.cancel()
+    assert encadenado.cancelled()
+    pendiente.set_result(1)
+    assert combinado.cancelled()
+
+    otro = Future()
+    siguiente = Future()
+    encadenado = encadenar(otro, lambda resultado: siguiente)
+    otro.set_result(1)
+    siguiente.cancel()
+    assert encadenado.cancelled()
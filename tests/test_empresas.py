@@ -0,0 +1,77 @@
+"""Pruebas de la búsqueda del sitio web de las empresas con un buscador falso."""
+import threading
+
+from webscraper_gpt.empresas import BusquedaStub, CacheEmpresas, ResolutorEmpresas, puntuar_resultados
+
+RESPUESTAS = {"Abgam, S.A.": ["https://www.einforma.com/abgam", "https://www.abgam.es/contacto"]}
+
+
+class BusquedaBloqueada(BusquedaStub):
+    """Stub que no responde hasta que se abre `puerta` y cuenta sus llamadas."""
+
+    def __init__(self, respuestas):
+        super().__init__(respuestas)
+        self.puerta = threading.Event()
+        self.llamadas = 0
+
+    def buscar(self, consulta, max_resultados):
+        self.llamadas += 1
+        self.puerta.wait(5)
+        return super().buscar(consulta, max_resultados)
+
+
+def _resolutor(backend, cache=None, **opciones):
+    return ResolutorEmpresas(backend, cache, peticiones_por_minuto=0, **opciones)
+
+
+def test_los_agregadores_nunca_son_el_sitio_oficial():
+    resultados = [
+        {"href": "https://www.einforma.com/abgam-sa", "title": "ABGAM SA - Informe de empresa"},
+        {"href": "https://es.linkedin.com/company/abgam", "title": "ABGAM | LinkedIn"},
+        {"href": "https://www.abgam.es/", "title": "ABGAM - Inicio"},
+        {"href": "https://www.abgam.es/contacto", "title": "Contacto"},
+        {"href": "http://[roto", "title": "ABGAM"},
+    ]
+    puntuados = puntuar_resultados("ABGAM, S.A.", resultados)
+    assert [url for _, url, _ in puntuados] == ["https://www.abgam.es/"]
+
+
+def test_el_dominio_parecido_gana_a_la_posicion():
+    resultados = [
+        {"href": "https://www.ferreteria-lopez.com/", "title": "Ferretería López"},
+        {"href": "https://www.abgam.es/", "title": "Abgam"},
+    ]
+    assert puntuar_resultados("Abgam S.L.", resultados)[0][1] == "https://www.abgam.es/"
+
+
+def test_la_segunda_busqueda_sale_de_la_cache(tmp_path):
+    cache = CacheEmpresas(tmp_path / "empresas.sqlite")
+    primero = _resolutor(BusquedaStub(RESPUESTAS), cache)
+    assert primero.resolver("Abgam, S.A.") == "https://www.abgam.es/"
+    assert (primero.busquedas, primero.desde_cache) == (1, 0)
+
+    segundo = _resolutor(BusquedaStub(), cache, buscador="stub")
+    assert segundo.resolver("ABGAM S.A.") == "https://www.abgam.es/"
+    assert (segundo.busquedas, segundo.desde_cache) == (0, 1)
+
+
+def test_solo_cache_no_busca_ni_escribe(tmp_path):
+    cache = CacheEmpresas(tmp_path / "empresas.sqlite")
+    cache.guardar("duckduckgo:8", "sitio oficial abgam s a", [{"href": "https://www.abgam.es/", "title": "Abgam"}])
+    resolutor = _resolutor(BusquedaStub(RESPUESTAS), cache, solo_cache=True, buscador="duckduckgo")
+
+    assert resolutor.resolver("Abgam S.A.") == "https://www.abgam.es/"
+    assert resolutor.resolver("Otra Empresa SL") is None
+    assert (resolutor.busquedas, resolutor.desde_cache) == (0, 1)
+    assert cache.consultar("SELECT consulta FROM busquedas") == [("sitio oficial abgam s a",)]
+
+
+def test_las_busquedas_simultaneas_de_la_misma_empresa_se_agrupan():
+    backend = BusquedaBloqueada(RESPUESTAS)
+    resolutor = _resolutor(backend)
+    futuros = [resolutor.enviar(nombre) for nombre in ("Abgam, S.A.", "ABGAM S.A.", "abgam s.a")]
+    backend.puerta.set()
+
+    assert futuros[0] is futuros[1] is futuros[2]
+    assert futuros[0].result() == "https://www.abgam.es/"
+    assert (backend.llamadas, resolutor.busquedas, resolutor.repetidas) == (1, 1, 2)
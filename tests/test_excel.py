@@ -0,0 +1,46 @@
+"""Pruebas de la lectura y escritura del Excel en streaming."""
+from openpyxl import Workbook, load_workbook
+
+from webscraper_gpt.excel import EscritorExcel, LectorExcel
+
+
+def test_las_demas_hojas_se_copian_en_su_sitio(tmp_path):
+    libro = Workbook()
+    notas = libro.active
+    notas.title = "Notas"
+    notas.append(["Exportado del CRM", 3])
+    datos = libro.create_sheet("Datos")
+    datos.append(["EMPRESA", "WEBSITE"])
+    datos.append(["Abgam", "abgam.es"])
+    datos.append(["Otra", "otra.es"])
+    libro.create_sheet("Vacía")
+    libro.active = 1
+    origen = tmp_path / "entrada.xlsx"
+    libro.save(origen)
+
+    with LectorExcel(origen) as lector:
+        escritor = EscritorExcel(lector.cabecera, ["RESULTADO"], lector=lector)
+        filas = list(lector.filas())
+    for fila, valores in reversed(filas):
+        escritor.original(fila, valores)
+        escritor.completar(fila, valores[1].upper())
+    ruta = escritor.guardar(str(tmp_path / "salida.xlsx"))
+
+    salida = load_workbook(ruta)
+    assert salida.sheetnames == ["Notas", "Datos", "Vacía"]
+    assert salida.active.title == "Datos"
+    assert [list(fila) for fila in salida["Notas"].iter_rows(values_only=True)] == [["Exportado del CRM", 3]]
+    assert [list(fila) for fila in salida["Datos"].iter_rows(values_only=True)] == [
+        ["EMPRESA", "WEBSITE", "RESULTADO"],
+        ["Abgam", "abgam.es", "ABGAM.ES"],
+        ["Otra", "otra.es", "OTRA.ES"],
+    ]
+
+
+def test_sin_lector_solo_la_hoja_de_resultados(tmp_path):
+    escritor = EscritorExcel(["WEBSITE"], ["RESULTADO"])
+    escritor.original(2, ("a.es",))
+    escritor.completar(2, "A.ES")
+    salida = load_workbook(escritor.guardar(str(tmp_path / "salida.xlsx")))
+    assert len(salida.sheetnames) == 1
+    assert [list(fila) for fila in salida.active.iter_rows(values_only=True)] == [["WEBSITE", "RESULTADO"], ["a.es", "A.ES"]]
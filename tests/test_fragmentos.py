@@ -0,0 +1,28 @@
+"""Pruebas de la selección de fragmentos que se envían al LLM."""
+from webscraper_gpt.coincidencias import BuscadorPalabras
+from webscraper_gpt.embeddings import EmbeddingsHash
+from webscraper_gpt.fragmentos import SelectorFragmentos
+from webscraper_gpt.tareas import analizar_fragmentos
+
+PAGINA = "".join(
+    f"<p>{texto * 40}</p>"
+    for texto in (
+        "Horario de la tienda y productos. ",
+        "Buzón ético para comunicar irregularidades de forma confidencial. ",
+        "Política de cookies. ",
+    )
+).encode("utf-8")
+PALABRAS = ("canal de denuncias",)
+
+
+def test_sin_embeddings_solo_cuentan_las_palabras_clave():
+    assert analizar_fragmentos(PAGINA, "https://empresa.es/", "utf-8", PALABRAS, tam_fragmento=200, solape=10) == []
+
+
+def test_los_embeddings_rescatan_fragmentos_sin_palabras_clave():
+    candidatos = analizar_fragmentos(
+        PAGINA, "https://empresa.es/", "utf-8", PALABRAS, tam_fragmento=200, solape=10, mejores=10, descartar_vacios=False
+    )
+    selector = SelectorFragmentos(BuscadorPalabras(PALABRAS), EmbeddingsHash(), mejores=1)
+    elegidos = selector.seleccionar(candidatos, "buzón ético para comunicar irregularidades")
+    assert len(elegidos) == 1 and "irregularidades" in elegidos[0]
@@ -0,0 +1,36 @@
+"""Pruebas del resumen map-reduce con un LLM falso."""
+from webscraper_gpt.resumen import MARCA_VACIO, SIN_INFORMACION, ResumidorMapReduce
+
+HALLAZGO = "No hay un canal de denuncias como tal, pero sí un buzón ético en /compliance"
+
+
+class LLMFalso:
+    """Responde a cada prompt del mapa según el fragmento que contiene."""
+
+    def __init__(self, respuestas):
+        self.respuestas = respuestas
+        self.prompts = []
+
+    def __call__(self, prompt, max_tokens=None):
+        self.prompts.append(prompt)
+        return next(respuesta for clave, respuesta in self.respuestas.items() if clave in prompt)
+
+
+def test_el_mapa_pide_la_marca_fija():
+    llm = LLMFalso({"cookies": MARCA_VACIO})
+    ResumidorMapReduce(llm).resumir(["Política de cookies."], "canal de denuncias", "https://empresa.es/")
+    assert f"responde únicamente: {MARCA_VACIO}" in llm.prompts[0]
+
+
+def test_solo_se_descarta_la_marca():
+    llm = LLMFalso({"cookies": f" {MARCA_VACIO}.", "Buzón": HALLAZGO})
+    resumidor = ResumidorMapReduce(llm)
+    resumen = resumidor.resumir(["Política de cookies.", "Buzón ético."], "canal de denuncias", "https://empresa.es/")
+    assert resumen.relevante and resumen.resumen == HALLAZGO
+    assert resumidor.descartados == 1 and resumidor.llamadas == 2
+
+
+def test_sin_extractos_no_hay_informacion():
+    llm = LLMFalso({"cookies": MARCA_VACIO})
+    resumen = ResumidorMapReduce(llm).resumir(["Política de cookies."], "canal de denuncias", "https://empresa.es/")
+    assert not resumen.relevante and resumen.resumen == SIN_INFORMACION
@@ -0,0 +1,16 @@
+"""Pruebas del progreso de los trabajos en segundo plano."""
+from webscraper_gpt.segundo_plano import Progreso
+
+
+def test_paginas_ordenadas_por_fila_aunque_lleguen_desordenadas():
+    progreso = Progreso()
+    for fila in (5, 3, 4, 2, 9):
+        progreso.fila(fila, ("resultado",), error=fila % 2 == 1)
+    progreso.reanudada(1, ("del diario",))
+
+    filas, paginas = progreso.pagina(1, tam=3)
+    assert paginas == 2
+    assert filas == [(1, ("del diario",), False), (2, ("resultado",), False), (3, ("resultado",), True)]
+    assert [fila for fila, _, _ in progreso.pagina(2, tam=3)[0]] == [4, 5, 9]
+    assert [fila for fila, _, _ in progreso.pagina(1, solo_errores=True)[0]] == [3, 5, 9]
+    assert (progreso.procesadas, progreso.reanudadas, progreso.errores) == (5, 1, 3)
@@ -0,0 +1 @@
+"""Componentes compartidos por las páginas de WebScraper-GPT."""
@@ -0,0 +1,225 @@
+"""
+Línea de comandos para procesar un Excel sin navegador.
+
+    python -m webscraper_gpt run entrada.xlsx --mode keywords|ai|ai-alt --workers N
+
+Usa los mismos procesos que las páginas de Streamlit, las mismas cachés y
+el mismo diario: una ejecución interrumpida se reanuda al repetir el
+comando, y una ejecución empezada en la interfaz se puede terminar aquí.
+
+Para repartir un Excel grande entre varios procesos o máquinas:
+
+    python -m webscraper_gpt shard entrada.xlsx --mode ai --queue redis://host:6379/0
+    python -m webscraper_gpt worker LOTE --mode ai --queue redis://host:6379/0   # en cada máquina
+    python -m webscraper_gpt merge LOTE entrada.xlsx -o salida.xlsx --queue redis://host:6379/0
+"""
+import argparse
+import logging
+import os
+import sys
+
+from webscraper_gpt.analisis import BACKENDS
+from webscraper_gpt.cache import CacheHTTP
+from webscraper_gpt.cache_llm import CacheLLM, LLMConCache, LLMStub
+from webscraper_gpt.coincidencias import palabras_de_consulta
+from webscraper_gpt.cola import Trabajador, abrir_cola, combinar, repartir
+from webscraper_gpt.descargas import ConfiguracionDescargas, MotorDescargas
+from webscraper_gpt.descubrimiento import Descubridor
+from webscraper_gpt.despachador import ConfiguracionDespachador, DespachadorLLM
+from webscraper_gpt.diario import DiarioResultados, huella_archivo
+from webscraper_gpt.embeddings import CacheEmbeddings, EmbeddingsConCache, EmbeddingsHash, PrefiltroSemantico
+from webscraper_gpt.empresas import BusquedaDuckDuckGo, CacheEmpresas, ResolutorEmpresas, VerificadorHEAD
+from webscraper_gpt.llm import ClasificadorEnlaces
+from webscraper_gpt.procesamiento import (
+    CONSULTA,
+    PALABRAS_CLAVE,
+    ProcesoIA,
+    ProcesoIAAlternativas,
+    ProcesoPalabrasClave,
+)
+from webscraper_gpt.rastreador import Rastreador
+from webscraper_gpt.resumen import ResumidorMapReduce
+from webscraper_gpt.transporte import ConfiguracionTransporte, obtener_transporte
+
+MODOS = ("keywords", "ai", "ai-alt")
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="python -m webscraper_gpt", description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    # Opciones del proceso, comunes a run, shard y worker
+    opciones = argparse.ArgumentParser(add_help=False)
+    opciones.add_argument("--mode", choices=MODOS, default="keywords", help="Palabras clave, IA o IA con búsqueda de alternativas")
+    opciones.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos de análisis")
+    opciones.add_argument("--column", default="WEBSITE", help="Columna con las URLs")
+    opciones.add_argument("--company-column", default="RAZON_SOCIAL", help="Columna con la razón social (modo ai-alt)")
+    opciones.add_argument("--keywords", default=PALABRAS_CLAVE, help="Palabras clave separadas por comas (modo keywords)")
+    opciones.add_argument("--query", default=CONSULTA, help="Lo que se quiere encontrar (modos ai y ai-alt)")
+    opciones.add_argument("--summary", action="store_true", help="Resumir el contenido en lugar de clasificar enlaces (modo ai)")
+    opciones.add_argument("--model", default="gpt-3.5-turbo-instruct", help="Modelo de completions de OpenAI")
+    opciones.add_argument("--replay", action="store_true", help="Solo respuestas de la caché del LLM, sin llamadas")
+    opciones.add_argument("--no-prefilter", action="store_true", help="Enviar al LLM todos los enlaces relevantes")
+    opciones.add_argument("--concurrency", type=int, default=50, help="Descargas simultáneas")
+    opciones.add_argument("--per-host", type=int, default=4, help="Descargas simultáneas por dominio (máximo)")
+    opciones.add_argument("--verify-ssl", action="store_true", help="Validar los certificados de los sitios")
+    opciones.add_argument("--offline", action="store_true", help="Solo páginas de la caché, sin descargas")
+    opciones.add_argument("--no-cache", action="store_true", help="No usar la caché de páginas")
+    opciones.add_argument("--backend", choices=["auto", *BACKENDS], default="auto", help="Analizador HTML")
+    opciones.add_argument("--crawl", action="store_true", help="Seguir enlaces del mismo sitio si la portada no basta")
+    opciones.add_argument("--sitemap", action="store_true", help="Buscar en sitemap.xml si la portada no basta")
+
+    # La cola por defecto es un SQLite en la carpeta de datos
+    cola = argparse.ArgumentParser(add_help=False)
+    cola.add_argument("--queue", default=os.getenv("WEBSCRAPER_GPT_COLA"), help="redis://... o archivo SQLite de la cola")
+
+    run = subparsers.add_parser("run", parents=[opciones], help="Procesa un Excel completo y guarda el resultado")
+    run.add_argument("entrada", help="Excel de entrada (.xlsx)")
+    run.add_argument("--output", "-o", help="Excel de salida (por defecto, <entrada>_resultados.xlsx)")
+    run.add_argument("--restart", action="store_true", help="Descartar los resultados guardados en el diario y empezar de cero")
+
+    shard = subparsers.add_parser("shard", parents=[opciones, cola], help="Reparte las filas de un Excel en la cola")
+    shard.add_argument("entrada", help="Excel de entrada (.xlsx)")
+    shard.add_argument("--shard-size", type=int, default=100, help="Filas por shard")
+
+    worker = subparsers.add_parser("worker", parents=[opciones, cola], help="Procesa shards de un lote hasta terminarlo")
+    worker.add_argument("lote", help="Identificador que mostró shard")
+    worker.add_argument("--lease", type=float, default=120, help="Segundos de cada concesión (se renueva con latidos)")
+
+    status = subparsers.add_parser("status", parents=[cola], help="Muestra el avance de un lote")
+    status.add_argument("lote")
+
+    merge = subparsers.add_parser("merge", parents=[cola], help="Combina los resultados de un lote en el orden original")
+    merge.add_argument("lote")
+    merge.add_argument("entrada", help="El mismo Excel que se repartió")
+    merge.add_argument("--output", "-o", help="Excel de salida (por defecto, <entrada>_resultados.xlsx)")
+    return parser
+
+
+def crear_proceso(args):
+    """Construye el proceso del modo pedido con la misma configuración por defecto que las páginas."""
+    cache = None if args.no_cache else CacheHTTP()
+    config = ConfiguracionDescargas(
+        max_concurrencia=args.concurrency,
+        max_por_host=args.per_host,
+        sin_conexion=args.offline and cache is not None,
+        verificar_ssl=args.verify_ssl,
+    )
+    motor = MotorDescargas(config, obtener_transporte(ConfiguracionTransporte()), cache)
+
+    palabras = args.keywords.split(",") if args.mode == "keywords" else tuple(palabras_de_consulta(args.query))
+    rastreador = Rastreador(motor, palabras, backend=args.backend) if args.crawl else None
+    if args.sitemap:
+        rastreador = Descubridor(motor, palabras, rastreador=rastreador, backend=args.backend)
+    opciones = dict(columna=args.column, procesos=args.workers, backend=args.backend, rastreador=rastreador)
+
+    if args.mode == "keywords":
+        return ProcesoPalabrasClave(motor, palabras, **opciones)
+
+    # En modo repetición no se crea el despachador ni hace falta API key
+    if args.replay:
+        llm = LLMConCache(LLMStub(), CacheLLM(), solo_cache=True, modelo=args.model, temperatura=0)
+    else:
+        despachador = DespachadorLLM(ConfiguracionDespachador(modelo=args.model, api_key=os.getenv("OPENAI_API_KEY")))
+        llm = LLMConCache(despachador, CacheLLM(), modelo=args.model, temperatura=0)
+    clasificador = ClasificadorEnlaces(llm)
+    prefiltro = None if args.no_prefilter else PrefiltroSemantico(EmbeddingsConCache(EmbeddingsHash(), CacheEmbeddings()))
+    opciones.update(consulta=args.query, prefiltro=prefiltro, llm=llm)
+
+    if args.mode == "ai":
+        return ProcesoIA(motor, clasificador, resumidor=ResumidorMapReduce(llm) if args.summary else None, **opciones)
+    resolutor_empresas = ResolutorEmpresas(BusquedaDuckDuckGo(), CacheEmpresas(), verificar=VerificadorHEAD())
+    return ProcesoIAAlternativas(motor, clasificador, resolutor_empresas, columna_empresa=args.company_column, **opciones)
+
+
+def ejecutar(args):
+    proceso = crear_proceso(args)
+    ejecucion = DiarioResultados().abrir(huella_archivo(args.entrada, *proceso.parametros()), proceso.columnas, proceso.nombre)
+    if args.restart:
+        ejecucion.reiniciar()
+    elif ejecucion.hechas:
+        logging.info(f"Reanudando: {len(ejecucion.hechas)} filas ya procesadas.")
+
+    salida = args.output or f"{os.path.splitext(args.entrada)[0]}_resultados.xlsx"
+    try:
+        proceso.ejecutar(args.entrada, ejecucion, salida)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    logging.info(ejecucion.resumen())
+    logging.info(f"Resultado guardado en {salida}")
+    return 0
+
+
+def repartir_lote(args):
+    proceso = crear_proceso(args)
+    lote = huella_archivo(args.entrada, *proceso.parametros())
+    try:
+        shards = repartir(abrir_cola(args.queue), proceso, args.entrada, lote, args.shard_size, os.path.basename(args.entrada))
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    if shards:
+        logging.info(f"{shards} shards añadidos.")
+    else:
+        logging.info("El lote ya estaba repartido.")
+    print(lote)
+    return 0
+
+
+def trabajar(args):
+    cola = abrir_cola(args.queue)
+    try:
+        trabajador = Trabajador(cola, args.lote, crear_proceso(args), duracion=args.lease)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    hechos = trabajador.ejecutar()
+    logging.info(f"{trabajador.identificador}: {hechos} shards procesados.")
+    logging.info(trabajador.resumen())
+    return 0
+
+
+def mostrar_estado(args):
+    estado = abrir_cola(args.queue).estado(args.lote)
+    if not estado["total"]:
+        logging.error(f"No existe el lote '{args.lote}'.")
+        return 1
+    print(" ".join(f"{nombre}={valor}" for nombre, valor in estado.items()))
+    return 0
+
+
+def combinar_lote(args):
+    cola = abrir_cola(args.queue)
+    estado = cola.estado(args.lote)
+    if estado["pendiente"] or estado["asignado"]:
+        logging.warning(f"El lote no ha terminado: {estado['pendiente']} shards pendientes y {estado['asignado']} en curso.")
+    salida = args.output or f"{os.path.splitext(args.entrada)[0]}_resultados.xlsx"
+    try:
+        _, sin_resultado = combinar(cola, args.lote, args.entrada, salida)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    if sin_resultado:
+        logging.warning(f"{sin_resultado} filas sin resultado.")
+    logging.info(f"Resultado guardado en {salida}")
+    return 0
+
+
+COMANDOS = {
+    "run": ejecutar,
+    "shard": repartir_lote,
+    "worker": trabajar,
+    "status": mostrar_estado,
+    "merge": combinar_lote,
+}
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = crear_parser().parse_args(argv)
+    return COMANDOS[args.comando](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Base común para los almacenes SQLite del proyecto (cachés, diarios y colas)."""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Directorio donde se guardan las bases de datos locales
+DIRECTORIO_DATOS = os.getenv("WEBSCRAPER_GPT_DATOS", ".webscraper_gpt")
+
+
+def ruta_datos(nombre):
+    """Devuelve la ruta de un archivo dentro del directorio de datos."""
+    return os.path.join(DIRECTORIO_DATOS, nombre)
+
+
+class AlmacenSQLite:
+    """
+    Conexión SQLite compartida entre hilos y protegida por un cerrojo.
+
+    Las subclases definen `ESQUEMA` con las sentencias que crean sus tablas.
+    La base se abre en modo WAL para que varios procesos puedan leer mientras
+    otro escribe.
+    """
+
+    ESQUEMA = ""
+
+    def __init__(self, ruta):
+        if ruta != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self.ruta = ruta
+        self._cerrojo = threading.RLock()
+        self._conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(self.ESQUEMA)
+
+    def consultar(self, sql, parametros=()):
+        """Ejecuta una sentencia y devuelve todas las filas."""
+        with self._cerrojo:
+            return self._conexion.execute(sql, parametros).fetchall()
+
+    @contextmanager
+    def transaccion(self):
+        """Agrupa varias sentencias en una transacción con escritura reservada."""
+        with self._cerrojo:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conexion
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+            self._conexion.execute("COMMIT")
+
+    def cerrar(self):
+        with self._cerrojo:
+            self._conexion.close()
@@ -0,0 +1,264 @@
+"""Extracción del texto visible y los enlaces de una página en una sola pasada."""
+import codecs
+import re
+from dataclasses import dataclass, field
+from urllib.parse import urljoin
+
+from webscraper_gpt.coincidencias import ETIQUETAS_INVISIBLES
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+try:
+    from bs4 import BeautifulSoup, NavigableString, Tag
+except ImportError:
+    BeautifulSoup = None
+
+# Etiquetas de bloque: se separan con un salto de línea para no pegar palabras
+ETIQUETAS_BLOQUE = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre",
+    "section", "table", "td", "th", "tr", "ul",
+}
+
+# Etiquetas cuyo texto no se ve en la página: las invisibles y la cabecera
+_OMITIDAS = ETIQUETAS_INVISIBLES | {"head", "title"}
+
+# Charset declarado en <meta charset> o <meta http-equiv="Content-Type" content="...; charset=">
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w:.-]+)", re.IGNORECASE)
+_BYTES_META = 4096
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+@dataclass
+class Documento:
+    """Texto visible de una página y sus enlaces como pares (texto, URL absoluta)."""
+    texto: str
+    enlaces: list = field(default_factory=list)
+
+
+def _resolver(base_url, href):
+    """URL absoluta de un enlace, o None si está mal formada ("http://[roto")."""
+    href = href.strip()
+    try:
+        return urljoin(base_url, href) if base_url else href
+    except ValueError:
+        return None
+
+
+def _componer(partes):
+    """
+    Une los textos de una página: los de una misma línea se pegan tal cual
+    ("can<i>al</i>" es "canal") y cada None, un límite de bloque, empieza
+    otra. Los espacios se reducen a uno y se quitan las líneas vacías.
+    """
+    lineas, actual = [], []
+    for parte in partes:
+        if parte is None:
+            lineas.append(" ".join("".join(actual).split()))
+            actual = []
+        else:
+            actual.append(parte)
+    lineas.append(" ".join("".join(actual).split()))
+    return "\n".join(linea for linea in lineas if linea)
+
+
+def _recorrer(raiz, hijos, nombre, href, base_url):
+    """
+    Texto visible y enlaces del árbol que cuelga de `raiz` (el <body>).
+
+    Los tres analizadores recorren su árbol con esta misma función, así que
+    coinciden en qué texto es visible y cómo se separa. Cada uno la adapta
+    con `hijos(nodo)`, que devuelve los hijos con los nodos de texto ya como
+    str, `nombre(nodo)`, la etiqueta o None para comentarios y similares, y
+    `href(nodo)`. Los enlaces mal formados se descartan.
+    """
+    partes = []
+    enlaces = []
+    pila = [raiz]
+    while pila:
+        nodo = pila.pop()
+        if isinstance(nodo, str):
+            partes.append(nodo)
+            continue
+        if isinstance(nodo, tuple):  # Cierre de una etiqueta
+            bloque, enlace = nodo
+            if enlace is not None:
+                inicio, url, posicion = enlace
+                enlaces[posicion] = (_componer(partes[inicio:]).replace("\n", " "), url)
+            if bloque:
+                partes.append(None)
+            continue
+
+        etiqueta = nombre(nodo)
+        if etiqueta is None or etiqueta in _OMITIDAS:
+            continue
+        bloque = etiqueta in ETIQUETAS_BLOQUE
+        if bloque:
+            partes.append(None)
+        enlace = None
+        if etiqueta == "a" and (destino := href(nodo)) is not None:
+            url = _resolver(base_url, destino)
+            if url is not None:
+                enlace = (len(partes), url, len(enlaces))
+                enlaces.append(None)
+        pila.append((bloque, enlace))
+        pila.extend(reversed(hijos(nodo)))
+    return Documento(_componer(partes), enlaces)
+
+
+def _codificacion_valida(nombre):
+    """Nombre de la codificación si Python la conoce ("utf8mb4" y similares no), o None."""
+    try:
+        return codecs.lookup(nombre).name if nombre else None
+    except LookupError:
+        return None
+
+
+def decodificar(contenido, codificacion=None):
+    """
+    Convierte el HTML descargado en texto con la codificación más probable.
+
+    Por orden: BOM, charset de la cabecera Content-Type, charset declarado en
+    un <meta> al principio de la página y, si no hay ninguno válido, UTF-8 o,
+    si el contenido no lo es, Windows-1252 (el "Latin-1" de casi todos los
+    sitios que no declaran nada).
+
+    Args:
+        contenido (bytes): HTML de la página.
+        codificacion (str): Charset de la cabecera Content-Type, si lo hay.
+
+    Returns:
+        str: Texto de la página.
+    """
+    for bom, nombre in _BOMS:
+        if contenido.startswith(bom):
+            return contenido.decode(nombre, errors="replace")
+
+    nombre = _codificacion_valida(codificacion)
+    if not nombre:
+        declarada = _META_CHARSET.search(contenido[:_BYTES_META])
+        nombre = declarada and _codificacion_valida(declarada.group(1).decode("ascii", errors="ignore"))
+        # Un <meta> legible en ASCII no puede estar en UTF-16, aunque lo diga
+        if nombre and nombre.startswith("utf-16"):
+            nombre = "utf-8"
+    if nombre:
+        return contenido.decode(nombre, errors="replace")
+
+    try:
+        return contenido.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Una página cortada por el presupuesto de bytes puede acabar a mitad de un carácter
+        if e.start >= len(contenido) - 3:
+            return contenido.decode("utf-8", errors="replace")
+    return contenido.decode("cp1252", errors="replace")
+
+
+def _hijos_selectolax(nodo):
+    return [hijo.text_content or "" if hijo.tag == "-text" else hijo for hijo in nodo.iter(include_text=True)]
+
+
+def _nombre_selectolax(nodo):
+    return None if nodo.tag.startswith(("-", "!")) else nodo.tag  # "-comment", "!doctype"
+
+
+def _con_selectolax(contenido, base_url, codificacion):
+    arbol = LexborHTMLParser(decodificar(contenido, codificacion))
+    if arbol.body is None:
+        return Documento("")
+    return _recorrer(
+        arbol.body, _hijos_selectolax, _nombre_selectolax, lambda nodo: nodo.attributes.get("href"), base_url
+    )
+
+
+def _hijos_lxml(elemento):
+    # En lxml el texto de un nodo va en .text y el que le sigue, en .tail
+    hijos = [elemento.text] if elemento.text else []
+    for hijo in elemento:
+        hijos.append(hijo)
+        if hijo.tail:
+            hijos.append(hijo.tail)
+    return hijos
+
+
+def _con_lxml(contenido, base_url, codificacion):
+    # lxml no acepta texto con declaración <?xml encoding=...?>: se le pasa ya en UTF-8
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    try:
+        raiz = lxml.html.document_fromstring(decodificar(contenido, codificacion).encode("utf-8"), parser=parser)
+    except etree.ParserError:  # Documento vacío
+        return Documento("")
+    cuerpo = raiz.find("body")
+    return _recorrer(
+        raiz if cuerpo is None else cuerpo,
+        _hijos_lxml,
+        lambda elemento: elemento.tag if isinstance(elemento.tag, str) else None,  # Comentarios e instrucciones
+        lambda elemento: elemento.get("href"),
+        base_url,
+    )
+
+
+def _hijos_bs4(etiqueta):
+    # Comentarios, CDATA y declaraciones también son NavigableString, pero de subclases
+    return [
+        hijo if isinstance(hijo, Tag) else str(hijo)
+        for hijo in etiqueta.contents
+        if isinstance(hijo, Tag) or type(hijo) is NavigableString
+    ]
+
+
+def _con_html_parser(contenido, base_url, codificacion):
+    soup = BeautifulSoup(decodificar(contenido, codificacion), "html.parser")
+    # html.parser no añade el <body> que falta: se recorre todo sin la cabecera
+    return _recorrer(
+        soup.body or soup, _hijos_bs4, lambda etiqueta: etiqueta.name, lambda etiqueta: etiqueta.get("href"), base_url
+    )
+
+
+# Analizadores disponibles, del más rápido al más lento
+BACKENDS = {}
+if LexborHTMLParser:
+    BACKENDS["selectolax"] = _con_selectolax
+if lxml:
+    BACKENDS["lxml"] = _con_lxml
+if BeautifulSoup:
+    BACKENDS["html.parser"] = _con_html_parser
+
+
+def extraer_documento(contenido, base_url=None, codificacion=None, backend="auto"):
+    """
+    Analiza una página y devuelve su texto visible y sus enlaces.
+
+    Solo se lee el <body>, sin script, style y similares: el texto en línea
+    se une sin separador y cada etiqueta de bloque empieza una línea. Los
+    enlaces se resuelven contra `base_url` y los mal formados se descartan.
+    Con backend "auto" se usa el analizador en C más rápido que esté
+    instalado (selectolax o lxml) y, si no hay ninguno, el html.parser de
+    BeautifulSoup. Los tres reciben el mismo texto, decodificado con
+    `decodificar`, y lo recorren con las mismas reglas, así que dan el
+    mismo `Documento`.
+
+    Args:
+        contenido (bytes): HTML de la página.
+        base_url (str): URL de la página, para resolver enlaces relativos.
+        codificacion (str): Charset de la cabecera Content-Type, si lo hay.
+        backend (str): "auto" o una de las claves de `BACKENDS`.
+
+    Returns:
+        Documento: Texto visible y enlaces de la página.
+    """
+    if backend == "auto":
+        backend = next(iter(BACKENDS))
+    return BACKENDS[backend](contenido, base_url, codificacion)
@@ -0,0 +1,141 @@
+"""Caché persistente de páginas descargadas con revalidación condicional."""
+import json
+import time
+import zlib
+from dataclasses import dataclass
+from urllib.parse import urlsplit, urlunsplit
+
+from webscraper_gpt.almacen import AlmacenSQLite, ruta_datos
+from webscraper_gpt.descargas import Respuesta, cabecera
+
+PUERTOS_POR_DEFECTO = {"http": 80, "https": 443}
+
+
+def normalizar_url(url):
+    """
+    Normaliza una URL para usarla como clave de caché.
+
+    Pasa esquema y host a minúsculas, elimina el puerto por defecto y el
+    fragmento, y usa "/" como ruta cuando está vacía.
+    """
+    partes = urlsplit(url.strip())
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or "").lower()
+    if partes.port and partes.port != PUERTOS_POR_DEFECTO.get(esquema):
+        host = f"{host}:{partes.port}"
+    return urlunsplit((esquema, host, partes.path or "/", partes.query, ""))
+
+
+@dataclass
+class EntradaCache:
+    """Página guardada en la caché."""
+    url: str
+    estado: int
+    contenido: bytes
+    cabeceras: dict
+    guardado: float
+
+    @property
+    def etag(self):
+        return cabecera(self.cabeceras, "ETag")
+
+    @property
+    def ultima_modificacion(self):
+        return cabecera(self.cabeceras, "Last-Modified")
+
+    def fresca(self, ttl):
+        return time.time() - self.guardado < ttl
+
+    def respuesta(self):
+        return Respuesta(self.url, self.estado, self.contenido, self.cabeceras, desde_cache=True)
+
+
+class CacheHTTP(AlmacenSQLite):
+    """
+    Caché de respuestas HTTP en SQLite con contenido comprimido.
+
+    Las entradas caducan tras `ttl` segundos; una entrada caducada se
+    revalida con If-None-Match / If-Modified-Since, de modo que una página
+    sin cambios solo cuesta un 304. Cuando el tamaño total supera
+    `max_bytes` se eliminan las entradas usadas hace más tiempo (LRU).
+
+    El tamaño total se lleva en memoria y no se suma la tabla en cada
+    página guardada. Como otros procesos pueden escribir en el mismo
+    archivo, se vuelve a sumar cada `intervalo_recuento` páginas.
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS paginas (
+            clave TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            estado INTEGER NOT NULL,
+            contenido BLOB NOT NULL,
+            cabeceras TEXT NOT NULL,
+            guardado REAL NOT NULL,
+            ultimo_acceso REAL NOT NULL,
+            tamano INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS paginas_ultimo_acceso ON paginas (ultimo_acceso);
+    """
+
+    def __init__(self, ruta=None, ttl=24 * 3600, max_bytes=500 * 1024 * 1024, intervalo_recuento=1000):
+        super().__init__(ruta or ruta_datos("paginas.sqlite"))
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.intervalo_recuento = max(intervalo_recuento, 1)
+        self._total = None
+        self._nuevas = 0
+
+    def obtener(self, url):
+        """Devuelve la entrada de la URL (fresca o no) o None si no está en caché."""
+        clave = normalizar_url(url)
+        with self.transaccion() as conexion:
+            fila = conexion.execute(
+                "SELECT url, estado, contenido, cabeceras, guardado FROM paginas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila:
+                conexion.execute("UPDATE paginas SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave))
+        if not fila:
+            return None
+        url_final, estado, contenido, cabeceras, guardado = fila
+        return EntradaCache(url_final, estado, zlib.decompress(contenido), json.loads(cabeceras), guardado)
+
+    def guardar(self, url, respuesta):
+        """Guarda una respuesta correcta y aplica el límite de tamaño."""
+        contenido = zlib.compress(respuesta.contenido)
+        ahora = time.time()
+        clave = normalizar_url(url)
+        with self.transaccion() as conexion:
+            if self._total is None or self._nuevas >= self.intervalo_recuento:
+                self._total = conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM paginas").fetchone()[0]
+                self._nuevas = 0
+            anterior = conexion.execute("SELECT tamano FROM paginas WHERE clave = ?", (clave,)).fetchone()
+            conexion.execute(
+                "INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (clave, respuesta.url, respuesta.estado, contenido,
+                 json.dumps(respuesta.cabeceras), ahora, ahora, len(contenido)),
+            )
+            self._nuevas += 1
+            self._total += len(contenido) - (anterior[0] if anterior else 0)
+            if self._total > self.max_bytes:
+                self._desalojar(conexion)
+
+    def revalidada(self, url):
+        """Marca como fresca una entrada tras recibir un 304."""
+        ahora = time.time()
+        self.consultar(
+            "UPDATE paginas SET guardado = ?, ultimo_acceso = ? WHERE clave = ?", (ahora, ahora, normalizar_url(url))
+        )
+
+    def _desalojar(self, conexion):
+        while self._total > self.max_bytes:
+            antiguas = conexion.execute(
+                "SELECT clave, tamano FROM paginas ORDER BY ultimo_acceso LIMIT 100"
+            ).fetchall()
+            if not antiguas:
+                break
+            for clave, tamano in antiguas:
+                conexion.execute("DELETE FROM paginas WHERE clave = ?", (clave,))
+                self._total -= tamano
+                if self._total <= self.max_bytes:
+                    break
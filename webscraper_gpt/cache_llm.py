@@ -0,0 +1,181 @@
+"""Caché persistente de respuestas del LLM y modo de repetición sin llamadas."""
+import hashlib
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from webscraper_gpt.almacen import AlmacenSQLite, ruta_datos
+from webscraper_gpt.despachador import enviar_a, futuro_resuelto
+
+_ESPACIOS = re.compile(r"\s+")
+
+# Hilo que guarda las respuestas que llegan en segundo plano, compartido por todas las instancias
+_escrituras = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-llm")
+
+
+def hash_prompt(prompt, max_tokens=None):
+    """Hash del prompt normalizado (espacios colapsados) y del límite de tokens pedido."""
+    normalizado = _ESPACIOS.sub(" ", prompt).strip()
+    return hashlib.sha256(f"{max_tokens}\x00{normalizado}".encode("utf-8")).hexdigest()
+
+
+class CacheLLM(AlmacenSQLite):
+    """
+    Respuestas del LLM guardadas por (modelo, temperatura, hash del prompt).
+
+    Al superar `max_entradas` elimina las respuestas usadas hace más tiempo.
+    El recuento se hace cada `intervalo_poda` respuestas nuevas y no en cada
+    una, así que la tabla puede pasarse del límite en hasta ese número.
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS respuestas (
+            modelo TEXT NOT NULL,
+            temperatura REAL NOT NULL,
+            hash TEXT NOT NULL,
+            respuesta TEXT NOT NULL,
+            creada REAL NOT NULL,
+            ultimo_acceso REAL NOT NULL,
+            PRIMARY KEY (modelo, temperatura, hash)
+        );
+        CREATE INDEX IF NOT EXISTS respuestas_ultimo_acceso ON respuestas (ultimo_acceso);
+    """
+
+    def __init__(self, ruta=None, max_entradas=100_000, intervalo_poda=1000):
+        super().__init__(ruta or ruta_datos("llm.sqlite"))
+        self.max_entradas = max_entradas
+        self.intervalo_poda = max(min(intervalo_poda, max_entradas), 1)
+        self._nuevas = 0
+
+    def obtener(self, modelo, temperatura, prompt, max_tokens=None):
+        """Devuelve la respuesta guardada o None."""
+        clave = (modelo, temperatura, hash_prompt(prompt, max_tokens))
+        with self.transaccion() as conexion:
+            fila = conexion.execute(
+                "SELECT respuesta FROM respuestas WHERE modelo = ? AND temperatura = ? AND hash = ?", clave
+            ).fetchone()
+            if fila:
+                conexion.execute(
+                    "UPDATE respuestas SET ultimo_acceso = ? WHERE modelo = ? AND temperatura = ? AND hash = ?",
+                    (time.time(), *clave),
+                )
+        return fila[0] if fila else None
+
+    def guardar(self, modelo, temperatura, prompt, respuesta, max_tokens=None):
+        ahora = time.time()
+        with self.transaccion() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?)",
+                (modelo, temperatura, hash_prompt(prompt, max_tokens), respuesta, ahora, ahora),
+            )
+            self._nuevas += 1
+            if self._nuevas >= self.intervalo_poda:
+                self._nuevas = 0
+                self._podar(conexion)
+
+    def _podar(self, conexion):
+        sobrantes = conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0] - self.max_entradas
+        if sobrantes > 0:
+            conexion.execute(
+                "DELETE FROM respuestas WHERE rowid IN "
+                "(SELECT rowid FROM respuestas ORDER BY ultimo_acceso LIMIT ?)",
+                (sobrantes,),
+            )
+
+
+class LLMStub:
+    """
+    LLM falso que siempre devuelve la misma respuesta.
+
+    Sirve para repetir ejecuciones solo desde la caché, sin red ni API key,
+    y para probar las páginas en local.
+    """
+
+    model_name = "stub"
+    temperature = 0
+
+    def __init__(self, respuesta=""):
+        self.respuesta = respuesta
+
+    def __call__(self, prompt, max_tokens=None):
+        return self.respuesta
+
+
+class LLMConCache:
+    """
+    Envuelve un LLM con la interfaz `llm(prompt, max_tokens=...)` y consulta
+    la caché antes de llamarlo.
+
+    Con `solo_cache` nunca se llama al LLM real: los fallos de caché se
+    responden con `llm`, que en ese modo debería ser un `LLMStub`. El modelo
+    y la temperatura de la clave se toman del LLM salvo que se indiquen, de
+    modo que un stub puede reutilizar lo que guardó el modelo real.
+
+    Cuenta los aciertos y fallos de caché de esta instancia.
+
+    Las respuestas que llegan con `enviar` se guardan en otro hilo: el
+    aviso de que terminó el Future puede llegar en el bucle del transporte,
+    y escribir allí en SQLite frenaría todas las descargas en curso.
+    """
+
+    def __init__(self, llm, cache, solo_cache=False, modelo=None, temperatura=None):
+        self.llm = llm
+        self.cache = cache
+        self.solo_cache = solo_cache
+        self.modelo = modelo or getattr(llm, "model_name", None) or type(llm).__name__
+        self.temperatura = temperatura if temperatura is not None else getattr(llm, "temperature", 0)
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _guardar(self, prompt, respuesta, max_tokens):
+        try:
+            self.cache.guardar(self.modelo, self.temperatura, prompt, respuesta, max_tokens)
+        except Exception as e:
+            logging.error(f"No se pudo guardar la respuesta del LLM en la caché: {e!r}")
+
+    def _buscar(self, prompt, max_tokens):
+        respuesta = self.cache.obtener(self.modelo, self.temperatura, prompt, max_tokens)
+        if respuesta is not None:
+            self.aciertos += 1
+        else:
+            self.fallos += 1
+        return respuesta
+
+    def __call__(self, prompt, max_tokens=None):
+        respuesta = self._buscar(prompt, max_tokens)
+        if respuesta is not None:
+            return respuesta
+
+        if self.solo_cache:
+            logging.info("Prompt sin respuesta en caché: se usa la respuesta del stub")
+            return self.llm(prompt, max_tokens=max_tokens)
+
+        respuesta = self.llm(prompt, max_tokens=max_tokens) if max_tokens else self.llm(prompt)
+        self.cache.guardar(self.modelo, self.temperatura, prompt, respuesta, max_tokens)
+        return respuesta
+
+    def enviar(self, prompt, max_tokens=None):
+        """Como la llamada, pero devuelve un Future; las respuestas nuevas se guardan al llegar."""
+        respuesta = self._buscar(prompt, max_tokens)
+        if respuesta is not None:
+            return futuro_resuelto(respuesta)
+        if self.solo_cache:
+            return futuro_resuelto(self.llm(prompt, max_tokens=max_tokens))
+
+        def guardar(futuro):
+            if not futuro.cancelled() and futuro.exception() is None:
+                _escrituras.submit(self._guardar, prompt, futuro.result(), max_tokens)
+
+        futuro = enviar_a(self.llm, prompt, max_tokens)
+        futuro.add_done_callback(guardar)
+        return futuro
+
+    def resumen(self):
+        total = self.aciertos + self.fallos
+        if not total:
+            return "No se consultó la caché del LLM."
+        texto = f"Caché del LLM: {self.aciertos} aciertos y {self.fallos} fallos ({100 * self.aciertos / total:.0f}% de aciertos)."
+        if self.solo_cache and self.fallos:
+            texto += f" En modo repetición, {self.fallos} prompts sin respuesta guardada recibieron la respuesta del stub."
+        return texto
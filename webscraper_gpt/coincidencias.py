@@ -0,0 +1,315 @@
+"""Búsqueda de palabras clave en el texto de las páginas."""
+import codecs
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+try:
+    import ahocorasick  # pyahocorasick, opcional
+except ImportError:
+    ahocorasick = None
+
+# Etiquetas cuyo contenido no forma parte del texto visible
+ETIQUETAS_INVISIBLES = {"script", "style", "noscript", "template"}
+
+# Marcas diacríticas combinables que quedan tras la descomposición NFKD
+_DIACRITICOS = re.compile(r"[\u0300-\u036f]")
+_ESPACIOS = re.compile(r"\s+")
+_SEPARADORES_URL = re.compile(r"[/_\-.?=&]+")
+
+# Textos de enlaces que suelen llevar a las páginas legales o corporativas donde
+# se publican los canales de denuncias, aunque no contengan ninguna palabra clave
+PALABRAS_CONCENTRADORAS = (
+    "legal", "aviso legal", "cumplimiento", "compliance", "sobre nosotros", "quienes somos",
+    "about", "empresa", "corporativo", "corporate", "gobierno corporativo", "governance",
+    "transparencia", "transparency", "inversores", "investors", "politicas", "policies",
+    "sostenibilidad", "sustainability", "etica", "ethics",
+)
+
+
+def normalizar(texto):
+    """
+    Prepara un texto para comparar: minúsculas, sin tildes ni diacríticos
+    ("Ético" -> "etico") y con los espacios y saltos de línea reducidos a uno.
+    """
+    texto = _DIACRITICOS.sub("", unicodedata.normalize("NFKD", texto)).casefold()
+    return _ESPACIOS.sub(" ", texto)
+
+
+def palabras_de_consulta(consulta):
+    """
+    Extrae las palabras clave de una consulta separada por comas.
+
+    Si la consulta empieza con un preámbulo terminado en dos puntos
+    ("Necesito encontrar información referente a: denuncia, ..."), el
+    preámbulo se descarta.
+
+    Args:
+        consulta (str): Texto escrito por el usuario.
+
+    Returns:
+        list: Palabras clave sin espacios sobrantes.
+    """
+    partes = consulta.split(",")
+    if ":" in partes[0]:
+        partes[0] = partes[0].split(":", 1)[1]
+    return [parte.strip() for parte in partes if parte.strip()]
+
+
+@dataclass(frozen=True)
+class Coincidencia:
+    """Aparición de una palabra clave; las posiciones son del texto normalizado."""
+    palabra: str
+    inicio: int
+    fin: int
+    orden: int
+
+
+class BuscadorPalabras:
+    """
+    Buscador compilado de varias palabras clave a la vez.
+
+    Se construye una vez por ejecución y encuentra todas las palabras en una
+    sola pasada sobre el texto, sin distinguir mayúsculas ni tildes: "etico"
+    y "ético" son la misma palabra. Usa Aho-Corasick si `pyahocorasick` está
+    instalado y, si no, una única expresión regular con todas las palabras.
+    """
+
+    def __init__(self, palabras):
+        # Palabra normalizada -> (palabra original, posición en la lista)
+        self.palabras = {}
+        for palabra in palabras:
+            palabra = palabra.strip()
+            clave = normalizar(palabra)
+            if clave and clave not in self.palabras:
+                self.palabras[clave] = (palabra, len(self.palabras))
+
+        self._automata = None
+        self._patron = None
+        if not self.palabras:
+            return
+        if ahocorasick:
+            self._automata = ahocorasick.Automaton()
+            for clave in self.palabras:
+                self._automata.add_word(clave, clave)
+            self._automata.make_automaton()
+        else:
+            alternativas = "|".join(map(re.escape, sorted(self.palabras, key=len, reverse=True)))
+            self._patron = re.compile(f"(?=({alternativas}))")
+            self._primera = re.compile(alternativas)
+            # La expresión solo devuelve la palabra más larga en cada posición:
+            # las que son prefijo suyo empiezan en el mismo sitio
+            self._prefijos = {
+                clave: [otra for otra in self.palabras if otra != clave and clave.startswith(otra)]
+                for clave in self.palabras
+            }
+
+    def _coincidencia(self, clave, inicio):
+        palabra, orden = self.palabras[clave]
+        return Coincidencia(palabra, inicio, inicio + len(clave), orden)
+
+    def buscar(self, texto, normalizado=False):
+        """
+        Devuelve todas las apariciones de las palabras clave, solapadas incluidas.
+
+        Args:
+            texto (str): Texto donde buscar.
+            normalizado (bool): Si el texto ya pasó por `normalizar`.
+
+        Returns:
+            list: Coincidencias ordenadas por posición.
+        """
+        if not self.palabras or not texto:
+            return []
+        texto = texto if normalizado else normalizar(texto)
+
+        coincidencias = []
+        if self._automata:
+            for fin, clave in self._automata.iter(texto):
+                coincidencias.append(self._coincidencia(clave, fin - len(clave) + 1))
+        else:
+            for encontrada in self._patron.finditer(texto):
+                clave = encontrada.group(1)
+                for otra in [clave] + self._prefijos[clave]:
+                    coincidencias.append(self._coincidencia(otra, encontrada.start()))
+        coincidencias.sort(key=lambda coincidencia: (coincidencia.inicio, coincidencia.orden))
+        return coincidencias
+
+    def contiene(self, texto, normalizado=False):
+        """Indica si aparece al menos una palabra clave."""
+        if not self.palabras or not texto:
+            return False
+        texto = texto if normalizado else normalizar(texto)
+        if self._automata:
+            return next(self._automata.iter(texto), None) is not None
+        return self._primera.search(texto) is not None
+
+    @staticmethod
+    def preferida(coincidencias):
+        """De varias coincidencias, la de la palabra que aparece antes en la lista del usuario."""
+        return min(coincidencias, key=lambda coincidencia: coincidencia.orden, default=None)
+
+
+class DetectorIncremental(HTMLParser):
+    """
+    Decide mientras se descarga una página si ya se puede dejar de leer.
+
+    Se alimenta con trozos de bytes tal y como llegan de la red; `alimentar`
+    devuelve True solo cuando el resultado del análisis ya no puede cambiar
+    con el resto de la página: un enlace completo cuyo texto contiene la
+    primera palabra de la lista. El análisis se queda con la palabra que
+    aparece antes en la lista y con el primer enlace que la contiene, así
+    que una página cortada da lo mismo que la página entera y nunca acaba
+    como "no encontrada" ni sin enlace.
+
+    El texto de cada enlace se compara por separado, como en el análisis:
+    no se juntan textos de elementos distintos ni cuenta lo que hay en
+    <head> (el título incluido), script, style y similares.
+    """
+
+    def __init__(self, buscador, codificacion="utf-8"):
+        super().__init__(convert_charrefs=True)
+        self.buscador = buscador
+        self.encontrada = None
+        # La palabra que gana siempre en `BuscadorPalabras.preferida`
+        self._primera = next(iter(buscador.palabras), None)
+        try:
+            self._decodificador = codecs.getincrementaldecoder(codificacion)(errors="replace")
+        except LookupError:
+            self._decodificador = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._invisible = 0
+        self._cabecera = False
+        self._enlace = None
+        self._continua = False
+
+    def handle_starttag(self, tag, attrs):
+        self._continua = False
+        if tag in ETIQUETAS_INVISIBLES or tag == "title":
+            self._invisible += 1
+        elif tag == "head":
+            self._cabecera = True
+        elif tag == "body":
+            self._cabecera = False
+        elif tag == "a":
+            # Un <a> sin cerrar termina al empezar el siguiente
+            self._cerrar_enlace()
+            if not self._invisible and not self._cabecera and any(nombre == "href" for nombre, _ in attrs):
+                self._enlace = []
+
+    def handle_endtag(self, tag):
+        self._continua = False
+        if (tag in ETIQUETAS_INVISIBLES or tag == "title") and self._invisible:
+            self._invisible -= 1
+        elif tag == "head":
+            self._cabecera = False
+        elif tag == "a":
+            self._cerrar_enlace()
+
+    def handle_data(self, data):
+        if self._enlace is None or self._invisible:
+            return
+        # Un mismo nodo de texto puede llegar en varias llamadas si quedó partido entre dos trozos
+        if self._continua:
+            self._enlace[-1] += data
+        else:
+            self._enlace.append(data)
+        self._continua = True
+
+    def handle_comment(self, data):
+        self._continua = False
+
+    def _cerrar_enlace(self):
+        if self._enlace is None:
+            return
+        partes, self._enlace = self._enlace, None
+        # El análisis junta los nodos del enlace sin separador, pero el texto de
+        # la página puede llevarlo entre ellos: la palabra debe estar de las dos formas
+        if not self.encontrada and self._primera and all(
+            self._primera in normalizar(separador.join(partes)) for separador in ("", " ")
+        ):
+            self.encontrada = self.buscador.palabras[self._primera][0]
+
+    def alimentar(self, trozo):
+        """Procesa un trozo de bytes y devuelve True si ya se puede dejar de leer."""
+        if self._primera:
+            self.feed(self._decodificador.decode(trozo))
+        return self.encontrada is not None
+
+
+def obtener_enlaces_relevantes(enlaces, buscador, con_texto=False):
+    """
+    Obtiene los enlaces de la página cuyo texto o URL contiene alguna palabra clave.
+
+    Args:
+        enlaces (list): Pares (texto, URL absoluta) extraídos de la página.
+        buscador (BuscadorPalabras): Palabras clave compiladas.
+        con_texto (bool): Devolver pares (texto, URL) en lugar de solo las URLs.
+
+    Returns:
+        list: URLs http(s) de los enlaces relevantes, o pares (texto, URL) con `con_texto`.
+    """
+    enlaces_relevantes = []
+    for texto, url in enlaces:
+        if not (url.startswith('http://') or url.startswith('https://')):
+            continue
+        if buscador.contiene(url) or buscador.contiene(texto):
+            enlaces_relevantes.append((texto, url) if con_texto else url)
+    return enlaces_relevantes
+
+
+@lru_cache(maxsize=8)
+def _buscador_rastreo(palabras):
+    return BuscadorPalabras(palabras + PALABRAS_CONCENTRADORAS)
+
+
+def puntuar_enlaces(enlaces, palabras):
+    """
+    Puntúa los enlaces relevantes para decidir cuáles seguir primero al rastrear un sitio.
+
+    Cada palabra clave distinta en el texto o la ruta del enlace suma 2 y
+    cada palabra de `PALABRAS_CONCENTRADORAS` suma 1.
+
+    Args:
+        enlaces (list): Pares (texto, URL absoluta) extraídos de la página.
+        palabras (tuple): Palabras clave del usuario.
+
+    Returns:
+        list: Pares (puntuación, URL) de los enlaces con alguna coincidencia.
+    """
+    claves = {normalizar(palabra).strip() for palabra in palabras}
+    buscador = _buscador_rastreo(tuple(palabras))
+    puntuados = []
+    for texto, url in obtener_enlaces_relevantes(enlaces, buscador, con_texto=True):
+        encontradas = {c.palabra for c in buscador.buscar(f"{texto} {_SEPARADORES_URL.sub(' ', url)}")}
+        puntuacion = sum(2 if normalizar(palabra).strip() in claves else 1 for palabra in encontradas)
+        puntuados.append((puntuacion, url))
+    return puntuados
+
+
+def puntuar_rutas(urls, palabras):
+    """
+    Puntúa URLs por las palabras clave de su ruta ("/canal-denuncias", "/whistleblowing").
+
+    Args:
+        urls (iterable): URLs absolutas, por ejemplo las de un sitemap.
+        palabras (tuple): Palabras clave del usuario.
+
+    Returns:
+        list: Pares (puntuación, URL) con alguna palabra clave, de mejor a peor;
+        a igual puntuación, primero las rutas más cortas.
+    """
+    buscador = BuscadorPalabras(palabras)
+    puntuadas = []
+    for url in urls:
+        try:
+            ruta = urlsplit(url).path
+        except ValueError:  # URL mal formada en el sitemap
+            continue
+        encontradas = {c.palabra for c in buscador.buscar(_SEPARADORES_URL.sub(" ", ruta))}
+        if encontradas:
+            puntuadas.append((len(encontradas), url))
+    puntuadas.sort(key=lambda par: (-par[0], len(par[1])))
+    return puntuadas
@@ -0,0 +1,610 @@
+"""
+Cola de trabajo para repartir un Excel entre varios procesos o máquinas.
+
+Un lote es un Excel repartido en shards de filas consecutivas. Cada
+trabajador toma un shard con una concesión de duración limitada, la renueva
+mientras lo procesa (latido) y al terminar publica los resultados de sus
+filas. Si un trabajador muere, su concesión vence y otro toma el shard. Las
+filas con errores de red o de la IA no se publican, como en el diario: el
+shard vuelve a la cola y el siguiente intento solo repite esas filas. Al
+final, los resultados se combinan en el orden original de la hoja.
+
+Hay dos almacenes con la misma interfaz: `ColaSQLite` (por defecto, para
+varios procesos en una máquina o como sustituto local) y `ColaRedis` (para
+varias máquinas; necesita el paquete redis).
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from webscraper_gpt.almacen import AlmacenSQLite, ruta_datos
+from webscraper_gpt.excel import EscritorExcel, LectorExcel
+from webscraper_gpt.procesamiento import Salida
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def _a_json(valores):
+    # Las celdas con fechas u otros tipos se guardan como texto
+    return json.dumps(list(valores), default=str)
+
+
+class ColaSQLite(AlmacenSQLite):
+    """
+    Cola de shards en SQLite.
+
+    Las concesiones se toman dentro de una transacción con escritura
+    reservada, así que varios procesos pueden compartir el archivo. Un shard
+    que ha fallado `max_intentos` veces se marca como fallido en lugar de
+    volver a repartirse.
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS lotes (
+            lote TEXT PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            cabecera TEXT NOT NULL,
+            columnas TEXT NOT NULL,
+            parametros TEXT NOT NULL,
+            creado REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS shards (
+            lote TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            filas TEXT NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            trabajador TEXT,
+            vence REAL,
+            intentos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (lote, shard)
+        );
+        CREATE INDEX IF NOT EXISTS shards_estado ON shards (lote, estado, vence);
+        CREATE TABLE IF NOT EXISTS resultados (
+            lote TEXT NOT NULL,
+            fila INTEGER NOT NULL,
+            valores TEXT NOT NULL,
+            PRIMARY KEY (lote, fila)
+        );
+    """
+
+    def __init__(self, ruta=None, max_intentos=3):
+        super().__init__(ruta or ruta_datos("cola.sqlite"))
+        self.max_intentos = max_intentos
+
+    def crear_lote(self, lote, descripcion, cabecera, columnas, parametros):
+        """Registra un lote; devuelve False si ya existía (y entonces no se vuelve a repartir)."""
+        with self.transaccion() as conexion:
+            cursor = conexion.execute(
+                "INSERT OR IGNORE INTO lotes VALUES (?, ?, ?, ?, ?, ?)",
+                (lote, descripcion, _a_json(cabecera), _a_json(columnas), _a_json(parametros), time.time()),
+            )
+        return cursor.rowcount > 0
+
+    def agregar_shards(self, lote, shards):
+        """
+        Añade pares (número de shard, lista de (fila, valores)).
+
+        Los shards que ya existen no se tocan, así que repartir dos veces el
+        mismo lote solo añade los que falten. Devuelve cuántos se añadieron.
+        """
+        with self.transaccion() as conexion:
+            cursor = conexion.executemany(
+                "INSERT OR IGNORE INTO shards (lote, shard, filas) VALUES (?, ?, ?)",
+                [(lote, numero, json.dumps(filas, default=str)) for numero, filas in shards],
+            )
+        return cursor.rowcount
+
+    def info(self, lote):
+        """Descripción, cabecera de entrada, columnas nuevas y parámetros del lote, o None."""
+        filas = self.consultar("SELECT descripcion, cabecera, columnas, parametros FROM lotes WHERE lote = ?", (lote,))
+        if not filas:
+            return None
+        descripcion, cabecera, columnas, parametros = filas[0]
+        return {
+            "descripcion": descripcion,
+            "cabecera": json.loads(cabecera),
+            "columnas": json.loads(columnas),
+            "parametros": json.loads(parametros),
+        }
+
+    def tomar(self, lote, trabajador, duracion):
+        """
+        Asigna al trabajador el primer shard libre o con la concesión vencida.
+
+        Args:
+            lote (str): Lote.
+            trabajador (str): Identificador del trabajador.
+            duracion (float): Segundos que dura la concesión si no se renueva.
+
+        Returns:
+            tuple: (número de shard, lista de (fila, valores)), o None si no queda ninguno libre.
+        """
+        ahora = time.time()
+        libre = "lote = ? AND (estado = 'pendiente' OR (estado = 'asignado' AND vence < ?))"
+        with self.transaccion() as conexion:
+            conexion.execute(
+                f"UPDATE shards SET estado = 'fallido' WHERE {libre} AND intentos >= ?", (lote, ahora, self.max_intentos)
+            )
+            fila = conexion.execute(
+                f"SELECT shard, filas FROM shards WHERE {libre} ORDER BY shard LIMIT 1", (lote, ahora)
+            ).fetchone()
+            if fila is None:
+                return None
+            conexion.execute(
+                "UPDATE shards SET estado = 'asignado', trabajador = ?, vence = ?, intentos = intentos + 1 "
+                "WHERE lote = ? AND shard = ?",
+                (trabajador, ahora + duracion, lote, fila[0]),
+            )
+        return fila[0], [(numero, tuple(valores)) for numero, valores in json.loads(fila[1])]
+
+    def renovar(self, lote, shard, trabajador, duracion):
+        """Latido: alarga la concesión. Devuelve False si el shard ya no es de este trabajador."""
+        with self.transaccion() as conexion:
+            cursor = conexion.execute(
+                "UPDATE shards SET vence = ? WHERE lote = ? AND shard = ? AND trabajador = ? AND estado = 'asignado'",
+                (time.time() + duracion, lote, shard, trabajador),
+            )
+        return cursor.rowcount > 0
+
+    def completar(self, lote, shard, trabajador, resultados):
+        """
+        Publica los resultados de un shard y lo da por terminado.
+
+        Se aceptan aunque la concesión haya vencido y otro trabajador tenga
+        el shard: los resultados de una fila son los mismos la procese quien
+        la procese, y así no se pierde trabajo ya hecho.
+        """
+        with self.transaccion() as conexion:
+            conexion.executemany(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?)",
+                [(lote, fila, _a_json(valores)) for fila, valores in resultados.items()],
+            )
+            conexion.execute(
+                "UPDATE shards SET estado = 'hecho', trabajador = ?, vence = NULL WHERE lote = ? AND shard = ?",
+                (trabajador, lote, shard),
+            )
+
+    def aplazar(self, lote, shard, trabajador, resultados):
+        """
+        Publica los resultados de las filas terminadas y devuelve el shard a
+        la cola para repetir las demás. Cuenta como un intento: tras
+        `max_intentos` el shard queda fallido con lo publicado hasta entonces.
+        """
+        with self.transaccion() as conexion:
+            conexion.executemany(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?)",
+                [(lote, fila, _a_json(valores)) for fila, valores in resultados.items()],
+            )
+            conexion.execute(
+                "UPDATE shards SET estado = 'pendiente', trabajador = NULL, vence = NULL "
+                "WHERE lote = ? AND shard = ? AND trabajador = ? AND estado = 'asignado'",
+                (lote, shard, trabajador),
+            )
+
+    def liberar(self, lote, shard, trabajador):
+        """Devuelve el shard a la cola (el trabajador falló o se detiene)."""
+        self.consultar(
+            "UPDATE shards SET estado = 'pendiente', trabajador = NULL, vence = NULL "
+            "WHERE lote = ? AND shard = ? AND trabajador = ? AND estado = 'asignado'",
+            (lote, shard, trabajador),
+        )
+
+    def estado(self, lote):
+        """Número de shards pendientes, asignados, hechos y fallidos, y el total."""
+        conteo = dict(self.consultar("SELECT estado, COUNT(*) FROM shards WHERE lote = ? GROUP BY estado", (lote,)))
+        estado = {nombre: conteo.get(nombre, 0) for nombre in ("pendiente", "asignado", "hecho", "fallido")}
+        estado["total"] = sum(conteo.values())
+        return estado
+
+    def resultados(self, lote, filas=None):
+        """Dict fila -> valores de las columnas nuevas, de todo el lote o solo de `filas`."""
+        if filas is None:
+            consulta = self.consultar("SELECT fila, valores FROM resultados WHERE lote = ?", (lote,))
+        elif not filas:
+            return {}
+        else:
+            # Las filas de un shard son consecutivas: basta un rango
+            filas = set(filas)
+            consulta = [
+                (fila, valores)
+                for fila, valores in self.consultar(
+                    "SELECT fila, valores FROM resultados WHERE lote = ? AND fila BETWEEN ? AND ?",
+                    (lote, min(filas), max(filas)),
+                )
+                if fila in filas
+            ]
+        return {fila: tuple(json.loads(valores)) for fila, valores in consulta}
+
+
+class ColaRedis:
+    """
+    La misma cola sobre Redis (o un servidor compatible), para trabajadores en varias máquinas.
+
+    Por lote se usan una lista de shards pendientes, un conjunto ordenado de
+    asignados puntuado por el vencimiento de la concesión y hashes con las
+    filas, los intentos, el dueño de cada shard y los resultados. Crear el
+    lote, añadir shards, tomar, renovar y liberar son scripts Lua, atómicos
+    en el servidor.
+    """
+
+    _TOMAR = """
+        local ahora = tonumber(ARGV[1])
+        for _, shard in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ahora)) do
+            redis.call('ZREM', KEYS[2], shard)
+            redis.call('RPUSH', KEYS[1], shard)
+        end
+        while true do
+            local shard = redis.call('LPOP', KEYS[1])
+            if not shard then
+                return false
+            end
+            if tonumber(redis.call('HGET', KEYS[4], shard) or '0') >= tonumber(ARGV[4]) then
+                redis.call('SADD', KEYS[5], shard)
+            else
+                redis.call('ZADD', KEYS[2], ahora + tonumber(ARGV[2]), shard)
+                redis.call('HSET', KEYS[3], shard, ARGV[3])
+                redis.call('HINCRBY', KEYS[4], shard, 1)
+                return shard
+            end
+        end
+    """
+    _RENOVAR = """
+        if redis.call('HGET', KEYS[2], ARGV[1]) == ARGV[2] and redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+            redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+            return 1
+        end
+        return 0
+    """
+    _LIBERAR = """
+        if redis.call('HGET', KEYS[2], ARGV[1]) == ARGV[2] and redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+            redis.call('RPUSH', KEYS[3], ARGV[1])
+        end
+    """
+    _AGREGAR = """
+        local nuevos = 0
+        for i = 1, #ARGV, 2 do
+            if redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1]) == 1 then
+                redis.call('RPUSH', KEYS[2], ARGV[i])
+                nuevos = nuevos + 1
+            end
+        end
+        return nuevos
+    """
+    _CREAR = """
+        if redis.call('HSETNX', KEYS[1], 'descripcion', ARGV[1]) == 0 then
+            return 0
+        end
+        redis.call('HSET', KEYS[1], 'cabecera', ARGV[2], 'columnas', ARGV[3], 'parametros', ARGV[4])
+        return 1
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", max_intentos=3, prefijo="webscraper_gpt"):
+        if redis is None:
+            raise ImportError("Instala redis para usar una cola en Redis")
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.max_intentos = max_intentos
+        self.prefijo = prefijo
+        self._tomar = self._redis.register_script(self._TOMAR)
+        self._renovar = self._redis.register_script(self._RENOVAR)
+        self._liberar = self._redis.register_script(self._LIBERAR)
+        self._agregar = self._redis.register_script(self._AGREGAR)
+        self._crear = self._redis.register_script(self._CREAR)
+
+    def _clave(self, lote, nombre):
+        return f"{self.prefijo}:{lote}:{nombre}"
+
+    def crear_lote(self, lote, descripcion, cabecera, columnas, parametros):
+        argumentos = [descripcion, _a_json(cabecera), _a_json(columnas), _a_json(parametros)]
+        return bool(self._crear(keys=[self._clave(lote, "lote")], args=argumentos))
+
+    def agregar_shards(self, lote, shards):
+        argumentos = [valor for numero, filas in shards for valor in (numero, json.dumps(filas, default=str))]
+        if not argumentos:
+            return 0
+        return self._agregar(keys=[self._clave(lote, "filas"), self._clave(lote, "pendientes")], args=argumentos)
+
+    def info(self, lote):
+        info = self._redis.hgetall(self._clave(lote, "lote"))
+        if not info:
+            return None
+        return {
+            "descripcion": info["descripcion"],
+            "cabecera": json.loads(info["cabecera"]),
+            "columnas": json.loads(info["columnas"]),
+            "parametros": json.loads(info["parametros"]),
+        }
+
+    def tomar(self, lote, trabajador, duracion):
+        claves = [self._clave(lote, nombre) for nombre in ("pendientes", "asignados", "trabajador", "intentos", "fallidos")]
+        shard = self._tomar(keys=claves, args=[time.time(), duracion, trabajador, self.max_intentos])
+        if not shard:
+            return None
+        filas = json.loads(self._redis.hget(self._clave(lote, "filas"), shard))
+        return int(shard), [(numero, tuple(valores)) for numero, valores in filas]
+
+    def renovar(self, lote, shard, trabajador, duracion):
+        claves = [self._clave(lote, "asignados"), self._clave(lote, "trabajador")]
+        return bool(self._renovar(keys=claves, args=[shard, trabajador, time.time() + duracion]))
+
+    def completar(self, lote, shard, trabajador, resultados):
+        tuberia = self._redis.pipeline()
+        if resultados:
+            tuberia.hset(
+                self._clave(lote, "resultados"),
+                mapping={fila: _a_json(valores) for fila, valores in resultados.items()},
+            )
+        tuberia.zrem(self._clave(lote, "asignados"), shard)
+        tuberia.lrem(self._clave(lote, "pendientes"), 0, shard)
+        tuberia.hset(self._clave(lote, "trabajador"), shard, trabajador)
+        tuberia.sadd(self._clave(lote, "hechos"), shard)
+        tuberia.execute()
+
+    def aplazar(self, lote, shard, trabajador, resultados):
+        if resultados:
+            self._redis.hset(
+                self._clave(lote, "resultados"),
+                mapping={fila: _a_json(valores) for fila, valores in resultados.items()},
+            )
+        self.liberar(lote, shard, trabajador)
+
+    def liberar(self, lote, shard, trabajador):
+        claves = [self._clave(lote, "asignados"), self._clave(lote, "trabajador"), self._clave(lote, "pendientes")]
+        self._liberar(keys=claves, args=[shard, trabajador])
+
+    def estado(self, lote):
+        return {
+            "pendiente": self._redis.llen(self._clave(lote, "pendientes")),
+            "asignado": self._redis.zcard(self._clave(lote, "asignados")),
+            "hecho": self._redis.scard(self._clave(lote, "hechos")),
+            "fallido": self._redis.scard(self._clave(lote, "fallidos")),
+            "total": self._redis.hlen(self._clave(lote, "filas")),
+        }
+
+    def resultados(self, lote, filas=None):
+        if filas is None:
+            guardados = self._redis.hgetall(self._clave(lote, "resultados")).items()
+        elif not filas:
+            return {}
+        else:
+            filas = list(filas)
+            guardados = zip(filas, self._redis.hmget(self._clave(lote, "resultados"), filas))
+        return {int(fila): tuple(json.loads(valores)) for fila, valores in guardados if valores is not None}
+
+
+def abrir_cola(direccion=None, max_intentos=3):
+    """
+    Abre la cola indicada.
+
+    Args:
+        direccion (str): URL redis://... o rediss://..., ruta de un archivo SQLite, o None para el de la carpeta de datos.
+        max_intentos (int): Veces que se reparte un shard antes de darlo por fallido.
+    """
+    if direccion and direccion.startswith(("redis://", "rediss://", "unix://")):
+        return ColaRedis(direccion, max_intentos=max_intentos)
+    return ColaSQLite(direccion, max_intentos=max_intentos)
+
+
+class LectorShard:
+    """Las filas de un shard con la interfaz de `LectorExcel` que usan los procesos."""
+
+    def __init__(self, cabecera, filas):
+        self.cabecera = list(cabecera)
+        self._filas = filas
+
+    @property
+    def filas_estimadas(self):
+        return len(self._filas)
+
+    def columna(self, nombre):
+        return next((indice for indice, valor in enumerate(self.cabecera) if valor == nombre), None)
+
+    def filas(self):
+        return iter(self._filas)
+
+
+class _ResultadosShard:
+    """
+    Recoge los resultados de un shard en lugar de escribirlos en un Excel.
+
+    Hace de escritor y de diario para `Salida`: como en el diario, solo se
+    registran las filas terminadas, no las que hay que reintentar. `hechas`
+    son las filas ya publicadas en intentos anteriores del shard.
+    """
+
+    def __init__(self, hechas=None):
+        self.hechas = dict(hechas or {})
+        self.resultados = {}
+        self.pendientes = set()
+
+    def original(self, fila, valores):
+        pass
+
+    def completar(self, fila, *valores):
+        if fila not in self.resultados and fila not in self.hechas:
+            self.pendientes.add(fila)
+
+    def registrar(self, fila, *valores):
+        self.pendientes.discard(fila)
+        self.resultados[fila] = valores
+
+
+def repartir(cola, proceso, origen, lote, tam_shard=100, descripcion=""):
+    """
+    Reparte las filas de un Excel en shards de la cola.
+
+    De cada fila solo se guardan las columnas que usa el proceso; el resto
+    se vuelve a leer del Excel original al combinar. Se puede repetir: si
+    un reparto anterior se interrumpió, solo se añaden los shards que
+    faltan (con el mismo `tam_shard`, los números de shard coinciden).
+
+    Args:
+        cola: `ColaSQLite` o `ColaRedis`.
+        proceso (Proceso): Proceso que ejecutarán los trabajadores.
+        origen: Ruta del Excel de entrada.
+        lote (str): Identificador del lote (p. ej. `huella_archivo(origen, *proceso.parametros())`).
+        tam_shard (int): Filas por shard.
+        descripcion (str): Texto para identificar el lote.
+
+    Returns:
+        int: Número de shards añadidos (0 si el lote ya estaba repartido del todo).
+
+    Raises:
+        ValueError: Si falta alguna de las columnas de entrada.
+    """
+    with LectorExcel(origen) as lector:
+        indices = proceso.indices_entrada(lector)
+        cola.crear_lote(lote, descripcion, proceso.columnas_entrada(), proceso.columnas, proceso.parametros())
+        numero, nuevos, actual = 0, 0, []
+        for fila, valores in lector.filas():
+            actual.append((fila, [valores[indice] for indice in indices]))
+            if len(actual) >= tam_shard:
+                nuevos += cola.agregar_shards(lote, [(numero, actual)])
+                numero, actual = numero + 1, []
+        if actual:
+            nuevos += cola.agregar_shards(lote, [(numero, actual)])
+    return nuevos
+
+
+class _Latido(threading.Thread):
+    """Renueva la concesión de un shard mientras se procesa."""
+
+    def __init__(self, cola, lote, shard, trabajador, duracion):
+        super().__init__(name=f"latido-{shard}", daemon=True)
+        self.cola = cola
+        self.args_cola = (lote, shard, trabajador, duracion)
+        self.duracion = duracion
+        self.parar = threading.Event()
+        self.perdida = False
+
+    def run(self):
+        while not self.parar.wait(self.duracion / 3):
+            if not self.cola.renovar(*self.args_cola):
+                logging.warning(f"Se perdió la concesión del shard {self.args_cola[1]}; otro trabajador puede tomarlo.")
+                self.perdida = True
+                return
+
+
+class Trabajador:
+    """
+    Consume shards de un lote hasta que no quede ninguno por hacer.
+
+    Cuando no hay shards libres pero otros trabajadores tienen alguno
+    asignado, espera: si alguno de ellos muere, su concesión vence y este
+    trabajador la recoge.
+
+    Las filas con errores de red o de la IA no se publican: el shard vuelve a
+    la cola con el resto de filas ya publicadas (ver `ColaSQLite.aplazar`).
+
+    Args:
+        cola: `ColaSQLite` o `ColaRedis`.
+        lote (str): Lote a procesar.
+        proceso (Proceso): Configurado con los mismos parámetros con los que se repartió el lote.
+        duracion (float): Segundos de cada concesión; el latido la renueva cada tercio.
+        espera (float): Segundos entre comprobaciones cuando no hay shards libres.
+        identificador (str): Nombre del trabajador; por defecto, máquina y PID.
+    """
+
+    def __init__(self, cola, lote, proceso, duracion=120, espera=5, identificador=None):
+        self.cola = cola
+        self.lote = lote
+        self.proceso = proceso
+        self.duracion = duracion
+        self.espera = espera
+        self.identificador = identificador or f"{socket.gethostname()}-{os.getpid()}"
+        self.info = cola.info(lote)
+        if self.info is None:
+            raise ValueError(f"No existe el lote '{lote}'.")
+        if list(proceso.parametros()) != self.info["parametros"]:
+            raise ValueError("El proceso no tiene la misma configuración con la que se repartió el lote.")
+
+    def procesar_shard(self, shard, filas):
+        """
+        Procesa un shard; las filas ya publicadas en un intento anterior no se repiten.
+
+        Returns:
+            tuple: (dict fila -> valores de las columnas nuevas, filas que hay que reintentar).
+        """
+        recogidos = _ResultadosShard(self.cola.resultados(self.lote, [fila for fila, _ in filas]))
+        self.proceso.procesar(LectorShard(self.info["cabecera"], filas), Salida(recogidos, recogidos))
+        return recogidos.resultados, recogidos.pendientes
+
+    def ejecutar(self):
+        """
+        Procesa shards hasta terminar el lote.
+
+        Returns:
+            int: Shards procesados por este trabajador.
+        """
+        hechos = 0
+        while True:
+            tarea = self.cola.tomar(self.lote, self.identificador, self.duracion)
+            if tarea is None:
+                estado = self.cola.estado(self.lote)
+                if not estado["pendiente"] and not estado["asignado"]:
+                    return hechos
+                time.sleep(self.espera)
+                continue
+
+            shard, filas = tarea
+            logging.info(f"{self.identificador}: shard {shard} ({len(filas)} filas)")
+            latido = _Latido(self.cola, self.lote, shard, self.identificador, self.duracion)
+            latido.start()
+            try:
+                resultados, reintentar = self.procesar_shard(shard, filas)
+            except Exception:
+                logging.exception(f"Error en el shard {shard}; se devuelve a la cola.")
+                self.cola.liberar(self.lote, shard, self.identificador)
+                continue
+            finally:
+                latido.parar.set()
+                latido.join()
+            if reintentar:
+                logging.warning(f"Shard {shard}: {len(reintentar)} filas con errores de red o de la IA; se devuelve a la cola.")
+                self.cola.aplazar(self.lote, shard, self.identificador, resultados)
+                continue
+            self.cola.completar(self.lote, shard, self.identificador, resultados)
+            hechos += 1
+
+    def resumen(self):
+        estado = self.cola.estado(self.lote)
+        return (
+            f"Lote {self.lote[:12]}: {estado['hecho']} de {estado['total']} shards hechos, "
+            f"{estado['asignado']} en curso, {estado['pendiente']} pendientes y {estado['fallido']} fallidos."
+        )
+
+
+def combinar(cola, lote, origen, ruta=None):
+    """
+    Escribe el Excel de salida de un lote en el orden original de las filas.
+
+    Las filas sin resultado (shards fallidos o aún sin hacer) quedan con las
+    columnas nuevas vacías.
+
+    Args:
+        cola: `ColaSQLite` o `ColaRedis`.
+        lote (str): Lote.
+        origen: El Excel de entrada que se repartió.
+        ruta (str): Archivo de destino; por defecto, uno temporal.
+
+    Returns:
+        tuple: (ruta del archivo guardado, número de filas sin resultado).
+    """
+    info = cola.info(lote)
+    if info is None:
+        raise ValueError(f"No existe el lote '{lote}'.")
+    resultados = cola.resultados(lote)
+    sin_resultado = 0
+    with LectorExcel(origen) as lector:
+        escritor = EscritorExcel(lector.cabecera, info["columnas"], lector=lector)
+        for fila, valores in lector.filas():
+            escritor.original(fila, valores)
+            if fila not in resultados:
+                sin_resultado += 1
+            escritor.completar(fila, *resultados.get(fila, ()))
+    return escritor.guardar(ruta), sin_resultado
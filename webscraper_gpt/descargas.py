@@ -0,0 +1,329 @@
+"""Motor de descargas concurrentes basado en asyncio y aiohttp."""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+import aiohttp
+
+from webscraper_gpt.planificador import ESTADOS_SATURACION, PlanificadorHosts, host_de
+from webscraper_gpt.transporte import obtener_transporte
+
+# Tipos de contenido que merece la pena descargar y analizar
+TIPOS_PERMITIDOS = ("text/html", "application/xhtml+xml", "text/plain")
+
+# Tamaño de los trozos leídos de la red
+TAM_TROZO = 64 * 1024
+
+# Headers para simular un navegador
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+@dataclass
+class Respuesta:
+    """Resultado de una descarga correcta."""
+    url: str
+    estado: int
+    contenido: bytes
+    cabeceras: dict
+    desde_cache: bool = False
+    detenida: bool = False
+
+    @property
+    def codificacion(self):
+        """Charset declarado en la cabecera Content-Type, o None."""
+        return _tipo_y_codificacion(cabecera(self.cabeceras, "Content-Type"))[1]
+
+
+def cabecera(cabeceras, nombre):
+    """Busca una cabecera sin distinguir mayúsculas de minúsculas."""
+    nombre = nombre.lower()
+    return next((valor for clave, valor in cabeceras.items() if clave.lower() == nombre), None)
+
+
+def _tipo_y_codificacion(content_type):
+    """Separa el tipo MIME y el charset de una cabecera Content-Type."""
+    partes = [parte.strip() for parte in (content_type or "").split(";")]
+    codificacion = None
+    for parte in partes[1:]:
+        if parte.lower().startswith("charset="):
+            codificacion = parte[len("charset="):].strip("\"'") or codificacion
+    return partes[0].lower(), codificacion
+
+
+@dataclass
+class ConfiguracionDescargas:
+    """Parámetros del motor de descargas."""
+    max_concurrencia: int = 50
+    max_por_host: int = 4
+    retraso_por_host: float = 0
+    por_dominio: bool = True
+    reintentos: int = 2
+    timeout: float = 30
+    timeout_conexion: float = 3
+    timeout_lectura: float = 10
+    carrera: bool = True
+    retraso_carrera: float = 0.25
+    sin_conexion: bool = False
+    max_bytes: int = 2 * 1024 * 1024
+    tipos_permitidos: tuple = TIPOS_PERMITIDOS
+    verificar_ssl: bool = False
+    headers: dict = field(default_factory=lambda: dict(HEADERS))
+
+
+def candidatos_url(url, incluir_www=True):
+    """
+    Genera las URLs a probar para una dirección del Excel.
+
+    Si la dirección ya trae esquema se usa tal cual. Si no, se prueban https y
+    http y, opcionalmente, las mismas con el prefijo `www.`. El orden indica la
+    preferencia: https antes que http y el dominio original antes que `www.`.
+
+    Args:
+        url (str): Dirección tal y como aparece en el Excel.
+        incluir_www (bool): Si se añaden las variantes con `www.`.
+
+    Returns:
+        list: URLs candidatas en orden de preferencia.
+    """
+    url = url.strip()
+    if url.startswith("http://") or url.startswith("https://"):
+        return [url]
+
+    candidatos = [f"https://{url}", f"http://{url}"]
+    if incluir_www and not url.startswith("www."):
+        candidatos += [f"https://www.{url}", f"http://www.{url}"]
+    return candidatos
+
+
+class MotorDescargas:
+    """
+    Descarga muchas URLs a la vez respetando un límite global y otro por dominio.
+
+    Cada trabajo se identifica con una clave (por ejemplo, el número de fila del
+    Excel) y contiene una lista de URLs candidatas que se prueban en orden hasta
+    que una responde correctamente. Las conexiones salen del transporte
+    compartido, por lo que se reutilizan entre llamadas y entre páginas.
+
+    En modo carrera las candidatas se lanzan escalonadas, al estilo happy
+    eyeballs, y se conserva la primera respuesta correcta.
+
+    Con una `CacheHTTP` las páginas frescas no salen a la red, las caducadas
+    se revalidan y, en modo sin conexión, solo se usa lo que haya en caché.
+
+    Las peticiones a un mismo dominio pasan por el `PlanificadorHosts` del
+    lote, que adapta su concurrencia y su ritmo a cómo responde el servidor;
+    las respuestas 429/503 se reintentan hasta `reintentos` veces cuando el
+    planificador lo permite.
+
+    El cuerpo se lee por trozos hasta `max_bytes`; los binarios (PDF,
+    imágenes...) se descartan por su Content-Type y, si se indica un
+    detector, la lectura se corta en cuanto este encuentra lo que busca.
+    """
+
+    def __init__(self, config=None, transporte=None, cache=None):
+        self.config = config or ConfiguracionDescargas()
+        self.transporte = transporte or obtener_transporte()
+        self.cache = cache
+
+    async def _desde_cache(self, candidatos):
+        """
+        Busca las candidatas en la caché, cada una una sola vez.
+
+        Returns:
+            tuple: (respuesta de la primera candidata servible sin ir a la red, o None;
+            dict URL -> entrada caducada, para revalidarla al descargar).
+        """
+        caducadas = {}
+        if not self.cache:
+            return None, caducadas
+        for url in candidatos:
+            # SQLite y zlib fuera del bucle: una caché bloqueada no debe frenar las demás descargas
+            entrada = await asyncio.to_thread(self.cache.obtener, url)
+            if entrada and (self.config.sin_conexion or entrada.fresca(self.cache.ttl)):
+                return entrada.respuesta(), caducadas
+            if entrada:
+                caducadas[url] = entrada
+        return None, caducadas
+
+    async def _leer_cuerpo(self, response, url, crear_detector):
+        """Lee el cuerpo por trozos respetando el presupuesto de bytes y el detector."""
+        tipo, codificacion = _tipo_y_codificacion(response.headers.get("Content-Type"))
+        if tipo and tipo not in self.config.tipos_permitidos:
+            logging.warning(f"Contenido {tipo} en {url}: se omite la descarga")
+            return None, False
+
+        detector = crear_detector(codificacion or "utf-8") if crear_detector else None
+        partes = []
+        leidos = 0
+        async for trozo in response.content.iter_chunked(TAM_TROZO):
+            trozo = trozo[:self.config.max_bytes - leidos]
+            partes.append(trozo)
+            leidos += len(trozo)
+            if detector and detector.alimentar(trozo):
+                return b"".join(partes), True
+            if leidos >= self.config.max_bytes:
+                logging.info(f"{url} supera {self.config.max_bytes} bytes: se analiza solo el principio")
+                break
+        return b"".join(partes), False
+
+    async def _descargar(self, url, semaforo, planificador, crear_detector=None, entrada=None):
+        """Descarga una URL; con la `entrada` caducada de la caché, la petición es condicional."""
+        headers = dict(self.config.headers)
+        if entrada and entrada.etag:
+            headers["If-None-Match"] = entrada.etag
+        if entrada and entrada.ultima_modificacion:
+            headers["If-Modified-Since"] = entrada.ultima_modificacion
+
+        bucle = asyncio.get_running_loop()
+        for intento in range(self.config.reintentos + 1):
+            # Primero el turno del dominio y después el hueco global: esperar a un
+            # dominio saturado no debe ocupar una de las descargas del lote
+            async with planificador.turno(url) as turno, semaforo:
+                inicio = bucle.time()
+                try:
+                    async with self.transporte.sesion.get(
+                        url,
+                        headers=headers,
+                        timeout=aiohttp.ClientTimeout(
+                            total=self.config.timeout,
+                            sock_connect=self.config.timeout_conexion,
+                            sock_read=self.config.timeout_lectura,
+                        ),
+                        ssl=None if self.config.verificar_ssl else False,
+                    ) as response:
+                        turno.registrar(response.status, bucle.time() - inicio, response.headers.get("Retry-After"))
+                        if response.status in ESTADOS_SATURACION and intento < self.config.reintentos:
+                            logging.warning(f"{url} respondió {response.status}: se reintenta cuando el dominio lo permita")
+                            continue
+                        if response.status == 304 and entrada:
+                            await asyncio.to_thread(self.cache.revalidada, url)
+                            return entrada.respuesta()
+                        response.raise_for_status()
+                        contenido, detenida = await self._leer_cuerpo(response, url, crear_detector)
+                        if contenido is None:
+                            return None
+                        respuesta = Respuesta(
+                            str(response.url), response.status, contenido, dict(response.headers), detenida=detenida
+                        )
+                        break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        turno.registrar(timeout=True)
+                    logging.error(f"Error al acceder a {url}: {e!r}")
+                    return None
+
+        # Una página cortada por el detector depende de las palabras buscadas: no se guarda
+        if self.cache and not respuesta.detenida:
+            await asyncio.to_thread(self.cache.guardar, url, respuesta)
+        return respuesta
+
+    async def _resolubles(self, candidatos):
+        """Candidatas cuyo dominio existe: las de dominios inexistentes se descartan sin conectar."""
+        resolutor = self.transporte.resolutor
+        existen = await asyncio.gather(*(resolutor.existe(host_de(url)) for url in candidatos))
+        return [url for url, existe in zip(candidatos, existen) if existe]
+
+    async def _comprobar_todo(self, trabajos):
+        claves = list(trabajos)
+        vivas = await asyncio.gather(*(self._resolubles(trabajos[clave]) for clave in claves))
+        return {clave: bool(urls) for clave, urls in zip(claves, vivas)}
+
+    def comprobar_dominios(self, trabajos):
+        """
+        Comprobación previa por DNS de muchos trabajos a la vez, sin descargar nada.
+
+        Args:
+            trabajos (dict): Clave -> lista de URLs candidatas.
+
+        Returns:
+            dict: Clave -> False si ninguna candidata tiene un dominio que exista.
+        """
+        return self.transporte.ejecutar(self._comprobar_todo(trabajos))
+
+    def crear_limites(self):
+        """Crea el semáforo global y el planificador por dominio de un lote."""
+        planificador = PlanificadorHosts(
+            self.config.max_por_host,
+            retraso_minimo=self.config.retraso_por_host,
+            por_dominio=self.config.por_dominio,
+        )
+        return asyncio.Semaphore(self.config.max_concurrencia), planificador
+
+    async def descargar(self, candidatos, semaforo, planificador, crear_detector=None):
+        """Descarga la primera candidata que responda (en carrera o en orden)."""
+        # Una URL mal formada ("http://[roto") no se puede pedir: queda como error de acceso de su fila
+        candidatos = [url for url in candidatos if host_de(url)]
+        if not candidatos:
+            return None
+        respuesta, caducadas = await self._desde_cache(candidatos)
+        if respuesta or self.config.sin_conexion:
+            return respuesta
+
+        candidatos = await self._resolubles(candidatos)
+        if not candidatos:
+            return None
+
+        if self.config.carrera and len(candidatos) > 1:
+            return await self._carrera(candidatos, semaforo, planificador, crear_detector, caducadas)
+
+        for url in candidatos:
+            respuesta = await self._descargar(url, semaforo, planificador, crear_detector, caducadas.get(url))
+            if respuesta:
+                return respuesta
+        return None
+
+    async def _carrera(self, candidatos, semaforo, planificador, crear_detector=None, caducadas=None):
+        """Lanza las candidatas escalonadas y cancela el resto en cuanto una responde."""
+        tareas = []
+        pendientes = set()
+        try:
+            for url in candidatos:
+                tarea = asyncio.ensure_future(
+                    self._descargar(url, semaforo, planificador, crear_detector, (caducadas or {}).get(url))
+                )
+                tareas.append(tarea)
+                pendientes.add(tarea)
+
+                # Ventaja para las candidatas preferidas antes de lanzar la siguiente
+                hechas, pendientes = await asyncio.wait(
+                    pendientes, timeout=self.config.retraso_carrera, return_when=asyncio.FIRST_COMPLETED
+                )
+                for hecha in hechas:
+                    if hecha.result():
+                        return hecha.result()
+
+            while pendientes:
+                hechas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for hecha in hechas:
+                    if hecha.result():
+                        return hecha.result()
+            return None
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+
+    async def descargar_todo(self, trabajos, crear_detector=None):
+        """
+        Descarga todos los trabajos de forma concurrente.
+
+        Args:
+            trabajos (dict): Clave -> lista de URLs candidatas.
+            crear_detector (callable): Recibe la codificación de la página y devuelve
+                un objeto con `alimentar(trozo) -> bool` para cortar la lectura.
+
+        Returns:
+            dict: Clave -> Respuesta, o None si ninguna candidata respondió.
+        """
+        semaforo, planificador = self.crear_limites()
+        claves = list(trabajos)
+        respuestas = await asyncio.gather(*(
+            self.descargar(trabajos[clave], semaforo, planificador, crear_detector)
+            for clave in claves
+        ))
+        return dict(zip(claves, respuestas))
+
+    def descargar_filas(self, trabajos, crear_detector=None):
+        """Versión síncrona de `descargar_todo` para usar desde Streamlit."""
+        return self.transporte.ejecutar(self.descargar_todo(trabajos, crear_detector))
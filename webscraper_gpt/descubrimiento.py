@@ -0,0 +1,211 @@
+"""Descubrimiento de páginas candidatas con robots.txt y sitemap.xml."""
+import asyncio
+import dataclasses
+import logging
+import xml.etree.ElementTree as ET
+import zlib
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from webscraper_gpt.analisis import decodificar
+from webscraper_gpt.cache import normalizar_url
+from webscraper_gpt.coincidencias import puntuar_rutas
+from webscraper_gpt.descargas import MotorDescargas
+from webscraper_gpt.pipeline import ResultadoPipeline
+from webscraper_gpt.rastreador import mismo_sitio, sitio_de
+
+# Tipos con los que se sirven los sitemaps, además de los de las páginas
+TIPOS_SITEMAP = ("application/xml", "text/xml", "application/gzip", "application/x-gzip", "application/octet-stream")
+
+# Bytes leídos de cada sitemap, descargado o descomprimido. El protocolo admite hasta
+# 50 MB, pero las URLs con las palabras clave suelen estar entre las primeras
+MAX_BYTES_SITEMAP = 10 * 1024 * 1024
+
+
+def leer_sitemap(contenido, max_bytes=MAX_BYTES_SITEMAP):
+    """
+    Extrae las URLs de un sitemap o de un índice de sitemaps, comprimido o no.
+
+    Un .gz se descomprime como mucho hasta `max_bytes` (un sitemap comprimido
+    de pocos KB puede ocupar gigas al descomprimirlo). Si el XML queda
+    cortado, se devuelven las URLs leídas hasta ese punto.
+
+    Args:
+        contenido (bytes): Cuerpo descargado.
+        max_bytes (int): Tamaño máximo del XML descomprimido.
+
+    Returns:
+        tuple: (URLs de sitemaps hijos, URLs de páginas).
+    """
+    if contenido[:2] == b"\x1f\x8b":
+        descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            contenido = descompresor.decompress(contenido, max_bytes)
+        except zlib.error:
+            return [], []
+        if descompresor.unconsumed_tail:
+            logging.warning(f"Sitemap de más de {max_bytes} bytes descomprimido: se lee solo el principio")
+    contenido = contenido[:max_bytes]
+
+    sitemaps, paginas = [], []
+    lector = ET.XMLPullParser(events=("start", "end"))
+    es_indice = None
+    try:
+        lector.feed(contenido)
+        for evento, elemento in lector.read_events():
+            etiqueta = elemento.tag.rsplit("}", 1)[-1]
+            if es_indice is None:
+                es_indice = etiqueta == "sitemapindex"
+            if evento == "end" and etiqueta == "loc" and elemento.text:
+                (sitemaps if es_indice else paginas).append(elemento.text.strip())
+    except ET.ParseError:
+        pass
+    return sitemaps, paginas
+
+
+class Descubridor:
+    """
+    Busca la página objetivo en el sitemap cuando la portada no basta.
+
+    Primero se analiza la portada, igual que sin descubrimiento; si no es un
+    hallazgo, se leen robots.txt y los sitemaps que declara (o /sitemap.xml
+    si no declara ninguno), siguiendo los índices y descomprimiendo los .gz.
+    Las URLs listadas se puntúan por las palabras clave de su ruta y solo se
+    descargan las `max_candidatas` mejores que robots.txt permite. Si
+    ninguna es un hallazgo, se recurre al `rastreador` o, sin él, se
+    devuelve el análisis de la portada.
+
+    El robots.txt de cada sitio se lee una vez para todos los trabajos, y su
+    Crawl-delay (hasta `max_espera` segundos) se aplica en el planificador
+    del lote a todas las peticiones a ese sitio, las del rastreo incluidas.
+
+    Tiene la misma interfaz que `Rastreador`, así que el pipeline lo usa igual.
+    """
+
+    def __init__(self, motor, palabras, rastreador=None, max_candidatas=3, max_sitemaps=5,
+                 max_espera=10, backend="auto", es_hallazgo=bool):
+        self.motor = motor
+        self.palabras = tuple(palabras)
+        self.rastreador = rastreador
+        self.max_candidatas = max_candidatas
+        self.max_sitemaps = max_sitemaps
+        self.max_espera = max_espera
+        self.backend = backend
+        self.es_hallazgo = es_hallazgo
+        self.agente = motor.config.headers.get("User-Agent", "*")
+        # Mismo transporte, caché y límites, pero admite XML y gzip y sin carrera de candidatas
+        config = dataclasses.replace(
+            motor.config,
+            tipos_permitidos=tuple(motor.config.tipos_permitidos) + TIPOS_SITEMAP,
+            carrera=False,
+            max_bytes=MAX_BYTES_SITEMAP,
+        )
+        self.motor_sitemaps = MotorDescargas(config, motor.transporte, motor.cache)
+        # Origen -> tarea que lee su robots.txt, compartida por los trabajos del mismo sitio
+        self._robots = {}
+
+    async def _leer_robots(self, origen, semaforo, planificador):
+        robots = RobotFileParser(f"{origen}/robots.txt")
+        respuesta = await self.motor_sitemaps.descargar([robots.url], semaforo, planificador)
+        # Sin robots.txt todo está permitido
+        robots.parse(decodificar(respuesta.contenido, respuesta.codificacion).splitlines() if respuesta else [])
+        return robots
+
+    async def _robots_de(self, origen, semaforo, planificador):
+        tarea = self._robots.get(origen)
+        if tarea is None or (tarea.done() and (tarea.cancelled() or tarea.exception())):
+            tarea = self._robots[origen] = asyncio.ensure_future(self._leer_robots(origen, semaforo, planificador))
+        robots = await asyncio.shield(tarea)
+        espera = min(float(robots.crawl_delay(self.agente) or 0), self.max_espera)
+        if espera:
+            planificador.fijar_retraso(origen, espera)
+        return robots
+
+    async def _urls_de_sitemaps(self, origen, robots, pool, semaforo, planificador):
+        bucle = asyncio.get_running_loop()
+        pendientes = list(robots.site_maps() or [f"{origen}/sitemap.xml"])
+        vistos = set()
+        urls = []
+        while pendientes and len(vistos) < self.max_sitemaps:
+            sitemap = pendientes.pop(0)
+            if sitemap in vistos:
+                continue
+            vistos.add(sitemap)
+            respuesta = await self.motor_sitemaps.descargar([sitemap], semaforo, planificador)
+            if respuesta is None:
+                continue
+            try:
+                hijos, paginas = await bucle.run_in_executor(pool, leer_sitemap, respuesta.contenido)
+            except Exception as e:
+                logging.warning(f"Sitemap ilegible en {sitemap}: {e!r}")
+                continue
+            pendientes += hijos
+            urls += paginas
+        return urls
+
+    async def _analizar(self, clave, respuesta, analizar, pool):
+        try:
+            analisis = await asyncio.get_running_loop().run_in_executor(
+                pool, analizar, respuesta.contenido, respuesta.url, respuesta.codificacion
+            )
+        except Exception as e:
+            logging.error(f"Error al analizar {respuesta.url}: {e!r}")
+            return ResultadoPipeline(clave, respuesta.url, error=f"Error al analizar: {e}")
+        return ResultadoPipeline(clave, respuesta.url, analisis)
+
+    async def _portada(self, clave, raiz, analizar, pool, semaforo, planificador, crear_detector):
+        """Analiza la portada; con rastreador, también sus enlaces, para no repetirlo al rastrear."""
+        if not self.rastreador:
+            return await self._analizar(clave, raiz, analizar, pool), None
+        try:
+            pagina = await self.rastreador.visitar(raiz.url, raiz, analizar, pool, semaforo, planificador, crear_detector)
+        except Exception as e:
+            logging.error(f"Error al analizar {raiz.url}: {e!r}")
+            return ResultadoPipeline(clave, raiz.url, error=f"Error al analizar: {e}"), None
+        url, analisis, _ = pagina
+        return ResultadoPipeline(clave, url, analisis), pagina
+
+    async def rastrear(self, clave, candidatos, analizar, pool, semaforo, planificador, crear_detector=None):
+        """
+        Analiza la portada de un trabajo del pipeline y, si no basta, descubre otras páginas.
+
+        Returns:
+            ResultadoPipeline: El de la portada si es un hallazgo; si no, el de
+            la primera candidata del sitemap que lo sea o, si no la hay, el del
+            rastreo o la portada.
+        """
+        raiz = await self.motor.descargar(candidatos, semaforo, planificador, crear_detector)
+        if raiz is None:
+            return ResultadoPipeline(clave, error="Error al acceder")
+
+        portada, pagina_raiz = await self._portada(clave, raiz, analizar, pool, semaforo, planificador, crear_detector)
+        if portada.error or self.es_hallazgo(portada.analisis):
+            return portada
+
+        partes = urlsplit(raiz.url)
+        origen = f"{partes.scheme}://{partes.netloc}"
+        robots = await self._robots_de(origen, semaforo, planificador)
+
+        urls = await self._urls_de_sitemaps(origen, robots, pool, semaforo, planificador)
+        vista = normalizar_url(raiz.url)
+        candidatas = [
+            url for _, url in puntuar_rutas(urls, self.palabras)
+            if mismo_sitio(url, sitio_de(raiz.url)) and robots.can_fetch(self.agente, url) and normalizar_url(url) != vista
+        ][:self.max_candidatas]
+        if candidatas:
+            logging.info(f"{origen}: {len(urls)} URLs en el sitemap, se prueban {candidatas}")
+
+        for url in candidatas:
+            respuesta = await self.motor.descargar([url], semaforo, planificador, crear_detector)
+            if respuesta is None:
+                continue
+            resultado = await self._analizar(clave, respuesta, analizar, pool)
+            if not resultado.error and self.es_hallazgo(resultado.analisis):
+                return resultado
+
+        if self.rastreador:
+            return await self.rastreador.rastrear(
+                clave, candidatos, analizar, pool, semaforo, planificador, crear_detector,
+                raiz=raiz, robots=robots, pagina_raiz=pagina_raiz,
+            )
+        return portada
@@ -0,0 +1,268 @@
+"""Peticiones concurrentes al LLM limitadas por peticiones y tokens por minuto."""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import aiohttp
+
+from webscraper_gpt.transporte import obtener_transporte
+
+URL_OPENAI = "https://api.openai.com/v1"
+
+# Tokens de respuesta cuando la llamada no indica max_tokens (lo mismo que langchain)
+MAX_TOKENS_POR_DEFECTO = 256
+
+
+def estimar_tokens(texto):
+    """Estimación barata del número de tokens: unos 4 caracteres por token."""
+    return len(texto) // 4 + 1
+
+
+def futuro_resuelto(valor):
+    """Future ya completado con `valor`."""
+    futuro = Future()
+    futuro.set_result(valor)
+    return futuro
+
+
+def enviar_a(llm, prompt, max_tokens=None):
+    """
+    Envía un prompt a cualquier LLM y devuelve un Future con la respuesta.
+
+    Si el LLM no sabe enviar peticiones en segundo plano (no tiene `enviar`),
+    se llama en el momento y se devuelve el Future ya resuelto.
+    """
+    if hasattr(llm, "enviar"):
+        return llm.enviar(prompt, max_tokens=max_tokens)
+    try:
+        return futuro_resuelto(llm(prompt, max_tokens=max_tokens) if max_tokens else llm(prompt))
+    except Exception as e:
+        futuro = Future()
+        futuro.set_exception(e)
+        return futuro
+
+
+def combinar(futuros, funcion):
+    """
+    Future que se completa con `funcion(resultados)` cuando terminan todos los `futuros`.
+
+    Los resultados se pasan en el mismo orden que los futuros; si alguno
+    falla, el Future combinado falla con la misma excepción, y si alguno se
+    cancela, se cancela también.
+    """
+    futuros = list(futuros)
+    combinado = Future()
+    pendientes = [len(futuros)]
+    # Los futuros pueden terminar a la vez en hilos distintos
+    cerrojo = threading.Lock()
+
+    def al_terminar(_):
+        with cerrojo:
+            pendientes[0] -= 1
+            if pendientes[0]:
+                return
+        if any(futuro.cancelled() for futuro in futuros):
+            combinado.cancel()
+            return
+        try:
+            combinado.set_result(funcion([futuro.result() for futuro in futuros]))
+        except Exception as e:
+            combinado.set_exception(e)
+
+    if not futuros:
+        combinado.set_result(funcion([]))
+    for futuro in futuros:
+        futuro.add_done_callback(al_terminar)
+    return combinado
+
+
+def encadenar(futuro, siguiente):
+    """
+    Future con el resultado de `siguiente(resultado de futuro)`, que a su vez devuelve un Future.
+
+    Sirve para lanzar una petición que depende de otras sin bloquear ningún
+    hilo esperándolas. Si cualquiera de los dos se cancela, se cancela también.
+    """
+    encadenado = Future()
+
+    def copiar(origen):
+        if origen.cancelled():
+            encadenado.cancel()
+        elif origen.exception() is not None:
+            encadenado.set_exception(origen.exception())
+        else:
+            encadenado.set_result(origen.result())
+
+    def al_terminar(origen):
+        if origen.cancelled() or origen.exception() is not None:
+            copiar(origen)
+            return
+        try:
+            siguiente(origen.result()).add_done_callback(copiar)
+        except Exception as e:
+            encadenado.set_exception(e)
+
+    futuro.add_done_callback(al_terminar)
+    return encadenado
+
+
+class ErrorLLM(Exception):
+    """La API del LLM no devolvió una respuesta válida tras los reintentos."""
+
+
+class CuboTokens:
+    """
+    Cubo de tokens para asyncio: se rellena a `por_minuto / 60` unidades por
+    segundo hasta `por_minuto` y cada petición espera hasta poder retirar
+    lo que cuesta.
+    """
+
+    def __init__(self, por_minuto):
+        self.capacidad = por_minuto
+        self.ritmo = por_minuto / 60
+        self.disponible = por_minuto
+        self.actualizado = time.monotonic()
+
+    async def consumir(self, cantidad):
+        cantidad = min(cantidad, self.capacidad)  # Una petición enorme no puede esperar para siempre
+        while True:
+            ahora = time.monotonic()
+            self.disponible = min(self.capacidad, self.disponible + (ahora - self.actualizado) * self.ritmo)
+            self.actualizado = ahora
+            if self.disponible >= cantidad:
+                self.disponible -= cantidad
+                return
+            await asyncio.sleep((cantidad - self.disponible) / self.ritmo)
+
+
+@dataclass(frozen=True)
+class ConfiguracionDespachador:
+    """Modelo, límites de la cuenta y política de reintentos."""
+    modelo: str = "gpt-3.5-turbo-instruct"
+    temperatura: float = 0
+    max_paralelas: int = 8
+    peticiones_por_minuto: int = 3500
+    tokens_por_minuto: int = 90_000
+    reintentos: int = 6
+    espera_base: float = 1.0
+    espera_max: float = 60.0
+    timeout: float = 60.0
+    url_base: str = None
+    api_key: str = None
+
+
+class DespachadorLLM:
+    """
+    Envía prompts a un endpoint de completions compatible con OpenAI sin
+    bloquear a quien los pide.
+
+    Las peticiones se ejecutan en el bucle del transporte compartido, como
+    mucho `max_paralelas` a la vez, y antes de salir retiran una petición y
+    sus tokens estimados de los cubos de peticiones y tokens por minuto. Los
+    429 y 5xx se reintentan con espera exponencial aleatoria, respetando
+    Retry-After si el servidor lo envía.
+
+    También atiende los lotes de la API de embeddings con los mismos límites.
+    La URL se toma de la configuración o de OPENAI_BASE_URL, así que puede
+    apuntarse a un servidor falso local para probarlo. Se usa como un LLM
+    normal, `llm(prompt, max_tokens=...)`, o con `enviar` para obtener un
+    Future y seguir trabajando mientras llega la respuesta.
+    """
+
+    def __init__(self, config=None, transporte=None):
+        self.config = config or ConfiguracionDespachador()
+        self.model_name = self.config.modelo
+        self.temperature = self.config.temperatura
+        self.url_base = (self.config.url_base or os.getenv("OPENAI_BASE_URL") or URL_OPENAI).rstrip("/")
+        self.api_key = self.config.api_key or os.getenv("OPENAI_API_KEY")
+        self._transporte = transporte
+        self.peticiones = CuboTokens(self.config.peticiones_por_minuto)
+        self.tokens = CuboTokens(self.config.tokens_por_minuto)
+        self._semaforo = None
+        self.llamadas = 0
+        self.reintentos = 0
+
+    @property
+    def transporte(self):
+        # Sin transporte propio se usa el del proceso con la configuración por defecto
+        return self._transporte or obtener_transporte()
+
+    def _semaforo_del_bucle(self):
+        bucle = asyncio.get_running_loop()
+        if self._semaforo is None or self._semaforo[0] is not bucle:
+            self._semaforo = (bucle, asyncio.Semaphore(self.config.max_paralelas))
+        return self._semaforo[1]
+
+    def _espera(self, intento, retry_after=None):
+        """Espera exponencial aleatoria, o la del Retry-After si es mayor; nunca más de `espera_max`."""
+        espera = random.uniform(0, min(self.config.espera_max, self.config.espera_base * 2 ** intento))
+        try:
+            return min(max(espera, float(retry_after)), self.config.espera_max)
+        except (TypeError, ValueError):
+            return espera
+
+    async def _publicar(self, ruta, cuerpo, tokens):
+        """Envía una petición a la API respetando los límites y con reintentos; devuelve el JSON."""
+        cabeceras = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        timeout = aiohttp.ClientTimeout(total=self.config.timeout)
+        semaforo = self._semaforo_del_bucle()
+
+        for intento in range(self.config.reintentos + 1):
+            await self.peticiones.consumir(1)
+            await self.tokens.consumir(tokens)
+            retry_after = None
+            try:
+                async with semaforo:
+                    self.llamadas += 1
+                    async with self.transporte.sesion.post(self.url_base + ruta, json=cuerpo, headers=cabeceras, timeout=timeout) as response:
+                        if response.status == 429 or response.status >= 500:
+                            retry_after = response.headers.get("Retry-After")
+                            error = ErrorLLM(f"HTTP {response.status}: {await response.text()}")
+                        else:
+                            response.raise_for_status()
+                            return await response.json()
+            except aiohttp.ClientResponseError as e:  # 4xx distinto de 429: no tiene sentido reintentar
+                raise ErrorLLM(f"Petición rechazada por el LLM: {e!r}") from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+
+            if intento == self.config.reintentos:
+                raise ErrorLLM(f"Sin respuesta del LLM tras {intento + 1} intentos: {error!r}") from error
+            espera = self._espera(intento, retry_after)
+            self.reintentos += 1
+            logging.warning(f"Reintentando la petición al LLM en {espera:.1f} s: {error!r}")
+            await asyncio.sleep(espera)
+
+    async def completar(self, prompt, max_tokens=None):
+        """Corrutina que devuelve el texto generado para `prompt`."""
+        max_tokens = max_tokens or MAX_TOKENS_POR_DEFECTO
+        cuerpo = {
+            "model": self.config.modelo,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": self.config.temperatura,
+        }
+        datos = await self._publicar("/completions", cuerpo, estimar_tokens(prompt) + max_tokens)
+        return datos["choices"][0]["text"]
+
+    async def embeber(self, textos, modelo):
+        """Corrutina que devuelve un vector de embedding por texto, en el mismo orden."""
+        cuerpo = {"model": modelo, "input": list(textos)}
+        datos = await self._publicar("/embeddings", cuerpo, sum(estimar_tokens(texto) for texto in textos))
+        return [dato["embedding"] for dato in sorted(datos["data"], key=lambda dato: dato["index"])]
+
+    def enviar(self, prompt, max_tokens=None):
+        """Encola el prompt y devuelve un `concurrent.futures.Future` con la respuesta."""
+        return asyncio.run_coroutine_threadsafe(self.completar(prompt, max_tokens), self.transporte.bucle)
+
+    def __call__(self, prompt, max_tokens=None):
+        return self.enviar(prompt, max_tokens).result()
+
+    def enviar_embeddings(self, textos, modelo):
+        """Encola un lote de textos para la API de embeddings y devuelve un Future con los vectores."""
+        return asyncio.run_coroutine_threadsafe(self.embeber(textos, modelo), self.transporte.bucle)
@@ -0,0 +1,169 @@
+"""Diario persistente de resultados por fila para reanudar ejecuciones interrumpidas."""
+import hashlib
+import json
+import time
+
+from webscraper_gpt.almacen import AlmacenSQLite, ruta_datos
+from webscraper_gpt.excel import EscritorExcel, LectorExcel
+
+
+def huella_archivo(origen, *parametros):
+    """
+    Identifica una ejecución por el contenido del Excel y los parámetros que cambian el resultado.
+
+    Args:
+        origen: Ruta del archivo o archivo subido a Streamlit (con `getvalue`).
+        *parametros: Página, columna, consulta... Con otros parámetros es otra ejecución.
+
+    Returns:
+        str: Hash SHA-256 en hexadecimal.
+    """
+    sha = hashlib.sha256()
+    if hasattr(origen, "getvalue"):
+        sha.update(origen.getvalue())
+    else:
+        with open(origen, "rb") as archivo:
+            for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+                sha.update(bloque)
+    for parametro in parametros:
+        sha.update(b"\x00" + str(parametro).encode("utf-8"))
+    return sha.hexdigest()
+
+
+class DiarioResultados(AlmacenSQLite):
+    """
+    Resultados de cada fila guardados en cuanto se conocen.
+
+    Cada fila se confirma en su propia transacción: si la sesión de
+    Streamlit se cae o se recarga la pestaña, lo ya procesado (y pagado al
+    LLM) sigue en el diario. `synchronous=NORMAL` en modo WAL no pierde
+    nada si se cae el proceso, solo ante un corte de luz.
+
+    Las ejecuciones que no se actualizan en `max_antiguedad` segundos se
+    eliminan al abrir otra.
+    """
+
+    ESQUEMA = """
+        PRAGMA synchronous = NORMAL;
+        CREATE TABLE IF NOT EXISTS ejecuciones (
+            huella TEXT PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            columnas TEXT NOT NULL,
+            creada REAL NOT NULL,
+            actualizada REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS resultados (
+            huella TEXT NOT NULL,
+            fila INTEGER NOT NULL,
+            valores TEXT NOT NULL,
+            PRIMARY KEY (huella, fila)
+        );
+    """
+
+    def __init__(self, ruta=None, max_antiguedad=30 * 24 * 3600):
+        super().__init__(ruta or ruta_datos("diario.sqlite"))
+        self.max_antiguedad = max_antiguedad
+
+    def abrir(self, huella, columnas, descripcion=""):
+        """
+        Abre (o crea) la ejecución de un archivo.
+
+        Args:
+            huella (str): Resultado de `huella_archivo`.
+            columnas (list): Títulos de las columnas nuevas del Excel de salida.
+            descripcion (str): Texto para identificarla en los listados.
+
+        Returns:
+            Ejecucion: Ejecución con las filas ya terminadas cargadas.
+        """
+        ahora = time.time()
+        with self.transaccion() as conexion:
+            antiguas = [
+                huella_antigua for huella_antigua, in conexion.execute(
+                    "SELECT huella FROM ejecuciones WHERE actualizada < ?", (ahora - self.max_antiguedad,)
+                )
+            ]
+            for huella_antigua in antiguas:
+                conexion.execute("DELETE FROM resultados WHERE huella = ?", (huella_antigua,))
+                conexion.execute("DELETE FROM ejecuciones WHERE huella = ?", (huella_antigua,))
+            conexion.execute(
+                "INSERT OR IGNORE INTO ejecuciones VALUES (?, ?, ?, ?, ?)",
+                (huella, descripcion, json.dumps(list(columnas)), ahora, ahora),
+            )
+        return Ejecucion(self, huella, list(columnas))
+
+    def completadas(self, huella):
+        """Devuelve un dict fila -> valores de las columnas nuevas."""
+        return {
+            fila: tuple(json.loads(valores))
+            for fila, valores in self.consultar("SELECT fila, valores FROM resultados WHERE huella = ?", (huella,))
+        }
+
+    def registrar(self, huella, fila, valores):
+        with self.transaccion() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?)", (huella, fila, json.dumps(list(valores)))
+            )
+            conexion.execute("UPDATE ejecuciones SET actualizada = ? WHERE huella = ?", (time.time(), huella))
+
+    def descartar(self, huella):
+        """Olvida los resultados de una ejecución para empezarla de cero."""
+        with self.transaccion() as conexion:
+            conexion.execute("DELETE FROM resultados WHERE huella = ?", (huella,))
+
+
+class Ejecucion:
+    """
+    Una ejecución concreta dentro del diario.
+
+    `hechas` tiene las filas terminadas en ejecuciones anteriores (y las que
+    se vayan registrando): las páginas las copian al Excel de salida sin
+    volver a descargarlas ni a consultar la IA.
+    """
+
+    def __init__(self, diario, huella, columnas):
+        self.diario = diario
+        self.huella = huella
+        self.columnas = columnas
+        self.hechas = diario.completadas(huella)
+        self.reanudadas = len(self.hechas)
+
+    def registrar(self, fila, *valores):
+        """Guarda el resultado de una fila; las que ya estaban igual en el diario no se reescriben."""
+        valores = tuple(valores)
+        if self.hechas.get(fila) == valores:
+            return
+        self.diario.registrar(self.huella, fila, valores)
+        self.hechas[fila] = valores
+
+    def reiniciar(self):
+        """Descarta los resultados guardados: la próxima pasada procesa todas las filas."""
+        self.diario.descartar(self.huella)
+        self.hechas = {}
+        self.reanudadas = 0
+
+    def exportar(self, origen, ruta=None):
+        """
+        Genera el Excel de salida con lo que haya en el diario.
+
+        Las filas que todavía no tienen resultado quedan con las columnas
+        nuevas vacías; sirve para descargar un resultado parcial en cualquier
+        momento, incluso mientras otra sesión sigue procesando el archivo.
+
+        Args:
+            origen: El mismo Excel de entrada (ruta o archivo subido).
+            ruta (str): Archivo de destino; por defecto, uno temporal.
+
+        Returns:
+            str: Ruta del archivo guardado.
+        """
+        hechas = self.diario.completadas(self.huella)
+        with LectorExcel(origen) as lector:
+            escritor = EscritorExcel(lector.cabecera, self.columnas, lector=lector)
+            for fila, valores in lector.filas():
+                escritor.original(fila, valores)
+                escritor.completar(fila, *hechas.get(fila, ()))
+        return escritor.guardar(ruta)
+
+    def resumen(self):
+        return f"Diario: {len(self.hechas)} filas guardadas ({self.reanudadas} de ejecuciones anteriores)."
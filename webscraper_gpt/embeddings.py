@@ -0,0 +1,233 @@
+"""Embeddings de textos cortos y prefiltro semántico de enlaces antes del LLM."""
+import hashlib
+import re
+import time
+import zlib
+from urllib.parse import unquote, urlparse
+
+import numpy as np
+
+from webscraper_gpt.almacen import AlmacenSQLite, ruta_datos
+from webscraper_gpt.coincidencias import normalizar
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# Separadores de las palabras de una ruta: /canal-de-denuncias/politica_etica.html
+_SEPARADORES_RUTA = re.compile(r"[/_\-.+%=&?]+")
+_EXTENSIONES = {"html", "htm", "php", "asp", "aspx", "jsp"}
+
+
+class EmbeddingsHash:
+    """
+    Embeddings locales sin modelo ni red: n-gramas de caracteres de 3 a 5
+    del texto normalizado, repartidos en `dimension` posiciones con un hash
+    con signo. Captura el solapamiento léxico (incluidas palabras pegadas
+    como "canaldenuncias"), no sinónimos.
+    """
+
+    def __init__(self, dimension=1024):
+        self.dimension = dimension
+        self.nombre = f"hash-{dimension}"
+
+    def _vector(self, texto):
+        texto = f" {normalizar(texto)} "
+        hashes = np.fromiter(
+            (zlib.crc32(texto[i:i + n].encode("utf-8")) for n in (3, 4, 5) for i in range(len(texto) - n + 1)),
+            dtype=np.uint32,
+        )
+        signos = np.where(hashes >> 31, -1.0, 1.0)
+        return np.bincount(hashes % self.dimension, weights=signos, minlength=self.dimension)
+
+    def embeber(self, textos):
+        return np.array([self._vector(texto) for texto in textos], dtype=np.float32).reshape(len(textos), self.dimension)
+
+
+class EmbeddingsSentenceTransformers:
+    """Modelo local de sentence-transformers; se descarga la primera vez y después funciona sin conexión."""
+
+    def __init__(self, modelo="paraphrase-multilingual-MiniLM-L12-v2", tam_lote=64):
+        if SentenceTransformer is None:
+            raise ImportError("sentence-transformers no está instalado")
+        self.modelo = SentenceTransformer(modelo)
+        self.tam_lote = tam_lote
+        self.nombre = f"st-{modelo}"
+
+    def embeber(self, textos):
+        return np.asarray(self.modelo.encode(list(textos), batch_size=self.tam_lote), dtype=np.float32)
+
+
+class EmbeddingsOpenAI:
+    """API de embeddings de OpenAI a través del despachador, con sus límites y reintentos."""
+
+    def __init__(self, despachador, modelo="text-embedding-3-small", tam_lote=256):
+        self.despachador = despachador
+        self.modelo = modelo
+        self.tam_lote = tam_lote
+        self.nombre = f"openai-{modelo}"
+
+    def embeber(self, textos):
+        textos = list(textos)
+        futuros = [
+            self.despachador.enviar_embeddings(textos[inicio:inicio + self.tam_lote], self.modelo)
+            for inicio in range(0, len(textos), self.tam_lote)
+        ]
+        vectores = [vector for futuro in futuros for vector in futuro.result()]
+        return np.array(vectores, dtype=np.float32)
+
+
+class CacheEmbeddings(AlmacenSQLite):
+    """Vectores guardados por (modelo, hash del texto), como float32 sin comprimir."""
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS embeddings (
+            modelo TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            guardado REAL NOT NULL,
+            PRIMARY KEY (modelo, hash)
+        );
+    """
+
+    # Límite de parámetros por consulta de SQLite
+    TAM_CONSULTA = 500
+
+    def __init__(self, ruta=None):
+        super().__init__(ruta or ruta_datos("embeddings.sqlite"))
+
+    @staticmethod
+    def _hash(texto):
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def obtener(self, modelo, textos):
+        """Devuelve {texto: vector} con los textos que ya estaban guardados."""
+        por_hash = {self._hash(texto): texto for texto in textos}
+        hashes = list(por_hash)
+        encontrados = {}
+        for inicio in range(0, len(hashes), self.TAM_CONSULTA):
+            trozo = hashes[inicio:inicio + self.TAM_CONSULTA]
+            filas = self.consultar(
+                f"SELECT hash, vector FROM embeddings WHERE modelo = ? AND hash IN ({','.join('?' * len(trozo))})",
+                (modelo, *trozo),
+            )
+            for clave, vector in filas:
+                encontrados[por_hash[clave]] = np.frombuffer(vector, dtype=np.float32)
+        return encontrados
+
+    def guardar(self, modelo, textos, vectores):
+        ahora = time.time()
+        with self.transaccion() as conexion:
+            conexion.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                [
+                    (modelo, self._hash(texto), np.asarray(vector, dtype=np.float32).tobytes(), ahora)
+                    for texto, vector in zip(textos, vectores)
+                ],
+            )
+
+
+class EmbeddingsConCache:
+    """Consulta la caché en disco y solo calcula, en un lote, los textos que faltan."""
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.nombre = backend.nombre
+
+    def embeber(self, textos):
+        textos = list(textos)
+        guardados = self.cache.obtener(self.nombre, textos)
+        nuevos = list(dict.fromkeys(texto for texto in textos if texto not in guardados))
+        if nuevos:
+            vectores = self.backend.embeber(nuevos)
+            self.cache.guardar(self.nombre, nuevos, vectores)
+            guardados.update(zip(nuevos, vectores))
+        return np.array([guardados[texto] for texto in textos], dtype=np.float32)
+
+
+def similitud_coseno(matriz, vector):
+    """Similitud coseno de cada fila de `matriz` con `vector`."""
+    normas = np.linalg.norm(matriz, axis=1) * np.linalg.norm(vector)
+    return (matriz @ vector) / np.where(normas == 0, 1, normas)
+
+
+def texto_de_enlace(texto, url):
+    """Texto del enlace más las palabras de la ruta de su URL, que suelen describir la página."""
+    try:
+        ruta = unquote(urlparse(url).path)
+    except ValueError:  # URL mal formada
+        ruta = ""
+    palabras = [palabra for palabra in _SEPARADORES_RUTA.split(ruta) if palabra and palabra.lower() not in _EXTENSIONES]
+    return " ".join(filter(None, [" ".join((texto or "").split()), " ".join(palabras)]))
+
+
+class PrefiltroSemantico:
+    """
+    Ordena los enlaces por similitud coseno con la consulta y deja pasar solo
+    los `top_k` mejores que superen `umbral`.
+
+    La consulta se embebe una vez por instancia y los enlaces en un único
+    lote por página; la similitud es un producto matriz-vector de NumPy.
+    """
+
+    def __init__(self, embeddings, top_k=20, umbral=0.0):
+        self.embeddings = embeddings
+        self.top_k = top_k
+        self.umbral = umbral
+        self._consultas = {}
+        self.enlaces_recibidos = 0
+        self.enlaces_enviados = 0
+
+    def _vector_consulta(self, consulta):
+        if consulta not in self._consultas:
+            self._consultas[consulta] = self.embeddings.embeber([consulta])[0]
+        return self._consultas[consulta]
+
+    def puntuar(self, enlaces, consulta):
+        """
+        Similitud de cada enlace con la consulta.
+
+        Args:
+            enlaces (list): Pares (texto, URL).
+            consulta (str): Lo que el usuario quiere encontrar.
+
+        Returns:
+            numpy.ndarray: Similitud coseno por enlace, en el mismo orden.
+        """
+        if not enlaces:
+            return np.zeros(0, dtype=np.float32)
+        matriz = self.embeddings.embeber([texto_de_enlace(texto, url) for texto, url in enlaces])
+        return similitud_coseno(matriz, self._vector_consulta(consulta))
+
+    def filtrar(self, enlaces, consulta):
+        """
+        Devuelve las URLs de los enlaces más parecidos a la consulta.
+
+        Args:
+            enlaces (list): Pares (texto, URL); las URLs repetidas se unen.
+            consulta (str): Lo que el usuario quiere encontrar.
+
+        Returns:
+            list: URLs seleccionadas, en el orden en que aparecen en la página.
+        """
+        textos = {}
+        for texto, url in enlaces:
+            textos[url] = f"{textos[url]} {texto}" if textos.get(url) else texto
+        enlaces = list(textos.items())
+        self.enlaces_recibidos += len(enlaces)
+
+        similitudes = self.puntuar([(texto, url) for url, texto in enlaces], consulta)
+        mejores = [i for i in np.argsort(-similitudes)[:self.top_k] if similitudes[i] >= self.umbral]
+        self.enlaces_enviados += len(mejores)
+        return [enlaces[i][0] for i in sorted(mejores)]
+
+    def resumen(self):
+        if not self.enlaces_recibidos:
+            return "El prefiltro semántico no recibió enlaces."
+        descartados = 100 * (1 - self.enlaces_enviados / self.enlaces_recibidos)
+        return (
+            f"Prefiltro semántico: {self.enlaces_enviados} de {self.enlaces_recibidos} enlaces enviados al LLM "
+            f"({descartados:.0f}% descartados)."
+        )
@@ -0,0 +1,420 @@
+"""Búsqueda del sitio web de una empresa a partir de su razón social."""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from webscraper_gpt.almacen import AlmacenSQLite, ruta_datos
+from webscraper_gpt.coincidencias import normalizar
+from webscraper_gpt.descargas import HEADERS
+from webscraper_gpt.despachador import futuro_resuelto
+from webscraper_gpt.planificador import dominio_registrado, host_de
+from webscraper_gpt.transporte import obtener_transporte
+
+try:
+    from duckduckgo_search import DDGS
+except ImportError:
+    DDGS = None
+
+# Consulta con la que se busca el sitio oficial de cada empresa
+PLANTILLA_CONSULTA = "sitio oficial {empresa}"
+
+# Directorios de empresas, redes sociales y buscadores: nunca son el sitio oficial
+DOMINIOS_AGREGADORES = frozenset({
+    "einforma.com", "infoempresa.com", "empresia.es", "axesor.es", "infocif.es", "librebor.me",
+    "iberinform.es", "informa.es", "datoscif.es", "guiaempresas.universia.es", "universia.es",
+    "paginasamarillas.es", "cylex.es", "kompass.com", "europages.es", "europages.com", "dnb.com",
+    "eleconomista.es", "expansion.com", "infojobs.net", "indeed.com", "glassdoor.es", "glassdoor.com",
+    "crunchbase.com", "bloomberg.com", "opencorporates.com", "boe.es", "borme.es",
+    "linkedin.com", "facebook.com", "instagram.com", "twitter.com", "x.com", "youtube.com",
+    "tiktok.com", "wikipedia.org", "google.com", "google.es", "bing.com", "duckduckgo.com",
+    "yelp.com", "yelp.es", "tripadvisor.com", "tripadvisor.es", "amazon.es", "amazon.com",
+})
+
+# Dominios de primer nivel preferidos, de más a menos, para empresas españolas
+TLD_PREFERIDOS = ("es", "com", "eu", "cat", "eus", "gal", "net", "org")
+
+_SIGNOS = re.compile(r"[^\w\s]")
+
+# Formas jurídicas al final de la razón social, ya normalizada ("s a", "s l u", "sociedad limitada"...)
+_FORMAS_JURIDICAS = re.compile(
+    r"(\s+(sociedad (anonima|limitada|cooperativa)( unipersonal| laboral)?|s a( u)?|s l( [lu])?|sa|sau|sl|slu|sll"
+    r"|s coop( and| v)?|scoop|sccl|c b|cb|ltd|llc|inc|gmbh|s r l|srl|s p a|spa|sas|sarl|b v|bv|n v|nv|plc|ag|corp))+$"
+)
+_PALABRAS_VACIAS = {"de", "del", "la", "las", "el", "los", "y", "e", "i", "the", "and", "of"}
+
+
+def normalizar_empresa(nombre):
+    """Razón social comparable: sin mayúsculas, tildes, signos ni espacios sobrantes."""
+    return " ".join(_SIGNOS.sub(" ", normalizar(nombre or "")).split())
+
+
+def nombre_base(empresa):
+    """Nombre comercial aproximado: la razón social normalizada sin forma jurídica ("ABGAM, S.A." -> "abgam")."""
+    nombre = normalizar_empresa(empresa)
+    return _FORMAS_JURIDICAS.sub("", f" {nombre}").strip() or nombre
+
+
+def _similitud_dominio(nombre, dominio):
+    """Parecido entre el nombre de la empresa y la parte elegida del dominio ("abgam" en "abgam.es")."""
+    etiqueta = dominio.split(".")[0].replace("-", "")
+    palabras = [palabra for palabra in nombre.split() if palabra not in _PALABRAS_VACIAS]
+    if not etiqueta or not palabras:
+        return 0.0
+    parecido = SequenceMatcher(None, "".join(palabras), etiqueta).ratio()
+    # Dominios con solo parte del nombre ("grupo-xyz.com" para "Grupo XYZ Servicios") o con las siglas
+    largas = [palabra for palabra in palabras if len(palabra) >= 3]
+    contenidas = sum(len(palabra) for palabra in largas if palabra in etiqueta) / max(1, sum(map(len, largas)))
+    siglas = 1.0 if len(palabras) >= 2 and etiqueta == "".join(palabra[0] for palabra in palabras) else 0.0
+    return max(parecido, contenidas, siglas)
+
+
+def _similitud_titulo(nombre, titulo):
+    """Fracción de las palabras del nombre que aparecen en el título del resultado."""
+    palabras = [palabra for palabra in nombre.split() if palabra not in _PALABRAS_VACIAS]
+    titulo = set(normalizar_empresa(titulo).split())
+    return sum(palabra in titulo for palabra in palabras) / len(palabras) if palabras else 0.0
+
+
+def _preferencia_tld(host, tld_preferidos):
+    tld = host.rsplit(".", 1)[-1]
+    if tld not in tld_preferidos:
+        return 0.0
+    return 0.1 * (1 - tld_preferidos.index(tld) / len(tld_preferidos))
+
+
+def puntuar_resultados(empresa, resultados, bloqueados=DOMINIOS_AGREGADORES, tld_preferidos=TLD_PREFERIDOS):
+    """
+    Ordena los resultados de una búsqueda por lo que se parecen al sitio oficial de la empresa.
+
+    Cuenta sobre todo el parecido del dominio con el nombre sin forma
+    jurídica, después el del título, la preferencia del dominio de primer
+    nivel y, un poco, la posición en el buscador. Los agregadores y las
+    redes sociales se descartan, y cada dominio aparece una sola vez.
+
+    Args:
+        empresa (str): Razón social.
+        resultados (list): Dicts con "href" y, opcionalmente, "title".
+        bloqueados (set): Dominios registrados que nunca son el sitio oficial.
+        tld_preferidos (tuple): Dominios de primer nivel preferidos, de más a menos.
+
+    Returns:
+        list: Tuplas (puntuación, URL de la portada, resultado), de mejor a peor.
+    """
+    nombre = nombre_base(empresa)
+    puntuados = []
+    vistos = set()
+    for posicion, resultado in enumerate(resultados):
+        href = resultado.get("href") or ""
+        host = host_de(href)  # "" también si la URL está mal formada
+        if not host:
+            continue
+        partes = urlsplit(href)
+        if partes.scheme not in ("http", "https"):
+            continue
+        dominio = dominio_registrado(host)
+        if dominio in bloqueados or dominio in vistos:
+            continue
+        vistos.add(dominio)
+        puntuacion = (
+            0.7 * _similitud_dominio(nombre, dominio)
+            + 0.2 * _similitud_titulo(nombre, resultado.get("title") or "")
+            + _preferencia_tld(host, tld_preferidos)
+            - 0.02 * posicion
+        )
+        puntuados.append((round(puntuacion, 3), f"{partes.scheme}://{partes.netloc}/", resultado))
+    puntuados.sort(key=lambda puntuado: -puntuado[0])
+    return puntuados
+
+
+class VerificadorHEAD:
+    """
+    Comprueba con una petición HEAD que un sitio responde, con el transporte compartido.
+
+    Devuelve la portada a la que lleva la URL tras las redirecciones, o None
+    si no responde o si redirige a un agregador (dominios aparcados, perfiles).
+    Los 403 y 405 cuentan como respuesta: muchos servidores rechazan HEAD o
+    los bots, pero existen.
+    """
+
+    def __init__(self, transporte=None, timeout=5, bloqueados=DOMINIOS_AGREGADORES):
+        self.transporte = transporte or obtener_transporte()
+        self.timeout = timeout
+        self.bloqueados = bloqueados
+
+    async def _verificar(self, url):
+        try:
+            async with self.transporte.sesion.head(
+                url, headers=HEADERS, timeout=aiohttp.ClientTimeout(total=self.timeout), ssl=False, allow_redirects=True
+            ) as response:
+                if response.status >= 400 and response.status not in (403, 405):
+                    return None
+                final = urlsplit(str(response.url))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.info(f"{url} no responde a HEAD: {e!r}")
+            return None
+        if dominio_registrado(final.hostname) in self.bloqueados:
+            return None
+        return f"{final.scheme}://{final.netloc}/"
+
+    def __call__(self, url):
+        return self.transporte.ejecutar(self._verificar(url))
+
+
+class BusquedaDuckDuckGo:
+    """Búsqueda web con DuckDuckGo; cada hilo reutiliza su propio cliente DDGS."""
+
+    nombre = "duckduckgo"
+
+    def __init__(self):
+        if DDGS is None:
+            raise ImportError("Instala duckduckgo_search para buscar en DuckDuckGo")
+        self._local = threading.local()
+
+    def buscar(self, consulta, max_resultados):
+        """Devuelve una lista de dicts con "href", "title" y "body"."""
+        if not hasattr(self._local, "ddgs"):
+            self._local.ddgs = DDGS()
+        return list(self._local.ddgs.text(consulta, max_results=max_resultados) or [])
+
+
+class BusquedaStub:
+    """
+    Búsqueda falsa para pruebas y para repetir ejecuciones sin red.
+
+    Devuelve las URLs indicadas para las empresas cuya razón social aparece
+    en la consulta, y ningún resultado para el resto.
+    """
+
+    nombre = "stub"
+
+    def __init__(self, respuestas=None):
+        self.respuestas = {nombre_base(empresa): list(urls) for empresa, urls in (respuestas or {}).items()}
+
+    def buscar(self, consulta, max_resultados):
+        consulta = nombre_base(consulta)
+        for empresa, urls in self.respuestas.items():
+            if empresa and empresa in consulta:
+                return [{"href": url, "title": "", "body": ""} for url in urls[:max_resultados]]
+        return []
+
+
+class CacheEmpresas(AlmacenSQLite):
+    """
+    Resultados de búsqueda guardados por (buscador, consulta normalizada).
+
+    Se guardan los resultados completos, no solo la URL elegida, para poder
+    cambiar el criterio de elección sin repetir las búsquedas. Las búsquedas
+    sin resultados caducan antes (`ttl_vacias`) que las demás (`ttl`).
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS busquedas (
+            buscador TEXT NOT NULL,
+            consulta TEXT NOT NULL,
+            resultados TEXT NOT NULL,
+            guardada REAL NOT NULL,
+            PRIMARY KEY (buscador, consulta)
+        );
+    """
+
+    def __init__(self, ruta=None, ttl=30 * 24 * 3600, ttl_vacias=7 * 24 * 3600):
+        super().__init__(ruta or ruta_datos("empresas.sqlite"))
+        self.ttl = ttl
+        self.ttl_vacias = ttl_vacias
+
+    def obtener(self, buscador, consulta):
+        """Devuelve los resultados guardados y vigentes, o None."""
+        filas = self.consultar(
+            "SELECT resultados, guardada FROM busquedas WHERE buscador = ? AND consulta = ?", (buscador, consulta)
+        )
+        if not filas:
+            return None
+        resultados = json.loads(filas[0][0])
+        ttl = self.ttl if resultados else self.ttl_vacias
+        return resultados if time.time() - filas[0][1] < ttl else None
+
+    def guardar(self, buscador, consulta, resultados):
+        with self.transaccion() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO busquedas VALUES (?, ?, ?, ?)",
+                (buscador, consulta, json.dumps(resultados, ensure_ascii=False), time.time()),
+            )
+
+
+class LimiteRitmo:
+    """Reparte los inicios de las búsquedas a ritmo constante entre todos los hilos."""
+
+    def __init__(self, por_minuto):
+        self.intervalo = 60 / por_minuto if por_minuto else 0
+        self._siguiente = 0.0
+        self._cerrojo = threading.Lock()
+
+    def esperar(self):
+        with self._cerrojo:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + self.intervalo
+        time.sleep(turno - ahora)
+
+
+class ResolutorEmpresas:
+    """
+    Servicio razón social -> sitio web.
+
+    Las búsquedas se lanzan en un pool de hilos, a `peticiones_por_minuto`
+    como mucho, y se guardan en una `CacheEmpresas` persistente. Las razones
+    sociales que solo se diferencian en mayúsculas, tildes o signos son la
+    misma búsqueda: mientras el resolutor vive, una empresa repetida en
+    varias filas (o pedida otra vez al fallar la descarga) reutiliza la
+    búsqueda en curso o ya hecha. El buscador se puede sustituir, por
+    ejemplo por un `BusquedaStub` en las pruebas.
+
+    De los `max_resultados` de cada búsqueda se elige el que más se parece
+    al sitio oficial (ver `puntuar_resultados`), siempre que supere
+    `umbral`; con un `verificar` (por ejemplo, `VerificadorHEAD`) se
+    comprueba que responde antes de darlo por bueno, probando como mucho
+    `max_verificaciones` candidatos.
+
+    Con `solo_cache` no se busca en la red ni se escribe en la caché: las
+    empresas que no estén guardadas se responden con `backend`, que en ese
+    modo debería ser un `BusquedaStub`. El nombre del buscador de la clave
+    de caché se toma del backend salvo que se indique en `buscador`, de modo
+    que el stub puede reutilizar lo que guardó el buscador real.
+    """
+
+    def __init__(self, backend=None, cache=None, max_paralelas=4, peticiones_por_minuto=30, max_resultados=8,
+                 reintentos=2, plantilla=PLANTILLA_CONSULTA, umbral=0.25, verificar=None, max_verificaciones=3,
+                 solo_cache=False, buscador=None):
+        self.backend = backend or BusquedaDuckDuckGo()
+        self.cache = cache
+        self.solo_cache = solo_cache
+        self.buscador = buscador or self.backend.nombre
+        self.max_resultados = max_resultados
+        self.umbral = umbral
+        self.verificar = verificar
+        self.max_verificaciones = max_verificaciones
+        self.reintentos = reintentos
+        self.plantilla = plantilla
+        self.ritmo = LimiteRitmo(peticiones_por_minuto)
+        self._pool = ThreadPoolExecutor(max_workers=max_paralelas, thread_name_prefix="busqueda-empresas")
+        self._futuros = {}
+        self._cerrojo = threading.Lock()
+        self.busquedas = 0
+        self.desde_cache = 0
+        self.repetidas = 0
+        self.errores = 0
+        self.sin_candidatos = 0
+        self.no_verificados = 0
+
+    def _buscar(self, empresa, clave):
+        """Resultados de la búsqueda de una empresa: de la caché o del buscador."""
+        consulta = self.plantilla.format(empresa=empresa)
+        # El número de resultados forma parte de la clave: con menos no se puede elegir igual
+        buscador = f"{self.buscador}:{self.max_resultados}"
+        if self.cache:
+            resultados = self.cache.obtener(buscador, self.plantilla.format(empresa=clave))
+            if resultados is not None:
+                self.desde_cache += 1
+                return resultados
+
+        if self.solo_cache:
+            logging.info(f"Búsqueda de {empresa!r} sin resultados en caché: se usa la respuesta del stub")
+            return self.backend.buscar(consulta, self.max_resultados)
+
+        for intento in range(self.reintentos + 1):
+            self.ritmo.esperar()
+            try:
+                self.busquedas += 1
+                resultados = self.backend.buscar(consulta, self.max_resultados)
+                break
+            except Exception as e:
+                if intento == self.reintentos:
+                    self.errores += 1
+                    raise
+                logging.warning(f"Error al buscar {empresa!r}, se reintenta: {e!r}")
+                time.sleep(2 ** intento)
+
+        if self.cache:
+            self.cache.guardar(buscador, self.plantilla.format(empresa=clave), resultados)
+        return resultados
+
+    def _elegir(self, empresa, resultados):
+        """Portada del mejor resultado que supera el umbral y, si se verifica, responde."""
+        candidatos = [url for puntuacion, url, _ in puntuar_resultados(empresa, resultados) if puntuacion >= self.umbral]
+        if not candidatos:
+            self.sin_candidatos += 1
+            logging.info(f"Ningún resultado parece el sitio oficial de {empresa!r}")
+            return None
+        if not self.verificar:
+            return candidatos[0]
+        for url in candidatos[:self.max_verificaciones]:
+            verificada = self.verificar(url)
+            if verificada:
+                return verificada
+            self.no_verificados += 1
+        return None
+
+    def _resolver(self, empresa, clave):
+        return self._elegir(empresa, self._buscar(empresa, clave))
+
+    def enviar(self, empresa):
+        """
+        Lanza la búsqueda del sitio web de una empresa sin esperar.
+
+        Args:
+            empresa (str): Razón social tal y como aparece en el Excel.
+
+        Returns:
+            concurrent.futures.Future: Se completa con la URL o None.
+        """
+        clave = normalizar_empresa(empresa)
+        if not clave:
+            return futuro_resuelto(None)
+        with self._cerrojo:
+            futuro = self._futuros.get(clave)
+            if futuro is not None and not (futuro.done() and futuro.exception()):
+                self.repetidas += 1
+                return futuro
+            futuro = self._pool.submit(self._resolver, empresa, clave)
+            self._futuros[clave] = futuro
+            return futuro
+
+    @staticmethod
+    def _esperar(futuro, empresa):
+        try:
+            return futuro.result()
+        except Exception as e:
+            logging.error(f"Error al buscar URL alternativa para {empresa!r}: {e}")
+            return None
+
+    def resolver(self, empresa):
+        """Como `enviar`, pero espera; devuelve None si la búsqueda falla."""
+        return self._esperar(self.enviar(empresa), empresa)
+
+    def resolver_todas(self, empresas):
+        """
+        Busca varias empresas a la vez.
+
+        Args:
+            empresas (iterable): Razones sociales, con repeticiones o no.
+
+        Returns:
+            dict: Razón social -> URL o None.
+        """
+        futuros = {empresa: self.enviar(empresa) for empresa in empresas}
+        return {empresa: self._esperar(futuro, empresa) for empresa, futuro in futuros.items()}
+
+    def resumen(self):
+        return (
+            f"Búsqueda de empresas: {self.busquedas} búsquedas, {self.desde_cache} desde la caché, "
+            f"{self.repetidas} peticiones atendidas por una búsqueda ya lanzada, {self.errores} errores, "
+            f"{self.sin_candidatos} empresas sin un resultado parecido, {self.no_verificados} candidatos que no respondieron."
+        )
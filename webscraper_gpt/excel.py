@@ -0,0 +1,217 @@
+"""Lectura en streaming del Excel de entrada y escritura del resultado sin cargarlo en memoria."""
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+
+from openpyxl import Workbook, load_workbook
+
+from webscraper_gpt.almacen import AlmacenSQLite
+
+
+class LectorExcel:
+    """
+    Hoja activa de un Excel abierta en modo solo lectura.
+
+    Las filas se leen una a una a medida que se piden (`iter_rows` de
+    openpyxl en modo `read_only`), así que se pueden ir despachando mientras
+    el resto del archivo todavía no se ha leído y la memoria no depende del
+    número de filas. Hay que cerrarlo al terminar (o usarlo con `with`).
+    """
+
+    def __init__(self, origen):
+        self._libro = load_workbook(origen, read_only=True, data_only=True)
+        self._hoja = self._libro.active
+        self._filas = self._hoja.iter_rows(values_only=True)
+        self.cabecera = list(next(self._filas, None) or ())
+        # Las columnas nuevas van después de la última columna de la hoja
+        self.ancho = max(len(self.cabecera), self._hoja.max_column or 0)
+
+    @property
+    def filas_estimadas(self):
+        """Número de filas de datos según las dimensiones de la hoja, o None si no las declara."""
+        return self._hoja.max_row - 1 if self._hoja.max_row else None
+
+    def columna(self, nombre):
+        """Posición (desde 0) de la columna con ese título, o None."""
+        return next((indice for indice, valor in enumerate(self.cabecera) if valor == nombre), None)
+
+    def filas(self):
+        """
+        Recorre las filas de datos.
+
+        Yields:
+            tuple: (número de fila en la hoja, empezando en 2; valores de la fila).
+        """
+        for numero, valores in enumerate(self._filas, start=2):
+            yield numero, tuple(valores) + (None,) * (self.ancho - len(valores))
+
+    def hojas(self):
+        """
+        Recorre las hojas de cálculo del libro en su orden.
+
+        Yields:
+            tuple: (título; filas de la hoja, o None para la hoja activa, que se lee con `filas`).
+        """
+        for hoja in self._libro.worksheets:
+            yield hoja.title, None if hoja is self._hoja else hoja.iter_rows(values_only=True)
+
+    def cerrar(self):
+        self._libro.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+class _DepositoFilas(AlmacenSQLite):
+    """Filas a la espera de las anteriores, volcadas a un SQLite temporal."""
+
+    ESQUEMA = """
+        PRAGMA synchronous = OFF;
+        CREATE TABLE IF NOT EXISTS filas (
+            fila INTEGER PRIMARY KEY,
+            valores BLOB NOT NULL,
+            nuevos BLOB
+        );
+    """
+
+
+class EscritorExcel:
+    """
+    Escribe el Excel de salida en modo `write_only`, en el orden original.
+
+    Cada fila leída se registra con `original` y se escribe cuando llega
+    su resultado con `completar` y ya se han escrito todas las anteriores;
+    los resultados llegan en el orden en que terminan, no en el de la hoja.
+    Las filas que esperan a otras se guardan en memoria hasta
+    `max_en_memoria` y, a partir de ahí, en un SQLite temporal. openpyxl
+    también guarda en disco las filas ya escritas hasta `guardar`.
+
+    Con el `lector` del Excel de entrada, las demás hojas se copian en su
+    sitio y la de resultados conserva el título y la posición de la hoja
+    activa. En modo `write_only` solo se copian los valores: el formato
+    (estilos, anchos, celdas combinadas) se pierde y las fórmulas quedan
+    con su último valor calculado.
+
+    Se puede usar desde varios hilos: el que lee el Excel y el que recibe
+    los resultados.
+    """
+
+    def __init__(self, cabecera, columnas_nuevas, max_en_memoria=10_000, lector=None):
+        self._libro = Workbook(write_only=True)
+        self._hoja = None
+        for posicion, (titulo, filas) in enumerate(lector.hojas() if lector is not None else [(None, None)]):
+            hoja = self._libro.create_sheet(titulo)
+            if filas is None:
+                self._hoja = hoja
+                self._libro.active = posicion
+                continue
+            for valores in filas:
+                hoja.append(valores)
+        self._hoja.append(list(cabecera) + list(columnas_nuevas))
+        self.num_nuevas = len(columnas_nuevas)
+        self.max_en_memoria = max_en_memoria
+        self._siguiente = 2
+        self._memoria = {}
+        self._deposito = None
+        self._directorio = None
+        self._cerrojo = threading.Lock()
+        self.escritas = 0
+
+    def _volcar_a_disco(self):
+        if self._deposito is None:
+            self._directorio = tempfile.mkdtemp(prefix="webscraper_gpt_")
+            self._deposito = _DepositoFilas(os.path.join(self._directorio, "filas.sqlite"))
+        with self._deposito.transaccion() as conexion:
+            conexion.executemany(
+                "INSERT OR REPLACE INTO filas VALUES (?, ?, ?)",
+                [
+                    (fila, pickle.dumps(valores), None if nuevos is None else pickle.dumps(nuevos))
+                    for fila, (valores, nuevos) in self._memoria.items()
+                ],
+            )
+        self._memoria.clear()
+
+    def _sacar(self, fila):
+        """Devuelve (valores, nuevos) de una fila pendiente y la quita del depósito."""
+        if fila in self._memoria:
+            return self._memoria.pop(fila)
+        if self._deposito is None:
+            return None
+        with self._deposito.transaccion() as conexion:
+            registro = conexion.execute("SELECT valores, nuevos FROM filas WHERE fila = ?", (fila,)).fetchone()
+            if registro is None:
+                return None
+            conexion.execute("DELETE FROM filas WHERE fila = ?", (fila,))
+        return pickle.loads(registro[0]), None if registro[1] is None else pickle.loads(registro[1])
+
+    def _guardar_pendiente(self, fila, valores, nuevos):
+        self._memoria[fila] = (valores, nuevos)
+        if len(self._memoria) > self.max_en_memoria:
+            self._volcar_a_disco()
+
+    def _escribir_en_orden(self):
+        while True:
+            pendiente = self._sacar(self._siguiente)
+            if pendiente is None:
+                return
+            valores, nuevos = pendiente
+            if nuevos is None:
+                self._guardar_pendiente(self._siguiente, valores, nuevos)
+                return
+            self._hoja.append(list(valores) + list(nuevos))
+            self.escritas += 1
+            self._siguiente += 1
+
+    def original(self, fila, valores):
+        """Registra una fila leída que todavía no tiene resultado."""
+        with self._cerrojo:
+            self._guardar_pendiente(fila, tuple(valores), None)
+
+    def completar(self, fila, *nuevos):
+        """Añade los valores de las columnas nuevas de una fila y escribe lo que ya esté en orden."""
+        with self._cerrojo:
+            pendiente = self._sacar(fila)
+            valores = pendiente[0] if pendiente else ()
+            nuevos = tuple(nuevos) + (None,) * (self.num_nuevas - len(nuevos))
+            self._guardar_pendiente(fila, valores, nuevos)
+            self._escribir_en_orden()
+
+    def guardar(self, ruta=None):
+        """
+        Escribe las filas que queden y guarda el libro.
+
+        Las filas sin resultado se escriben con las columnas nuevas vacías.
+
+        Args:
+            ruta (str): Archivo de destino; por defecto, uno temporal.
+
+        Returns:
+            str: Ruta del archivo guardado.
+        """
+        with self._cerrojo:
+            if self._deposito is not None:
+                self._volcar_a_disco()
+                filas = [fila for fila, in self._deposito.consultar("SELECT fila FROM filas ORDER BY fila")]
+            else:
+                filas = sorted(self._memoria)
+            for fila in filas:
+                valores, nuevos = self._sacar(fila)
+                self._hoja.append(list(valores) + list(nuevos or (None,) * self.num_nuevas))
+                self.escritas += 1
+            if ruta is None:
+                descriptor, ruta = tempfile.mkstemp(prefix="webscraper_gpt_", suffix=".xlsx")
+                os.close(descriptor)
+            self._libro.save(ruta)
+            self._cerrar_deposito()
+        return ruta
+
+    def _cerrar_deposito(self):
+        if self._deposito is not None:
+            self._deposito.cerrar()
+            shutil.rmtree(self._directorio, ignore_errors=True)
+            self._deposito = None
@@ -0,0 +1,154 @@
+"""División del texto de una página en fragmentos por tokens y selección de los más relevantes."""
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from webscraper_gpt.embeddings import similitud_coseno
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Palabra o signo suelto con el espacio que lo precede: "".join(tokens) reconstruye el texto
+_TOKEN = re.compile(r"\s*(?:\w+|[^\w\s])")
+
+
+class TokenizadorRegex:
+    """
+    Aproximación sin dependencias: una palabra o un signo por token. Suele
+    quedarse algo por debajo del recuento real del modelo, así que conviene
+    dejar margen en `max_tokens`.
+    """
+
+    nombre = "regex"
+
+    def codificar(self, texto):
+        return _TOKEN.findall(texto)
+
+    def decodificar(self, tokens):
+        return "".join(tokens).strip()
+
+
+class TokenizadorTiktoken:
+    """Tokens reales del modelo de OpenAI."""
+
+    def __init__(self, modelo="gpt-3.5-turbo-instruct"):
+        try:
+            self.codificacion = tiktoken.encoding_for_model(modelo)
+        except KeyError:
+            self.codificacion = tiktoken.get_encoding("cl100k_base")
+        self.nombre = self.codificacion.name
+
+    def codificar(self, texto):
+        return self.codificacion.encode_ordinary(texto)
+
+    def decodificar(self, tokens):
+        return self.codificacion.decode(tokens).strip()
+
+
+@lru_cache(maxsize=4)
+def obtener_tokenizador(modelo="gpt-3.5-turbo-instruct"):
+    """Tokenizador de tiktoken para el modelo si está instalado; si no, el de expresiones regulares."""
+    return TokenizadorTiktoken(modelo) if tiktoken else TokenizadorRegex()
+
+
+def contar_tokens(texto, tokenizador=None):
+    return len((tokenizador or obtener_tokenizador()).codificar(texto))
+
+
+def fragmentar(texto, max_tokens=1000, solape=100, tokenizador=None):
+    """
+    Divide el texto en fragmentos de como mucho `max_tokens` tokens.
+
+    El texto se tokeniza una sola vez y cada fragmento repite los últimos
+    `solape` tokens del anterior, para no partir una frase relevante entre
+    dos fragmentos sin contexto. El coste es lineal en la longitud del texto.
+
+    Args:
+        texto (str): Texto visible de la página.
+        max_tokens (int): Tokens máximos por fragmento.
+        solape (int): Tokens compartidos entre fragmentos consecutivos.
+        tokenizador (object): Tokenizador a usar; por defecto `obtener_tokenizador()`.
+
+    Yields:
+        str: Fragmentos en el orden del texto.
+    """
+    if solape >= max_tokens:
+        raise ValueError("El solape debe ser menor que el tamaño del fragmento")
+    tokenizador = tokenizador or obtener_tokenizador()
+    tokens = tokenizador.codificar(texto)
+    paso = max_tokens - solape
+    for inicio in range(0, len(tokens), paso):
+        yield tokenizador.decodificar(tokens[inicio:inicio + max_tokens])
+        if inicio + max_tokens >= len(tokens):
+            break
+
+
+class SelectorFragmentos:
+    """
+    Elige los `mejores` fragmentos de una página para enviarlos al LLM.
+
+    La puntuación combina la densidad de palabras clave (coincidencias por
+    palabra, relativa al mejor fragmento) y, si hay embeddings, la
+    similitud coseno con la consulta, ponderada por `peso_similitud`. Los
+    fragmentos sin ninguna señal se descartan, salvo con `descartar_vacios`
+    a False: así se preseleccionan por palabras clave sin perder los que
+    solo los embeddings pueden reconocer.
+    """
+
+    def __init__(self, buscador, embeddings=None, mejores=3, peso_similitud=0.5, descartar_vacios=True):
+        self.buscador = buscador
+        self.embeddings = embeddings
+        self.mejores = mejores
+        self.descartar_vacios = descartar_vacios
+        self.peso_similitud = peso_similitud if embeddings else 0.0
+        self.fragmentos_totales = 0
+        self.fragmentos_enviados = 0
+
+    def _densidades(self, fragmentos):
+        densidades = np.array(
+            [len(self.buscador.buscar(fragmento)) / max(1, len(fragmento.split())) for fragmento in fragmentos],
+            dtype=np.float32,
+        )
+        maximo = densidades.max(initial=0)
+        return densidades / maximo if maximo else densidades
+
+    def _similitudes(self, fragmentos, consulta):
+        return np.clip(similitud_coseno(self.embeddings.embeber(fragmentos), self.embeddings.embeber([consulta])[0]), 0, None)
+
+    def puntuar(self, fragmentos, consulta):
+        """Puntuación entre 0 y 1 de cada fragmento, en el mismo orden."""
+        puntuaciones = (1 - self.peso_similitud) * self._densidades(fragmentos)
+        if self.peso_similitud:
+            puntuaciones += self.peso_similitud * self._similitudes(fragmentos, consulta)
+        return puntuaciones
+
+    def seleccionar(self, fragmentos, consulta):
+        """
+        Devuelve los fragmentos mejor puntuados.
+
+        Args:
+            fragmentos (iterable): Fragmentos de la página.
+            consulta (str): Lo que el usuario quiere encontrar.
+
+        Returns:
+            list: Como mucho `mejores` fragmentos, en el orden del texto.
+        """
+        fragmentos = list(fragmentos)
+        self.fragmentos_totales += len(fragmentos)
+        if not fragmentos:
+            return []
+        puntuaciones = self.puntuar(fragmentos, consulta)
+        elegidos = [
+            i for i in np.argsort(-puntuaciones, kind="stable")[:self.mejores]
+            if puntuaciones[i] > 0 or not self.descartar_vacios
+        ]
+        self.fragmentos_enviados += len(elegidos)
+        return [fragmentos[i] for i in sorted(elegidos)]
+
+    def resumen(self):
+        if not self.fragmentos_totales:
+            return "No se fragmentó ninguna página."
+        return f"{self.fragmentos_enviados} de {self.fragmentos_totales} fragmentos enviados al LLM."
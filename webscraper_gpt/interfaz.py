@@ -0,0 +1,508 @@
+"""Controles de Streamlit compartidos por las páginas."""
+import os
+
+import streamlit as st
+
+from webscraper_gpt.analisis import BACKENDS
+from webscraper_gpt.cache import CacheHTTP
+from webscraper_gpt.cache_llm import CacheLLM, LLMConCache, LLMStub
+from webscraper_gpt.descargas import ConfiguracionDescargas, MotorDescargas
+from webscraper_gpt.descubrimiento import Descubridor
+from webscraper_gpt.despachador import ConfiguracionDespachador, DespachadorLLM
+from webscraper_gpt.diario import DiarioResultados, huella_archivo
+from webscraper_gpt.empresas import BusquedaDuckDuckGo, BusquedaStub, CacheEmpresas, ResolutorEmpresas, VerificadorHEAD
+from webscraper_gpt.embeddings import (
+    CacheEmbeddings,
+    EmbeddingsConCache,
+    EmbeddingsHash,
+    EmbeddingsOpenAI,
+    EmbeddingsSentenceTransformers,
+    PrefiltroSemantico,
+    SentenceTransformer,
+)
+from webscraper_gpt.llm import ClasificadorEnlaces
+from webscraper_gpt.rastreador import Rastreador
+from webscraper_gpt.resumen import ConfiguracionResumen, ResumidorMapReduce
+from webscraper_gpt.segundo_plano import CANCELADO, FALLIDO, TERMINADO, GestorTrabajos
+from webscraper_gpt.transporte import ConfiguracionTransporte, obtener_transporte
+
+
+@st.cache_resource
+def obtener_cache_paginas(ttl, max_bytes):
+    """Caché de páginas compartida por todas las sesiones de Streamlit."""
+    return CacheHTTP(ttl=ttl, max_bytes=max_bytes)
+
+
+@st.cache_resource
+def obtener_despachador(config):
+    """Despachador compartido: los límites por minuto son de la cuenta, no de cada sesión."""
+    return DespachadorLLM(config)
+
+
+@st.cache_resource
+def obtener_cache_embeddings():
+    """Caché de embeddings compartida por todas las sesiones de Streamlit."""
+    return CacheEmbeddings()
+
+
+@st.cache_resource
+def obtener_embeddings_locales(modelo):
+    """Carga el modelo de sentence-transformers una sola vez por proceso."""
+    return EmbeddingsSentenceTransformers(modelo)
+
+
+@st.cache_resource
+def obtener_cache_llm(max_entradas):
+    """Caché de respuestas del LLM compartida por todas las sesiones de Streamlit."""
+    return CacheLLM(max_entradas=max_entradas)
+
+
+@st.cache_resource
+def obtener_diario():
+    """Diario de resultados compartido por todas las sesiones de Streamlit."""
+    return DiarioResultados()
+
+
+@st.cache_resource
+def obtener_gestor_trabajos():
+    """Trabajos en segundo plano del proceso: siguen ejecutándose aunque se recargue la pestaña."""
+    return GestorTrabajos()
+
+
+@st.cache_resource
+def obtener_resolutor_empresas(solo_cache, usar_cache, max_paralelas, peticiones_por_minuto, max_resultados, verificar):
+    """Resolutor compartido: el ritmo de búsquedas es el de la IP, no el de cada sesión."""
+    backend = BusquedaStub() if solo_cache else BusquedaDuckDuckGo()
+    return ResolutorEmpresas(
+        backend,
+        CacheEmpresas() if usar_cache else None,
+        max_paralelas=max_paralelas,
+        peticiones_por_minuto=peticiones_por_minuto,
+        max_resultados=max_resultados,
+        verificar=VerificadorHEAD() if verificar else None,
+        solo_cache=solo_cache,
+        buscador=BusquedaDuckDuckGo.nombre,
+    )
+
+
+def motor_desde_barra_lateral(verificar_ssl):
+    """
+    Muestra la configuración de descargas en la barra lateral.
+
+    Args:
+        verificar_ssl (bool): Si se validan los certificados de los sitios.
+
+    Returns:
+        MotorDescargas: Motor que usa el transporte compartido del proceso.
+    """
+    st.sidebar.subheader("Descargas")
+    max_concurrencia = st.sidebar.number_input("Descargas simultáneas", min_value=1, max_value=500, value=50)
+    max_por_host = st.sidebar.number_input("Descargas simultáneas por dominio (máximo)", min_value=1, max_value=50, value=4)
+    retraso_por_host = st.sidebar.number_input("Pausa mínima entre peticiones a un dominio (s)", min_value=0.0, max_value=30.0, value=0.0)
+    por_dominio = st.sidebar.checkbox("Agrupar subdominios del mismo dominio", value=True)
+    reintentos = st.sidebar.number_input("Reintentos ante 429/503", min_value=0, max_value=10, value=2)
+    tam_pool = st.sidebar.number_input("Conexiones en el pool", min_value=1, max_value=1000, value=100)
+    tam_pool_por_host = st.sidebar.number_input("Conexiones por dominio en el pool", min_value=1, max_value=100, value=10)
+    carrera = st.sidebar.checkbox("Probar https, http y www. en paralelo", value=True)
+    timeout_conexion = st.sidebar.number_input("Tiempo máximo de conexión (s)", min_value=0.5, max_value=30.0, value=3.0)
+    timeout_lectura = st.sidebar.number_input("Tiempo máximo de lectura (s)", min_value=1.0, max_value=120.0, value=10.0)
+    mb_pagina = st.sidebar.number_input("Tamaño máximo por página (MB)", min_value=0.1, max_value=50.0, value=2.0)
+
+    st.sidebar.subheader("Caché de páginas")
+    usar_cache = st.sidebar.checkbox("Usar caché de páginas", value=True)
+    horas_cache = st.sidebar.number_input("Validez de la caché (horas)", min_value=0.0, value=24.0)
+    mb_cache = st.sidebar.number_input("Tamaño máximo de la caché (MB)", min_value=1, value=500)
+    sin_conexion = st.sidebar.checkbox("Modo sin conexión (solo caché)", value=False, disabled=not usar_cache)
+    cache = obtener_cache_paginas(horas_cache * 3600, mb_cache * 1024 * 1024) if usar_cache else None
+
+    transporte = obtener_transporte(ConfiguracionTransporte(tam_pool=tam_pool, tam_pool_por_host=tam_pool_por_host))
+    config = ConfiguracionDescargas(
+        max_concurrencia=max_concurrencia,
+        max_por_host=max_por_host,
+        retraso_por_host=retraso_por_host,
+        por_dominio=por_dominio,
+        reintentos=reintentos,
+        timeout_conexion=timeout_conexion,
+        timeout_lectura=timeout_lectura,
+        carrera=carrera,
+        sin_conexion=usar_cache and sin_conexion,
+        max_bytes=int(mb_pagina * 1024 * 1024),
+        verificar_ssl=verificar_ssl,
+    )
+    return MotorDescargas(config, transporte, cache)
+
+
+def backend_desde_barra_lateral():
+    """Permite elegir el analizador HTML entre los instalados."""
+    return st.sidebar.selectbox("Analizador HTML", ["auto"] + list(BACKENDS))
+
+
+def procesos_desde_barra_lateral():
+    """Número de procesos dedicados a analizar las páginas descargadas."""
+    return st.sidebar.number_input("Procesos de análisis", min_value=1, max_value=64, value=os.cpu_count() or 1)
+
+
+def clasificador_desde_barra_lateral(llm):
+    """
+    Muestra la configuración de los lotes enviados al LLM.
+
+    Args:
+        llm (callable): Modelo con la interfaz `llm(prompt, max_tokens=...)`.
+
+    Returns:
+        ClasificadorEnlaces: Clasificador que agrupa los enlaces por petición.
+    """
+    st.sidebar.subheader("IA")
+    tam_lote = st.sidebar.number_input("Enlaces por petición al LLM", min_value=1, max_value=200, value=20)
+    presupuesto = st.sidebar.number_input("Tokens máximos por petición", min_value=200, max_value=16000, value=2000)
+    return ClasificadorEnlaces(llm, tam_lote=tam_lote, presupuesto_tokens=presupuesto)
+
+
+def llm_desde_barra_lateral(crear_llm, modelo, temperatura=0):
+    """
+    Muestra la configuración de la caché de respuestas del LLM.
+
+    En modo repetición no se crea el LLM real (ni hace falta API key): todas
+    las respuestas salen de la caché y los prompts nuevos reciben la
+    respuesta vacía de un `LLMStub`.
+
+    Args:
+        crear_llm (callable): Crea el LLM real; solo se llama si se va a usar.
+        modelo (str): Nombre del modelo, parte de la clave de la caché.
+        temperatura (float): Temperatura del modelo, parte de la clave de la caché.
+
+    Returns:
+        callable: LLM con la interfaz `llm(prompt, max_tokens=...)`.
+    """
+    st.sidebar.subheader("Caché del LLM")
+    usar_cache = st.sidebar.checkbox("Usar caché de respuestas del LLM", value=True)
+    max_entradas = st.sidebar.number_input("Respuestas máximas en caché", min_value=100, value=100_000)
+    repeticion = st.sidebar.checkbox("Modo repetición (solo caché, sin llamadas al LLM)", value=False, disabled=not usar_cache)
+    if not usar_cache:
+        return crear_llm()
+    cache = obtener_cache_llm(max_entradas)
+    if repeticion:
+        return LLMConCache(LLMStub(), cache, solo_cache=True, modelo=modelo, temperatura=temperatura)
+    return LLMConCache(crear_llm(), cache, modelo=modelo, temperatura=temperatura)
+
+
+def despachador_desde_barra_lateral(modelo, api_key=None):
+    """
+    Muestra los límites de las peticiones al LLM en la barra lateral.
+
+    Args:
+        modelo (str): Modelo de completions de OpenAI.
+        api_key (str): Clave de la API; por defecto OPENAI_API_KEY.
+
+    Returns:
+        DespachadorLLM: Despachador compartido con esa configuración.
+    """
+    st.sidebar.subheader("Límites del LLM")
+    max_paralelas = st.sidebar.number_input("Peticiones simultáneas al LLM", min_value=1, max_value=256, value=8)
+    peticiones = st.sidebar.number_input("Peticiones por minuto", min_value=1, value=3500)
+    tokens = st.sidebar.number_input("Tokens por minuto", min_value=1000, value=90_000)
+    config = ConfiguracionDespachador(
+        modelo=modelo,
+        max_paralelas=max_paralelas,
+        peticiones_por_minuto=peticiones,
+        tokens_por_minuto=tokens,
+        api_key=api_key,
+    )
+    return obtener_despachador(config)
+
+
+def prefiltro_desde_barra_lateral(api_key=None):
+    """
+    Muestra la configuración del prefiltro semántico de enlaces.
+
+    Args:
+        api_key (str): Clave de OpenAI, solo para los embeddings de OpenAI.
+
+    Returns:
+        PrefiltroSemantico: Prefiltro configurado, o None si está desactivado.
+    """
+    st.sidebar.subheader("Prefiltro semántico")
+    if not st.sidebar.checkbox("Ordenar los enlaces por similitud antes del LLM", value=True):
+        return None
+    opciones = ["Local (n-gramas, sin conexión)"]
+    if SentenceTransformer is not None:
+        opciones.append("Local (sentence-transformers)")
+    opciones.append("OpenAI")
+    opcion = st.sidebar.selectbox("Embeddings", opciones)
+    top_k = st.sidebar.number_input("Enlaces por página enviados al LLM", min_value=1, max_value=500, value=20)
+    umbral = st.sidebar.slider("Similitud mínima", min_value=0.0, max_value=1.0, value=0.0, step=0.05)
+
+    if opcion == "OpenAI":
+        backend = EmbeddingsOpenAI(obtener_despachador(ConfiguracionDespachador(api_key=api_key)))
+    elif opcion == "Local (sentence-transformers)":
+        backend = obtener_embeddings_locales("paraphrase-multilingual-MiniLM-L12-v2")
+    else:
+        backend = EmbeddingsHash()
+    return PrefiltroSemantico(EmbeddingsConCache(backend, obtener_cache_embeddings()), top_k=top_k, umbral=umbral)
+
+
+def resumidor_desde_barra_lateral(llm):
+    """
+    Muestra el presupuesto del modo de resumen map-reduce.
+
+    Args:
+        llm (callable): Modelo con la interfaz `llm(prompt, max_tokens=...)`.
+
+    Returns:
+        ResumidorMapReduce: Resumidor con la configuración elegida.
+    """
+    st.sidebar.subheader("Resumen map-reduce")
+    tam_fragmento = st.sidebar.number_input("Tokens por fragmento", min_value=100, max_value=4000, value=800)
+    max_fragmentos = st.sidebar.number_input("Fragmentos por página", min_value=1, max_value=20, value=4)
+    max_tokens_fila = st.sidebar.number_input("Tokens máximos por fila", min_value=500, max_value=50_000, value=6000)
+    config = ConfiguracionResumen(
+        tam_fragmento=tam_fragmento,
+        solape=tam_fragmento // 10,
+        max_fragmentos=max_fragmentos,
+        max_tokens_fila=max_tokens_fila,
+    )
+    return ResumidorMapReduce(llm, config)
+
+
+def rastreador_desde_barra_lateral(motor, palabras, backend):
+    """
+    Muestra la configuración del rastreo de cada sitio más allá de la portada.
+
+    Args:
+        motor (MotorDescargas): Motor de descargas del lote.
+        palabras (iterable): Palabras clave para priorizar los enlaces a seguir.
+        backend (str): Analizador HTML.
+
+    Returns:
+        Rastreador: Rastreador configurado, o None si solo se descarga la portada.
+    """
+    st.sidebar.subheader("Rastreo")
+    if not st.sidebar.checkbox("Seguir enlaces del mismo sitio si la portada no basta", value=False):
+        return None
+    max_profundidad = st.sidebar.number_input("Profundidad máxima (clics desde la portada)", min_value=1, max_value=5, value=2)
+    max_paginas = st.sidebar.number_input("Páginas máximas por sitio", min_value=2, max_value=100, value=10)
+    paralelas = st.sidebar.number_input("Páginas simultáneas por sitio", min_value=1, max_value=20, value=3)
+    return Rastreador(motor, palabras, max_profundidad=max_profundidad, max_paginas=max_paginas, paralelas=paralelas, backend=backend)
+
+
+def descubridor_desde_barra_lateral(motor, palabras, backend, rastreador=None):
+    """
+    Muestra la configuración del descubrimiento por sitemap.xml y robots.txt.
+
+    Args:
+        motor (MotorDescargas): Motor de descargas del lote.
+        palabras (iterable): Palabras clave para puntuar las URLs del sitemap.
+        backend (str): Analizador HTML.
+        rastreador (Rastreador): Rastreo al que recurrir si el sitemap no da la página.
+
+    Returns:
+        Descubridor: Descubridor configurado o, si está desactivado, el rastreador recibido.
+    """
+    st.sidebar.subheader("Sitemap")
+    if not st.sidebar.checkbox("Buscar en sitemap.xml si la portada no basta (respetando robots.txt)", value=False):
+        return rastreador
+    max_candidatas = st.sidebar.number_input("URLs del sitemap a comprobar por sitio", min_value=1, max_value=20, value=3)
+    return Descubridor(motor, palabras, rastreador=rastreador, max_candidatas=max_candidatas, backend=backend)
+
+
+def resolutor_empresas_desde_barra_lateral():
+    """
+    Muestra la configuración de la búsqueda de sitios web por razón social.
+
+    En modo solo caché se usa un `BusquedaStub` sin respuestas: las empresas
+    ya buscadas salen de la caché y el resto se quedan sin URL. De cada
+    búsqueda se comparan varios resultados para no quedarse con un directorio
+    de empresas o una red social.
+
+    Returns:
+        ResolutorEmpresas: Resolutor compartido por las sesiones con la misma configuración.
+    """
+    st.sidebar.subheader("Búsqueda de empresas")
+    usar_cache = st.sidebar.checkbox("Usar caché de búsquedas", value=True)
+    solo_cache = st.sidebar.checkbox("Solo caché (sin búsquedas en DuckDuckGo)", value=False, disabled=not usar_cache)
+    max_paralelas = st.sidebar.number_input("Búsquedas simultáneas", min_value=1, max_value=16, value=4)
+    peticiones_por_minuto = st.sidebar.number_input("Búsquedas por minuto", min_value=1, max_value=600, value=30)
+    max_resultados = st.sidebar.number_input("Resultados comparados por búsqueda", min_value=1, max_value=30, value=8)
+    verificar = st.sidebar.checkbox("Comprobar con HEAD que el sitio elegido responde", value=True)
+    return obtener_resolutor_empresas(
+        usar_cache and solo_cache, usar_cache, max_paralelas, peticiones_por_minuto, max_resultados, verificar
+    )
+
+
+def ejecucion_reanudable(origen, columnas, descripcion, *parametros):
+    """
+    Abre en el diario la ejecución del archivo subido y muestra su estado.
+
+    Si el mismo archivo ya se procesó en parte con los mismos parámetros,
+    avisa de cuántas filas hay guardadas, permite descargar el resultado
+    parcial y empezar de cero; si no, la ejecución empieza vacía.
+
+    Args:
+        origen: Archivo subido a Streamlit.
+        columnas (list): Títulos de las columnas nuevas del Excel de salida.
+        descripcion (str): Nombre de la página o del modo de análisis.
+        *parametros: Columna, consulta... Con otros valores es otra ejecución.
+
+    Returns:
+        Ejecucion: Ejecución en la que la página registra cada fila.
+    """
+    ejecucion = obtener_diario().abrir(huella_archivo(origen, descripcion, *parametros), columnas, descripcion)
+    if not ejecucion.hechas:
+        return ejecucion
+    st.info(
+        f"Este archivo ya tiene {len(ejecucion.hechas)} filas procesadas con esta configuración: "
+        "al ejecutar solo se procesarán las que faltan."
+    )
+    parcial, reinicio = st.columns(2)
+    if parcial.button("Preparar descarga parcial"):
+        boton_descarga(ejecucion.exportar(origen), "Descargar resultado parcial", "output_parcial.xlsx", parcial)
+    if reinicio.button("Empezar de cero"):
+        ejecucion.reiniciar()
+        reinicio.success("Resultados anteriores descartados.")
+    return ejecucion
+
+
+def subir_excel():
+    """Selector del Excel de entrada, avisando de lo que conserva el Excel de resultados."""
+    return st.file_uploader(
+        "Sube tu archivo Excel",
+        type=["xlsx"],
+        help="El Excel de resultados conserva todas las hojas con sus valores, pero no el formato "
+             "(estilos, anchos, celdas combinadas); las fórmulas quedan con su último valor calculado.",
+    )
+
+
+def boton_descarga(ruta, etiqueta="Descargar archivo procesado", nombre="output_with_results.xlsx", contenedor=st, borrar=True):
+    """
+    Ofrece para descargar un Excel guardado en un archivo temporal.
+
+    Args:
+        ruta (str): Archivo generado por `EscritorExcel.guardar` o `Ejecucion.exportar`.
+        etiqueta (str): Texto del botón.
+        nombre (str): Nombre con el que se descarga.
+        contenedor: Dónde se muestra el botón (`st`, una columna...).
+        borrar (bool): Borrar el archivo después; los trabajos en segundo plano lo conservan hasta olvidarse.
+    """
+    with open(ruta, "rb") as archivo:
+        contenedor.download_button(
+            label=etiqueta,
+            data=archivo.read(),
+            file_name=nombre,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    if borrar:
+        os.remove(ruta)
+
+
+def _duracion(segundos):
+    if segundos is None:
+        return "—"
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas} h {minutos:02d} min" if horas else f"{minutos} min {segundos:02d} s"
+
+
+def trabajo_en_segundo_plano(proceso, origen, ejecucion, lanzar):
+    """
+    Lanza el proceso en segundo plano y muestra el trabajo de la página.
+
+    El id del trabajo se guarda en la URL (`?trabajo=...`), así que al
+    recargar la pestaña se vuelve a ver el mismo trabajo, que nunca dejó de
+    ejecutarse. Mientras haya uno en marcha no se lanza otro desde la misma
+    página.
+
+    Args:
+        proceso (Proceso): Proceso configurado con las opciones de la página.
+        origen: Archivo subido a Streamlit.
+        ejecucion (Ejecucion): Ejecución del diario para ese archivo.
+        lanzar (bool): Si se pulsó el botón de ejecutar.
+    """
+    gestor = obtener_gestor_trabajos()
+    trabajo = gestor.obtener(st.query_params.get("trabajo"))
+    if lanzar:
+        if trabajo is not None and trabajo.activo:
+            st.warning(f"El trabajo {trabajo.id} todavía se está ejecutando.")
+        else:
+            trabajo = gestor.lanzar(proceso, origen.getvalue(), ejecucion, descripcion=origen.name)
+            st.query_params["trabajo"] = trabajo.id
+    if trabajo is not None:
+        mostrar_trabajo(trabajo.id)
+
+
+def mostrar_trabajo(id_trabajo):
+    """
+    Estado compacto de un trabajo.
+
+    En lugar de una línea por fila se muestran los contadores, la velocidad,
+    el tiempo restante, los últimos errores y una tabla paginada. Mientras
+    el trabajo está activo se repinta cada dos segundos sin recargar la
+    página; al terminar se pinta una sola vez con el resultado, sin volver a
+    leer el Excel de salida en cada refresco.
+    """
+    trabajo = obtener_gestor_trabajos().obtener(id_trabajo)
+    if trabajo is None:
+        return
+    if trabajo.activo:
+        _trabajo_en_curso(id_trabajo)
+        return
+
+    _estado_trabajo(trabajo)
+    if trabajo.estado == TERMINADO:
+        st.success("Archivo procesado con éxito.")
+        for linea in trabajo.resumen:
+            st.info(linea)
+        boton_descarga(trabajo.ruta_salida, borrar=False)
+    elif trabajo.estado == CANCELADO:
+        st.warning("Trabajo cancelado. Lo ya procesado está en el diario: se puede descargar como resultado parcial o reanudar.")
+    elif trabajo.estado == FALLIDO:
+        st.error(f"Ocurrió un error: {trabajo.error}")
+    _tabla_trabajo_terminado(id_trabajo)
+
+
+@st.fragment(run_every=2)
+def _trabajo_en_curso(id_trabajo):
+    """Estado de un trabajo activo, repintado cada dos segundos."""
+    trabajo = obtener_gestor_trabajos().obtener(id_trabajo)
+    if trabajo is None or not trabajo.activo:
+        # Repinta la página entera con el estado final, fuera de este fragmento: deja de refrescarse
+        st.rerun()
+    _estado_trabajo(trabajo)
+    if st.button("Cancelar", key=f"cancelar_{trabajo.id}"):
+        trabajo.cancelar()
+    _tabla_resultados(trabajo)
+
+
+@st.fragment
+def _tabla_trabajo_terminado(id_trabajo):
+    """Tabla de un trabajo terminado: cambiar de página no repinta el resto ni el botón de descarga."""
+    trabajo = obtener_gestor_trabajos().obtener(id_trabajo)
+    if trabajo is not None:
+        _tabla_resultados(trabajo)
+
+
+def _estado_trabajo(trabajo):
+    progreso = trabajo.progreso
+    st.subheader(f"Trabajo {trabajo.id} ({trabajo.descripcion}): {trabajo.estado}")
+    st.progress(progreso.fraccion, text=f"{progreso.hechas} de {progreso.total or '?'} filas ({progreso.reanudadas} reanudadas)")
+    velocidad, restante, errores = st.columns(3)
+    velocidad.metric("Filas por segundo", f"{progreso.velocidad:.1f}")
+    restante.metric("Tiempo restante", _duracion(progreso.eta))
+    errores.metric("Errores", progreso.errores)
+    if progreso.mensajes:
+        st.caption(progreso.mensajes[-1])
+    if progreso.ultimos_errores:
+        with st.expander(f"Últimos errores ({len(progreso.ultimos_errores)})"):
+            st.text("\n".join(progreso.ultimos_errores))
+
+
+def _tabla_resultados(trabajo):
+    """Resultados en una sola tabla paginada."""
+    solo_errores = st.checkbox("Solo errores", key=f"errores_{trabajo.id}")
+    numero = st.number_input("Página", min_value=1, value=1, key=f"pagina_{trabajo.id}")
+    filas, paginas = trabajo.progreso.pagina(numero, solo_errores=solo_errores)
+    st.dataframe(
+        [{"Fila": fila, **dict(zip(trabajo.proceso.columnas, valores))} for fila, valores, _ in filas],
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption(f"Página {min(numero, paginas)} de {paginas}")
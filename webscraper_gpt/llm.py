@@ -0,0 +1,133 @@
+"""Clasificación de enlaces con el LLM agrupando muchos enlaces por petición."""
+import logging
+import re
+from dataclasses import dataclass
+
+from webscraper_gpt.despachador import combinar, enviar_a, estimar_tokens
+
+PLANTILLA_LOTE = """La consulta es: "{consulta}".
+Para cada uno de los siguientes enlaces numerados, indica si contiene información relacionada con la consulta.
+Responde únicamente con una línea por enlace con el formato "<número>: sí" o "<número>: no".
+
+{enlaces}
+"""
+
+# Prompt que se enviaba antes por cada enlace; solo se usa para estimar el ahorro
+PLANTILLA_INDIVIDUAL = """
+        El siguiente enlace fue encontrado: {enlace}.
+        La consulta es: "{consulta}".
+        ¿Este enlace contiene información relacionada con la consulta? Si es así, indícalo.
+        """
+
+# Tokens de respuesta que se reservaban por enlace con el prompt individual
+MAX_TOKENS_INDIVIDUAL = 100
+
+# Líneas "3: sí", "3. no", "3) si"...
+_LINEA_RESPUESTA = re.compile(r"^\s*(\d+)\s*[:.)\-]\s*(s[ií]|no)\b", re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass
+class EstadisticasLLM:
+    """Llamadas y tokens gastados frente a los que habría costado un enlace por petición."""
+    llamadas: int = 0
+    llamadas_sin_lotes: int = 0
+    tokens: int = 0
+    tokens_sin_lotes: int = 0
+    sin_interpretar: int = 0
+
+    def resumen(self):
+        if not self.llamadas_sin_lotes:
+            return "No se hicieron llamadas al LLM."
+        ahorro_llamadas = 100 * (1 - self.llamadas / self.llamadas_sin_lotes)
+        ahorro_tokens = 100 * (1 - self.tokens / self.tokens_sin_lotes)
+        texto = (
+            f"{self.llamadas} llamadas al LLM en lugar de {self.llamadas_sin_lotes} ({ahorro_llamadas:.0f}% menos); "
+            f"~{self.tokens} tokens estimados en lugar de ~{self.tokens_sin_lotes} ({ahorro_tokens:.0f}% menos)."
+        )
+        if self.sin_interpretar:
+            texto += f" {self.sin_interpretar} enlaces sin respuesta interpretable se marcaron como no relevantes."
+        return texto
+
+
+class ClasificadorEnlaces:
+    """
+    Decide con el LLM qué enlaces son relevantes para la consulta, por lotes.
+
+    Cada petición incluye la consulta una sola vez y hasta `tam_lote` enlaces
+    numerados, sin superar `presupuesto_tokens` de prompt; el modelo responde
+    una línea "<número>: sí/no" por enlace.
+    """
+
+    def __init__(self, llm, tam_lote=20, presupuesto_tokens=2000, tokens_por_respuesta=4):
+        self.llm = llm
+        self.tam_lote = tam_lote
+        self.presupuesto_tokens = presupuesto_tokens
+        self.tokens_por_respuesta = tokens_por_respuesta
+        self.estadisticas = EstadisticasLLM()
+
+    def _lotes(self, enlaces, consulta):
+        base = estimar_tokens(PLANTILLA_LOTE.format(consulta=consulta, enlaces=""))
+        lote, tokens = [], base
+        for enlace in enlaces:
+            coste = estimar_tokens(enlace) + 2
+            if lote and (len(lote) >= self.tam_lote or tokens + coste > self.presupuesto_tokens):
+                yield lote
+                lote, tokens = [], base
+            lote.append(enlace)
+            tokens += coste
+        if lote:
+            yield lote
+
+    def _prompt(self, lote, consulta):
+        numerados = "\n".join(f"{numero}. {enlace}" for numero, enlace in enumerate(lote, start=1))
+        return PLANTILLA_LOTE.format(consulta=consulta, enlaces=numerados)
+
+    def _interpretar(self, respuesta, lote):
+        """Convierte la respuesta del modelo en la lista de enlaces marcados con sí."""
+        veredictos = {}
+        for numero, veredicto in _LINEA_RESPUESTA.findall(respuesta):
+            veredictos[int(numero)] = not veredicto.lower().startswith("n")
+
+        sin_interpretar = sum(1 for numero in range(1, len(lote) + 1) if numero not in veredictos)
+        if sin_interpretar:
+            logging.warning(f"El LLM no respondió a {sin_interpretar} de {len(lote)} enlaces del lote")
+            self.estadisticas.sin_interpretar += sin_interpretar
+        return [enlace for numero, enlace in enumerate(lote, start=1) if veredictos.get(numero)]
+
+    def enviar(self, enlaces, consulta):
+        """
+        Envía todos los lotes de enlaces al LLM sin esperar las respuestas.
+
+        Args:
+            enlaces (list): URLs candidatas (se eliminan las repetidas).
+            consulta (str): Lo que el usuario quiere encontrar.
+
+        Returns:
+            concurrent.futures.Future: Se completa con los enlaces relevantes, en el orden original.
+        """
+        enlaces = list(dict.fromkeys(enlaces))
+        lotes = list(self._lotes(enlaces, consulta))
+        futuros = []
+        for lote in lotes:
+            prompt = self._prompt(lote, consulta)
+            max_tokens = self.tokens_por_respuesta * len(lote) + 10
+            futuros.append(enviar_a(self.llm, prompt, max_tokens))
+
+            self.estadisticas.llamadas += 1
+            self.estadisticas.tokens += estimar_tokens(prompt) + max_tokens
+        for enlace in enlaces:
+            prompt_individual = PLANTILLA_INDIVIDUAL.format(enlace=enlace, consulta=consulta)
+            self.estadisticas.llamadas_sin_lotes += 1
+            self.estadisticas.tokens_sin_lotes += estimar_tokens(prompt_individual) + MAX_TOKENS_INDIVIDUAL
+
+        def unir(respuestas):
+            relevantes = []
+            for respuesta, lote in zip(respuestas, lotes):
+                relevantes += self._interpretar(respuesta, lote)
+            return relevantes
+
+        return combinar(futuros, unir)
+
+    def clasificar(self, enlaces, consulta):
+        """Como `enviar`, pero espera y devuelve la lista de enlaces relevantes."""
+        return self.enviar(enlaces, consulta).result()
@@ -0,0 +1,167 @@
+"""Canalización descarga -> análisis -> escritura conectada por colas acotadas."""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from webscraper_gpt.planificador import ColaPorHost
+
+# Marca de fin de cola
+_FIN = object()
+
+_pools = {}
+_cerrojo = threading.Lock()
+
+
+def obtener_pool(procesos=None):
+    """
+    Devuelve el pool de procesos de análisis de ese tamaño, compartido por todas las páginas.
+
+    Hay uno por número de procesos y ninguno se cierra mientras viva el
+    proceso, porque otras sesiones o trabajos en segundo plano pueden estar
+    usándolo.
+
+    Se usa el arranque "spawn" porque el proceso de Streamlit tiene hilos
+    (servidor, transporte HTTP) que no sobreviven bien a un fork.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    with _cerrojo:
+        if procesos not in _pools:
+            _pools[procesos] = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[procesos]
+
+
+@dataclass
+class ResultadoPipeline:
+    """Resultado de un trabajo: URL final descargada (None si falló) y lo que devolvió el análisis."""
+    clave: object
+    url: str = None
+    analisis: object = None
+    error: str = None
+
+
+class Pipeline:
+    """
+    Separa las etapas de un lote para que ninguna frene a las demás.
+
+    1. Descarga: tareas asíncronas en el bucle del transporte.
+    2. Análisis: `analizar(contenido, url, codificacion)` en un pool de
+       procesos, uno por núcleo, fuera del GIL del proceso principal.
+    3. Escritura: el hilo que itera `procesar`, que recibe los resultados
+       a medida que terminan.
+
+    Las etapas se comunican con colas acotadas: si la escritura o el análisis
+    se retrasan, las descargas esperan en lugar de acumular páginas en memoria.
+    Los trabajos pendientes se reparten por turnos entre dominios (ver
+    `ColaPorHost`), para que las filas de un mismo dominio no frenen al resto.
+    La función de análisis debe poder serializarse (una función de módulo o
+    un `functools.partial` de una).
+
+    Con un `rastreador`, cada trabajo rastrea su sitio en la etapa de
+    descarga (analizando cada página en el pool) y entrega directamente el
+    resultado de la mejor página encontrada.
+    """
+
+    def __init__(self, motor, analizar, procesos=None, tam_cola=None, crear_detector=None, rastreador=None):
+        self.motor = motor
+        self.rastreador = rastreador
+        self.analizar = analizar
+        self.procesos = procesos or os.cpu_count() or 1
+        self.tam_cola = tam_cola or 4 * self.procesos
+        self.crear_detector = crear_detector
+
+    def procesar(self, trabajos):
+        """
+        Ejecuta el lote y devuelve los resultados según se completan.
+
+        Args:
+            trabajos (iterable): Pares (clave, lista de URLs candidatas).
+
+        Yields:
+            ResultadoPipeline: Un resultado por trabajo, en orden de finalización.
+        """
+        salida = queue.Queue(maxsize=self.tam_cola)
+        detener = threading.Event()
+        futuro = asyncio.run_coroutine_threadsafe(
+            self._ejecutar(iter(trabajos), salida, detener), self.motor.transporte.bucle
+        )
+        try:
+            while (elemento := salida.get()) is not _FIN:
+                yield elemento
+            futuro.result()  # Propaga los errores de las etapas
+        finally:
+            detener.set()
+            futuro.cancel()
+
+    @staticmethod
+    def _poner(salida, elemento, detener):
+        """Put bloqueante que se abandona si el consumidor dejó de leer."""
+        while not detener.is_set():
+            try:
+                salida.put(elemento, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def _ejecutar(self, trabajos, salida, detener):
+        bucle = asyncio.get_running_loop()
+        pool = obtener_pool(self.procesos)
+        semaforo, planificador = self.motor.crear_limites()
+        pendientes = ColaPorHost(planificador, self.tam_cola)
+        descargadas = asyncio.Queue(maxsize=self.tam_cola)
+        num_descargadores = self.motor.config.max_concurrencia
+
+        async def alimentar():
+            # Los trabajos se leen fuera del bucle: pueden venir de un Excel que aún se está leyendo
+            while (trabajo := await bucle.run_in_executor(None, next, trabajos, _FIN)) is not _FIN:
+                _, candidatos = trabajo
+                await pendientes.poner(candidatos[0] if candidatos else "", trabajo)
+            await pendientes.cerrar()
+
+        async def descargar():
+            while (trabajo := await pendientes.obtener()) is not None:
+                clave, candidatos = trabajo
+                if self.rastreador:
+                    resultado = await self.rastreador.rastrear(
+                        clave, candidatos, self.analizar, pool, semaforo, planificador, self.crear_detector
+                    )
+                    await bucle.run_in_executor(None, self._poner, salida, resultado, detener)
+                    continue
+                respuesta = await self.motor.descargar(candidatos, semaforo, planificador, self.crear_detector)
+                await descargadas.put((clave, respuesta))
+
+        async def analizar():
+            while (elemento := await descargadas.get()) is not _FIN:
+                clave, respuesta = elemento
+                if respuesta is None:
+                    resultado = ResultadoPipeline(clave, error="Error al acceder")
+                else:
+                    try:
+                        analisis = await bucle.run_in_executor(
+                            pool, self.analizar, respuesta.contenido, respuesta.url, respuesta.codificacion
+                        )
+                        resultado = ResultadoPipeline(clave, respuesta.url, analisis)
+                    except Exception as e:
+                        logging.error(f"Error al analizar {respuesta.url}: {e!r}")
+                        resultado = ResultadoPipeline(clave, respuesta.url, error=f"Error al analizar: {e}")
+                await bucle.run_in_executor(None, self._poner, salida, resultado, detener)
+
+        tareas = []
+        try:
+            tareas = [asyncio.ensure_future(descargar()) for _ in range(num_descargadores)]
+            analizadores = [asyncio.ensure_future(analizar()) for _ in range(self.procesos)]
+            tareas += analizadores
+            await asyncio.gather(alimentar(), *tareas[:num_descargadores])
+            for _ in analizadores:
+                await descargadas.put(_FIN)
+            await asyncio.gather(*analizadores)
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            logging.info(planificador.resumen())
+            if not detener.is_set():
+                await bucle.run_in_executor(None, self._poner, salida, _FIN, detener)
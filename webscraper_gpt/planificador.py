@@ -0,0 +1,261 @@
+"""Planificación de las descargas por dominio: concurrencia adaptativa y cortesía."""
+import asyncio
+import collections
+import random
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+try:
+    import tldextract  # opcional, conoce todos los sufijos públicos
+except ImportError:
+    tldextract = None
+
+# Respuestas con las que el servidor pide que se le pregunte menos
+ESTADOS_SATURACION = (429, 503)
+
+# Segundos niveles habituales bajo un dominio de país ("empresa.com.es", "empresa.co.uk")
+_SEGUNDO_NIVEL = {"co", "com", "org", "net", "gob", "gov", "edu", "ac", "nom", "or", "ne"}
+
+
+def host_de(url):
+    """Host en minúsculas de una URL, o "" si no tiene o está mal formada ("http://[roto", "http://web:abc")."""
+    try:
+        partes = urlsplit(url)
+        partes.port  # Valida también el puerto
+        return (partes.hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+def dominio_registrado(host):
+    """
+    Dominio registrado de un host ("tienda.grupo.com.es" -> "grupo.com.es").
+
+    Usa `tldextract` si está instalado y, si no, una aproximación que cubre
+    los dominios genéricos y los de país con segundo nivel habitual.
+    """
+    host = (host or "").lower().rstrip(".")
+    if not host or host.replace(".", "").isdigit() or ":" in host:
+        return host
+    if tldextract:
+        partes = tldextract.extract(host, include_psl_private_domains=False)
+        return partes.registered_domain or host
+    etiquetas = host.split(".")
+    n = 3 if len(etiquetas) >= 3 and len(etiquetas[-1]) == 2 and etiquetas[-2] in _SEGUNDO_NIVEL else 2
+    return ".".join(etiquetas[-n:])
+
+
+class EstadoHost:
+    """Ventana de concurrencia, retraso y latencia observada de un host."""
+
+    def __init__(self, limite):
+        self.limite = float(limite)
+        self.activas = 0
+        self.siguiente = 0.0
+        self.retraso = 0.0
+        self.latencia = None
+        self.latencia_minima = None
+        self.saturaciones = 0
+        self.ultima_reduccion = 0.0
+
+
+class Turno:
+    """Permiso para una petición a un host; el motor anota aquí cómo fue."""
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.estado = None
+        self.latencia = None
+        self.retry_after = None
+        self.timeout = False
+
+    def registrar(self, estado=None, latencia=None, retry_after=None, timeout=False):
+        """Anota el código HTTP, la latencia hasta las cabeceras, el Retry-After y si se agotó el tiempo."""
+        self.estado = estado
+        self.latencia = latencia
+        self.retry_after = retry_after
+        self.timeout = timeout
+
+
+class PlanificadorHosts:
+    """
+    Reparte las descargas de un lote entre hosts con cortesía y sin atascos.
+
+    Las peticiones se agrupan por dominio registrado (o por host), porque
+    muchas filas del Excel acaban en el mismo proveedor de alojamiento o en
+    el mismo grupo empresarial. Cada grupo tiene su propia ventana de
+    concurrencia, que crece en uno por ventana completada con éxito y se
+    reduce a la mitad (AIMD) cuando el servidor responde 429/503, cuando se
+    agota el tiempo o cuando la latencia se dispara respecto a la mínima
+    observada. Tras una saturación el grupo espera el Retry-After o un
+    retroceso exponencial con jitter, y entre dos peticiones al mismo grupo
+    pasan al menos `retraso_minimo` segundos, o el retraso que pida el
+    propio sitio (el Crawl-delay de su robots.txt, ver `fijar_retraso`).
+    """
+
+    def __init__(self, max_por_host=4, inicial=2, retraso_minimo=0.0, por_dominio=True, espera_base=1,
+                 espera_max=60, factor_latencia=3.0):
+        self.max_por_host = max_por_host
+        self.inicial = min(inicial, max_por_host)
+        self.retraso_minimo = retraso_minimo
+        self.por_dominio = por_dominio
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.factor_latencia = factor_latencia
+        self.hosts = {}
+        self.saturaciones = 0
+        self.reducciones = 0
+        self._condicion = asyncio.Condition()
+
+    def clave(self, url):
+        """Grupo de cortesía de una URL: su dominio registrado o su host."""
+        host = host_de(url)
+        return dominio_registrado(host) if self.por_dominio else host
+
+    def _estado(self, clave):
+        if clave not in self.hosts:
+            self.hosts[clave] = EstadoHost(self.inicial)
+        return self.hosts[clave]
+
+    def fijar_retraso(self, url, segundos):
+        """Retraso mínimo entre peticiones al grupo de `url` para todos los trabajos del lote."""
+        estado = self._estado(self.clave(url))
+        estado.retraso = max(estado.retraso, segundos)
+
+    def espera(self, clave):
+        """Segundos hasta que el grupo admite otra petición (0 si ya puede), o None si está lleno."""
+        estado = self._estado(clave)
+        if estado.activas >= max(1, int(estado.limite)):
+            return None
+        return max(0.0, estado.siguiente - time.monotonic())
+
+    def disponible(self, clave):
+        """Si una petición al grupo empezaría ya, sin esperar."""
+        return self.espera(clave) == 0
+
+    @asynccontextmanager
+    async def turno(self, url):
+        """
+        Espera el turno de una petición a `url` y lo libera al terminar.
+
+        Yields:
+            Turno: Donde se anota el resultado para ajustar la ventana del grupo.
+        """
+        turno = Turno(self.clave(url))
+        estado = self._estado(turno.clave)
+        async with self._condicion:
+            while (espera := self.espera(turno.clave)) != 0:
+                try:
+                    await asyncio.wait_for(self._condicion.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+            estado.activas += 1
+            estado.siguiente = time.monotonic() + max(self.retraso_minimo, estado.retraso)
+        try:
+            yield turno
+        finally:
+            async with self._condicion:
+                estado.activas -= 1
+                self._ajustar(estado, turno)
+                self._condicion.notify_all()
+
+    def _reducir(self, estado, ahora):
+        # Una sola reducción por ventana: las peticiones que ya estaban en vuelo no cuentan dos veces
+        if ahora - estado.ultima_reduccion < (estado.latencia or 1):
+            return
+        estado.limite = max(1.0, estado.limite / 2)
+        estado.ultima_reduccion = ahora
+        self.reducciones += 1
+
+    def _ajustar(self, estado, turno):
+        ahora = time.monotonic()
+        if turno.timeout or turno.estado in ESTADOS_SATURACION:
+            estado.saturaciones += 1
+            self.saturaciones += 1
+            self._reducir(estado, ahora)
+            espera = random.uniform(0, min(self.espera_max, self.espera_base * 2 ** estado.saturaciones))
+            try:
+                espera = max(espera, min(self.espera_max, float(turno.retry_after)))
+            except (TypeError, ValueError):
+                pass
+            estado.siguiente = max(estado.siguiente, ahora + espera)
+            return
+        if turno.latencia is None:
+            return
+
+        estado.saturaciones = 0
+        estado.latencia = turno.latencia if estado.latencia is None else 0.8 * estado.latencia + 0.2 * turno.latencia
+        estado.latencia_minima = min(estado.latencia_minima or turno.latencia, turno.latencia)
+        if estado.latencia > self.factor_latencia * max(estado.latencia_minima, 0.05):
+            self._reducir(estado, ahora)
+        else:
+            estado.limite = min(self.max_por_host, estado.limite + 1 / estado.limite)
+
+    def resumen(self):
+        return (
+            f"Planificador: {len(self.hosts)} dominios, {self.saturaciones} respuestas de saturación "
+            f"(429/503 o tiempo agotado), {self.reducciones} reducciones de concurrencia."
+        )
+
+
+class ColaPorHost:
+    """
+    Cola acotada de trabajos que alterna entre dominios.
+
+    `obtener` recorre los dominios por turnos y entrega el primer trabajo
+    cuyo dominio admite otra petición según el planificador, así que las
+    filas seguidas del mismo dominio no ocupan a todos los descargadores
+    mientras los demás sitios esperan. Si ningún dominio está libre, espera
+    a que termine alguna petición o pase el retraso del más próximo.
+    """
+
+    def __init__(self, planificador, capacidad):
+        self.planificador = planificador
+        self.capacidad = capacidad
+        self._colas = collections.OrderedDict()
+        self._total = 0
+        self._cerrada = False
+        # La misma condición que el planificador: liberar un turno despierta a la cola
+        self._cambio = planificador._condicion
+
+    async def poner(self, url, trabajo):
+        """Encola un trabajo bajo el dominio de `url`; espera si la cola está llena."""
+        async with self._cambio:
+            await self._cambio.wait_for(lambda: self._total < self.capacidad)
+            self._colas.setdefault(self.planificador.clave(url), collections.deque()).append(trabajo)
+            self._total += 1
+            self._cambio.notify_all()
+
+    async def cerrar(self):
+        """Indica que no habrá más trabajos."""
+        async with self._cambio:
+            self._cerrada = True
+            self._cambio.notify_all()
+
+    def _sacar(self, clave):
+        cola = self._colas.pop(clave)
+        trabajo = cola.popleft()
+        if cola:
+            self._colas[clave] = cola  # Al final: el siguiente turno es de otro dominio
+        self._total -= 1
+        self._cambio.notify_all()
+        return trabajo
+
+    async def obtener(self):
+        """Devuelve el siguiente trabajo, o None si la cola está cerrada y vacía."""
+        async with self._cambio:
+            while True:
+                timeout = None
+                if self._total:
+                    esperas = {clave: self.planificador.espera(clave) for clave in self._colas}
+                    libre = next((clave for clave, espera in esperas.items() if espera == 0), None)
+                    if libre is not None:
+                        return self._sacar(libre)
+                    timeout = min((espera for espera in esperas.values() if espera is not None), default=None)
+                elif self._cerrada:
+                    return None
+                try:
+                    await asyncio.wait_for(self._cambio.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
@@ -0,0 +1,603 @@
+"""
+Procesamiento completo de un Excel, sin Streamlit.
+
+Aquí vive lo que hacen las páginas al pulsar "Ejecutar búsqueda": leer el
+Excel, descargar y analizar cada sitio, consultar la IA y escribir el
+resultado. Las páginas y la línea de comandos (`python -m webscraper_gpt`)
+solo construyen los componentes y llaman a `ejecutar`.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import as_completed
+from functools import partial
+
+from webscraper_gpt.coincidencias import BuscadorPalabras, DetectorIncremental, palabras_de_consulta
+from webscraper_gpt.descargas import candidatos_url
+from webscraper_gpt.excel import EscritorExcel, LectorExcel
+from webscraper_gpt.fragmentos import SelectorFragmentos
+from webscraper_gpt.pipeline import Pipeline
+from webscraper_gpt.tareas import analizar_enlaces, analizar_fragmentos, analizar_palabras_clave
+
+# Valores por defecto de las páginas y de la línea de comandos
+PALABRAS_CLAVE = (
+    "denuncia, denuncias, canal de denuncias, canal ético, compliance, "
+    "Channel, ethics, complaint, canaldenuncias, canaletico, etico, ético, "
+    "código de conducta, code of conduct, whistleblower channel, Reporting channel, "
+    "Whistleblowing channel, canal de ética, ética, Complaints Channel, "
+    "Sistema Interno de Información, Canal del informante, Canal de información, "
+    "Canal de comunicación interno, General conditions of sale, buen gobierno"
+)
+CONSULTA = (
+    "Necesito encontrar información referente a: denuncia, denuncias, canal de denuncias, canal ético, "
+    "compliance, ethics, complaint, canaldenuncias, canaletico, etico, ético, código de conducta, "
+    "code of conduct, whistleblower channel, Reporting channel, Whistleblowing channel, canal de ética, "
+    "ética, Complaints Channel, Sistema Interno de Información, Canal del informante, Canal de información, "
+    "Canal de comunicación interno, General conditions of sale, buen gobierno"
+)
+
+
+class Cancelado(Exception):
+    """El progreso de la ejecución pidió detenerla."""
+
+
+def es_url_valida(url):
+    return bool(url) and " " not in str(url) and "." in str(url)
+
+
+class Salida:
+    """Excel de salida y, si los hay, el diario de la ejecución y su progreso."""
+
+    def __init__(self, escritor, ejecucion=None, progreso=None):
+        self.escritor = escritor
+        self.ejecucion = ejecucion
+        self.progreso = progreso
+
+    def original(self, fila, valores):
+        """
+        Registra una fila leída del Excel.
+
+        Returns:
+            bool: True si la fila ya estaba en el diario; entonces ya queda escrita y no hay que procesarla.
+        """
+        self.escritor.original(fila, valores)
+        if self.ejecucion is not None and fila in self.ejecucion.hechas:
+            self.escritor.completar(fila, *self.ejecucion.hechas[fila])
+            if self.progreso is not None:
+                self.progreso.reanudada(fila, self.ejecucion.hechas[fila])
+            return True
+        return False
+
+    def completar(self, fila, *valores, reintentar=False):
+        """
+        Escribe el resultado de una fila.
+
+        Args:
+            fila (int): Número de fila en la hoja.
+            *valores: Valores de las columnas nuevas.
+            reintentar (bool): Errores de red o de la IA: no van al diario, así que al reanudar se repiten.
+
+        Raises:
+            Cancelado: Si se pidió detener la ejecución; lo ya escrito sigue en el diario.
+        """
+        if self.ejecucion is not None and not reintentar:
+            self.ejecucion.registrar(fila, *valores)
+        self.escritor.completar(fila, *valores)
+        if self.progreso is not None:
+            self.progreso.fila(fila, valores, error=reintentar)
+            if self.progreso.detener.is_set():
+                raise Cancelado()
+
+
+class Proceso:
+    """
+    Base de los modos de procesamiento.
+
+    Las subclases definen `nombre`, las `columnas` nuevas del Excel de
+    salida y `_procesar`. Los mensajes de cada fila se pasan a `informar`
+    (`st.write` en las páginas, `logging.info` en la línea de comandos).
+
+    Args:
+        motor (MotorDescargas): Motor de descargas.
+        columna (str): Columna con la URL de cada fila.
+        procesos (int): Procesos de análisis; por defecto uno por núcleo.
+        backend (str): Analizador HTML.
+        rastreador (Rastreador): Rastreo (o descubrimiento) de cada sitio, o None para solo la portada.
+        informar (callable): Recibe los mensajes de progreso.
+    """
+
+    nombre = ""
+    columnas = []
+
+    def __init__(self, motor, columna="WEBSITE", procesos=None, backend="auto", rastreador=None, informar=None):
+        self.motor = motor
+        self.columna = columna
+        self.procesos = procesos
+        self.backend = backend
+        self.rastreador = rastreador
+        self.informar = informar or logging.info
+
+    def parametros(self):
+        """Lo que identifica la ejecución en el diario: con otros valores el resultado sería otro."""
+        return (self.nombre, self.columna)
+
+    def columnas_entrada(self):
+        return [self.columna]
+
+    def _pipeline(self, analizar, crear_detector=None):
+        return Pipeline(self.motor, analizar, procesos=self.procesos, crear_detector=crear_detector, rastreador=self.rastreador)
+
+    def ejecutar(self, origen, ejecucion=None, ruta=None, progreso=None):
+        """
+        Procesa todas las filas del Excel.
+
+        Args:
+            origen: Ruta del Excel o archivo subido.
+            ejecucion (Ejecucion): Ejecución del diario; las filas ya hechas no se procesan.
+            ruta (str): Archivo de salida; por defecto, uno temporal.
+            progreso (Progreso): Contadores para seguir la ejecución desde otro hilo.
+
+        Returns:
+            str: Ruta del Excel con los resultados.
+
+        Raises:
+            ValueError: Si falta alguna de las columnas de entrada.
+            Cancelado: Si se detuvo con `progreso.cancelar()`.
+        """
+        with LectorExcel(origen) as lector:
+            self.indices_entrada(lector)
+            if progreso is not None:
+                progreso.empezar(lector.filas_estimadas)
+            salida = Salida(EscritorExcel(lector.cabecera, self.columnas, lector=lector), ejecucion, progreso)
+            self.procesar(lector, salida)
+        ruta = salida.escritor.guardar(ruta)
+        for linea in self.resumen():
+            logging.info(linea)
+        return ruta
+
+    def indices_entrada(self, lector):
+        """
+        Posición de cada columna de entrada en el lector.
+
+        Raises:
+            ValueError: Si falta alguna.
+        """
+        indices = []
+        for nombre in self.columnas_entrada():
+            indice = lector.columna(nombre)
+            if indice is None:
+                raise ValueError(f"Columna '{nombre}' no encontrada.")
+            indices.append(indice)
+        return indices
+
+    def procesar(self, lector, salida):
+        """
+        Procesa las filas de un lector y escribe cada resultado en `salida`.
+
+        El lector puede ser un `LectorExcel` o cualquier objeto con
+        `cabecera`, `columna`, `filas` y `filas_estimadas`, como los shards
+        de la cola de trabajo.
+        """
+        self._procesar(lector, salida, *self.indices_entrada(lector))
+
+    def _procesar(self, lector, salida, *indices):
+        raise NotImplementedError
+
+    def resumen(self):
+        """Líneas con las estadísticas de los componentes usados."""
+        return []
+
+
+class ProcesoPalabrasClave(Proceso):
+    """
+    Busca palabras clave en cada sitio y guarda el enlace donde aparecen.
+
+    Args:
+        palabras (iterable): Palabras clave.
+        cortar_lectura (bool): Dejar de leer la página al encontrar una palabra clave.
+        **opciones: Argumentos de `Proceso`.
+    """
+
+    nombre = "palabras clave"
+    columnas = ["Resultado"]
+
+    def __init__(self, motor, palabras, cortar_lectura=True, **opciones):
+        super().__init__(motor, **opciones)
+        self.palabras = tuple(palabras)
+        self.cortar_lectura = cortar_lectura
+        # Buscador compilado una vez: encuentra todas las palabras en una pasada, sin tildes ni mayúsculas
+        self.buscador = BuscadorPalabras(self.palabras)
+
+    def parametros(self):
+        return (self.nombre, self.columna, ",".join(self.palabras))
+
+    def _procesar(self, lector, salida, columna):
+        total_filas = lector.filas_estimadas
+        urls = {}
+
+        def trabajos():
+            """Lee el Excel fila a fila; las filas sin URL pasan sin candidatas y no se descargan."""
+            for row, valores in lector.filas():
+                if salida.original(row, valores):
+                    continue
+                urls[row] = valores[columna]
+                yield row, candidatos_url(urls[row]) if urls[row] else []
+
+        # Descarga asíncrona (https, http y www. compiten entre sí) -> análisis en procesos -> escritura aquí
+        crear_detector = partial(DetectorIncremental, self.buscador) if self.cortar_lectura else None
+        analizar = partial(analizar_palabras_clave, palabras=self.palabras, backend=self.backend)
+
+        for counter, resultado in enumerate(self._pipeline(analizar, crear_detector).procesar(trabajos()), start=1):
+            row = resultado.clave
+            url = urls.pop(row)
+            logging.info(f"{counter} - Procesando fila {row - 1} de {total_filas or '?'}")
+
+            if not url:
+                salida.completar(row, "URL vacía")
+                self.informar(f"{counter} ⚠️ URL vacía en la fila {row}")
+            elif not resultado.url:
+                salida.completar(row, "Error al acceder después de reintentos", reintentar=True)
+                self.informar(f"{counter} ❌ Error al acceder a {url}")
+            elif resultado.error:
+                salida.completar(row, resultado.error)
+                self.informar(f"{counter} ❌ {resultado.error} ({url})")
+            elif resultado.analisis:
+                keyword, link_href = resultado.analisis
+                link_href = link_href or f"Palabra clave encontrada: '{keyword}' - Link no encontrado"
+                salida.completar(row, link_href)
+                self.informar(f"{counter} ✔️ Palabra clave '{keyword}' encontrada en {url}")
+            else:
+                salida.completar(row, "Palabras clave no encontradas")
+                self.informar(f"{counter} ⚠️ No se encontraron palabras clave en {url}")
+
+
+class ProcesoIA(Proceso):
+    """
+    Pregunta a la IA qué enlaces de cada sitio responden a la consulta, o resume su contenido.
+
+    Args:
+        clasificador (ClasificadorEnlaces): Clasificación de enlaces por lotes.
+        consulta (str): Lo que se quiere encontrar.
+        resumidor (ResumidorMapReduce): Si se indica, se resume el contenido en lugar de clasificar enlaces.
+        prefiltro (PrefiltroSemantico): Deja solo los enlaces más parecidos a la consulta antes del LLM;
+            al resumir, sus embeddings puntúan los fragmentos junto con las palabras clave.
+        llm (callable): LLM usado, solo para mostrar sus estadísticas.
+        **opciones: Argumentos de `Proceso`.
+    """
+
+    nombre = "IA"
+
+    def __init__(self, motor, clasificador, consulta=CONSULTA, resumidor=None, prefiltro=None, llm=None, **opciones):
+        super().__init__(motor, **opciones)
+        self.clasificador = clasificador
+        self.consulta = consulta
+        self.resumidor = resumidor
+        self.prefiltro = prefiltro
+        self.llm = llm
+        # Palabras clave de la consulta para filtrar los enlaces antes de la IA
+        self.palabras = tuple(palabras_de_consulta(consulta))
+        # Elección final de los fragmentos a resumir, con la consulta real y los embeddings del prefiltro
+        self.selector = SelectorFragmentos(
+            BuscadorPalabras(self.palabras),
+            prefiltro.embeddings if prefiltro else None,
+            mejores=resumidor.config.max_fragmentos,
+        ) if resumidor else None
+
+    @property
+    def columnas(self):
+        # Resultado y enlaces relevantes (o el resumen de la página)
+        return ["Resultado", "Resumen" if self.resumidor else "Enlaces Relevantes"]
+
+    def parametros(self):
+        return (self.nombre, "resumen" if self.resumidor else "enlaces", self.columna, self.consulta)
+
+    def buscar_con_ia(self, enlaces):
+        """Búsqueda semántica usando IA sobre los enlaces y la consulta."""
+        # El prefiltro semántico deja solo los enlaces (texto, URL) más parecidos a la consulta
+        enlaces = self.prefiltro.filtrar(enlaces, self.consulta) if self.prefiltro else [url for _, url in enlaces]
+        # Se envían varios enlaces por petición y el LLM responde sí/no para cada uno.
+        # Devuelve un Future: la respuesta llega en segundo plano mientras se procesan otras filas
+        return self.clasificador.enviar(enlaces, self.consulta)
+
+    def _procesar(self, lector, salida, columna):
+        # Las URLs inválidas pasan sin candidatas: no se descarga nada y se marcan al recibirlas
+        urls = {}
+        contador = 1
+
+        def trabajos():
+            for row, valores in lector.filas():
+                if salida.original(row, valores):
+                    continue
+                urls[row] = valores[columna]
+                yield row, candidatos_url(urls[row]) if es_url_valida(urls[row]) else []
+
+        # Descarga asíncrona -> extracción de enlaces (o fragmentos) en procesos -> IA y escritura aquí
+        if self.resumidor:
+            # Los procesos solo preseleccionan por palabras clave; con embeddings se quedan más candidatos,
+            # también sin palabras clave, y la similitud con la consulta decide aquí
+            con_embeddings = self.selector.embeddings is not None
+            analizar = partial(
+                analizar_fragmentos,
+                palabras=self.palabras,
+                backend=self.backend,
+                tam_fragmento=self.resumidor.config.tam_fragmento,
+                solape=self.resumidor.config.solape,
+                mejores=self.resumidor.config.max_fragmentos * (3 if con_embeddings else 1),
+                descartar_vacios=not con_embeddings,
+            )
+        else:
+            analizar = partial(analizar_enlaces, palabras=self.palabras, backend=self.backend, con_texto=True)
+
+        # Las respuestas de la IA llegan en segundo plano: cada fila se escribe cuando termina la suya
+        pendientes = {}
+
+        def escribir_clasificadas(esperar=False):
+            nonlocal contador
+            terminadas = as_completed(list(pendientes)) if esperar else [futuro for futuro in list(pendientes) if futuro.done()]
+            for futuro in terminadas:
+                row = pendientes.pop(futuro)
+                url = urls.pop(row)
+                if futuro.exception():
+                    salida.completar(row, f"❌ Error en la IA ({contador}).", str(futuro.exception()), reintentar=True)
+                    contador += 1
+                    self.informar(f"❌ Error en la IA para {url}: {futuro.exception()}")
+                    continue
+
+                if self.resumidor:
+                    resumen = futuro.result()
+                    if resumen.relevante:
+                        salida.completar(row, f"✔️ Información relevante encontrada ({contador}).", resumen.resumen)
+                    else:
+                        salida.completar(row, f"❌ No se encontró información relevante ({contador}).", resumen.resumen)
+                else:
+                    enlaces_relevantes = futuro.result()  # Enlaces filtrados con IA
+                    if enlaces_relevantes:
+                        salida.completar(row, f"✔️ Enlaces relevantes encontrados ({contador}).", ", ".join(enlaces_relevantes))
+                    else:
+                        salida.completar(
+                            row, f"❌ No se encontró información relevante ({contador}).", "No se encontraron enlaces relevantes"
+                        )
+                contador += 1
+                self.informar(f"✔️ Resultado para {url} ({contador - 1})")
+
+        for resultado in self._pipeline(analizar).procesar(trabajos()):
+            row = resultado.clave
+            url = urls[row]
+
+            if not es_url_valida(url):
+                urls.pop(row)
+                salida.completar(row, "URL inválida o vacía", "No se encontraron enlaces relevantes")
+            elif resultado.url and not resultado.error and self.resumidor:
+                fragmentos = self.selector.seleccionar(resultado.analisis, self.consulta)
+                pendientes[self.resumidor.enviar(fragmentos, self.consulta, resultado.url)] = row
+            elif resultado.url and not resultado.error:
+                enlaces = resultado.analisis  # Solo los enlaces relevantes
+                pendientes[self.buscar_con_ia(enlaces)] = row
+            else:
+                urls.pop(row)
+                salida.completar(row, "Error al acceder", "Error al acceder", reintentar=True)
+                self.informar(f"❌ Error al acceder a {url}")
+            escribir_clasificadas()
+
+        escribir_clasificadas(esperar=True)
+
+    def resumen(self):
+        lineas = []
+        if self.resumidor:
+            lineas.append(self.selector.resumen())
+            lineas.append(self.resumidor.resumen())
+        else:
+            lineas.append(self.clasificador.estadisticas.resumen())
+            if self.prefiltro:
+                lineas.append(self.prefiltro.resumen())
+        if hasattr(self.llm, "resumen"):
+            lineas.append(self.llm.resumen())
+        return lineas
+
+
+class ProcesoIAAlternativas(ProcesoIA):
+    """
+    Como `ProcesoIA`, pero busca en DuckDuckGo el sitio de las empresas cuya URL falta, no existe o no responde.
+
+    Args:
+        resolutor_empresas (ResolutorEmpresas): Búsquedas cacheadas y concurrentes por razón social.
+        columna_empresa (str): Columna con la razón social.
+        **opciones: Argumentos de `ProcesoIA` (sin `resumidor`).
+    """
+
+    nombre = "IA con alternativas"
+    columnas = ["Resultado", "Enlaces Relevantes", "URL Alternativa"]
+
+    def __init__(self, motor, clasificador, resolutor_empresas, columna_empresa="RAZON_SOCIAL", **opciones):
+        super().__init__(motor, clasificador, **opciones)
+        self.resolutor_empresas = resolutor_empresas
+        self.columna_empresa = columna_empresa
+
+    def parametros(self):
+        return (self.nombre, self.columna, self.columna_empresa, self.consulta)
+
+    def columnas_entrada(self):
+        return [self.columna, self.columna_empresa]
+
+    def generar_url_alternativa(self, empresa):
+        """
+        Obtiene la URL del sitio oficial de la empresa utilizando DuckDuckGo.
+
+        La búsqueda pasa por el resolutor de empresas: las razones sociales ya
+        buscadas (en esta ejecución o en anteriores) no se vuelven a buscar.
+
+        Args:
+            empresa (str): Nombre o razón social de la empresa.
+
+        Returns:
+            str: Primera URL relevante encontrada o None si no hay resultados.
+        """
+        return self.resolutor_empresas.resolver(empresa)
+
+    def buscar_alternativa(self, row, empresa, reintentos, urls, urls_alternativas):
+        """
+        Lanza en segundo plano la búsqueda de una URL alternativa con DuckDuckGo.
+
+        Cuando termina, el trabajo de la fila vuelve a la cola `reintentos`:
+        con la URL alternativa si se encontró y sin candidatas si no, para que
+        el pipeline la devuelva enseguida como fallida.
+
+        Args:
+            row (int): Fila cuya URL no existe, no es válida o no respondió.
+            empresa (str): Razón social.
+            reintentos (queue.Queue): Trabajos (fila, candidatas) para el pipeline.
+            urls (dict): Fila -> URL a descargar (se actualiza con la alternativa o None).
+            urls_alternativas (dict): Fila -> URL alternativa para la columna "URL Alternativa" (se actualiza).
+        """
+        def encolar(futuro):
+            try:
+                url_alternativa = futuro.result()
+            except Exception as e:
+                logging.error(f"Error al buscar URL alternativa para {empresa!r}: {e}")
+                url_alternativa = None
+            if url_alternativa:
+                logging.info(f"🔄 URL alternativa encontrada para {empresa}: {url_alternativa}. Reintentando acceso.")
+                urls_alternativas[row] = url_alternativa
+                urls[row] = url_alternativa
+                reintentos.put((row, [url_alternativa]))
+            else:
+                logging.error(f"❌ No se pudo generar una URL alternativa para la empresa {empresa}.")
+                urls[row] = None
+                reintentos.put((row, []))
+
+        self.resolutor_empresas.enviar(empresa).add_done_callback(encolar)
+
+    def _procesar(self, lector, salida, columna, columna_empresa):
+        # Solo se guardan en memoria la URL y la razón social de las filas en curso;
+        # el resto de columnas pasa directamente al Excel de salida
+        urls = {}
+        empresas = {}
+        urls_alternativas = {}
+        con_alternativa = set()
+        # Las filas con la URL inválida, o cuya descarga falla, vuelven al pipeline con su alternativa
+        reintentos = queue.Queue()
+        fin = object()
+        cerrojo = threading.Lock()
+        en_curso = 0  # Filas leídas cuya descarga (o la de su alternativa) aún no ha terminado
+        leido = False
+
+        def alternativa(row):
+            con_alternativa.add(row)
+            self.buscar_alternativa(row, empresas[row], reintentos, urls, urls_alternativas)
+
+        def pendientes_de_reintento():
+            while True:
+                try:
+                    trabajo = reintentos.get_nowait()
+                except queue.Empty:
+                    return
+                if trabajo is fin:
+                    return
+                yield trabajo
+
+        def trabajos():
+            """Lee el Excel fila a fila intercalando las alternativas que ya están listas."""
+            nonlocal en_curso, leido
+            for row, valores in lector.filas():
+                yield from pendientes_de_reintento()
+                if salida.original(row, valores):
+                    continue
+                with cerrojo:
+                    en_curso += 1
+                urls[row] = valores[columna]
+                empresas[row] = valores[columna_empresa]
+                if es_url_valida(urls[row]):
+                    yield row, candidatos_url(urls[row])
+                else:
+                    alternativa(row)  # La búsqueda empieza ya, en segundo plano
+
+            with cerrojo:
+                leido = True
+                terminado = not en_curso
+            # Las últimas alternativas llegan después de leer todo el Excel
+            while not terminado and (trabajo := reintentos.get()) is not fin:
+                yield trabajo
+
+        def descarga_terminada(row):
+            nonlocal en_curso
+            with cerrojo:
+                en_curso -= 1
+                if leido and not en_curso:
+                    reintentos.put(fin)
+
+        # Descarga asíncrona -> extracción de enlaces en procesos -> IA y escritura aquí
+        analizar = partial(analizar_enlaces, palabras=self.palabras, backend=self.backend, con_texto=True)
+        log_count = 1
+        # Las respuestas de la IA llegan en segundo plano: cada fila se escribe cuando termina la suya
+        pendientes = {}
+
+        def escribir_clasificadas(esperar=False):
+            nonlocal log_count
+            terminadas = as_completed(list(pendientes)) if esperar else [futuro for futuro in list(pendientes) if futuro.done()]
+            for futuro in terminadas:
+                row, url = pendientes.pop(futuro)
+                url_alternativa = urls_alternativas.pop(row, None)
+                empresas.pop(row)
+                urls.pop(row)
+                if futuro.exception():
+                    error = futuro.exception()
+                    salida.completar(row, "❌ Error en la IA.", str(error), url_alternativa, reintentar=True)
+                    self.informar(f"{log_count}. {url}: ❌ Error en la IA: {error}")
+                elif enlaces_relevantes := futuro.result():
+                    salida.completar(row, "✔️ Enlaces relevantes encontrados.", ", ".join(enlaces_relevantes), url_alternativa)
+                    self.informar(f"{log_count}. {url}: ✔️ Enlaces relevantes encontrados | {', '.join(enlaces_relevantes)}")
+                else:
+                    salida.completar(
+                        row, "ℹ️ No se encontró información relevante.", "ℹ️ No se encontraron enlaces relevantes", url_alternativa
+                    )
+                    self.informar(f"{log_count}. {url}: ℹ️ No se encontró información relevante")
+                log_count += 1
+
+        try:
+            for resultado in self._pipeline(analizar).procesar(trabajos()):
+                row = resultado.clave
+                if resultado.url and not resultado.error:
+                    if row in urls_alternativas:
+                        self.informar(f"{row - 1}. 🔄 URL alternativa generada para {empresas[row]}: {urls_alternativas[row]}")
+                    # Cada fila descargada va a la IA en cuanto llega; el despachador respeta los límites de la cuenta
+                    pendientes[self.buscar_con_ia(resultado.analisis)] = row, resultado.url
+                    descarga_terminada(row)
+                elif not resultado.url and row not in con_alternativa:
+                    # El dominio no existe o no respondió: segunda oportunidad con DuckDuckGo
+                    logging.info(f"❌ Error al acceder a la URL original {urls[row]}. Intentando obtener una alternativa desde DuckDuckGo.")
+                    alternativa(row)
+                else:
+                    empresa = empresas.pop(row)
+                    url_verificada = urls.pop(row)
+                    url_alternativa = urls_alternativas.pop(row, None)
+                    if resultado.url and resultado.error:
+                        # La página se descargó pero no se pudo analizar: no es un error de acceso
+                        salida.completar(row, "❌ Error al analizar la página.", resultado.error, url_alternativa)
+                        self.informar(f"{log_count}. {resultado.url}: ❌ {resultado.error}")
+                    elif not url_verificada:
+                        # Cuando no se pudo verificar la URL ni encontrar alternativa
+                        salida.completar(
+                            row, "❌ No se pudo verificar o generar URL.", "No se encontraron enlaces relevantes",
+                            "No se generó URL alternativa",
+                        )
+                        self.informar(f"{log_count}. {empresa}: ❌ No se pudo verificar o generar URL.")
+                    else:
+                        # Cuando la URL alternativa tampoco se puede acceder
+                        salida.completar(row, None, None, url_alternativa, reintentar=True)
+                        self.informar(f"{log_count}. {url_verificada}: ❌ Error al acceder incluso con alternativa")
+                    log_count += 1
+                    descarga_terminada(row)
+                escribir_clasificadas()
+        finally:
+            reintentos.put(fin)  # Si se detiene antes de tiempo, la lectura no se queda esperando alternativas
+
+        escribir_clasificadas(esperar=True)
+
+    def resumen(self):
+        return [
+            self.motor.transporte.resolutor.resumen(),
+            self.resolutor_empresas.resumen(),
+            self.clasificador.estadisticas.resumen(),
+            *([self.prefiltro.resumen()] if self.prefiltro else []),
+            *([self.llm.resumen()] if hasattr(self.llm, "resumen") else []),
+        ]
@@ -0,0 +1,156 @@
+"""Rastreo acotado de un sitio en busca de páginas más allá de la portada."""
+import asyncio
+import heapq
+import itertools
+import logging
+from functools import partial
+from urllib.parse import urlsplit
+
+from webscraper_gpt.cache import normalizar_url
+from webscraper_gpt.pipeline import ResultadoPipeline
+from webscraper_gpt.planificador import host_de
+from webscraper_gpt.tareas import analizar_con_enlaces
+
+# Enlaces que no llevan a páginas HTML: ni se descargan
+_EXTENSIONES_IGNORADAS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".rar",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".mp3", ".mp4", ".avi",
+)
+
+
+def sitio_de(url):
+    """Host sin "www." para comparar si dos URLs son del mismo sitio."""
+    host = host_de(url)
+    return host[4:] if host.startswith("www.") else host
+
+
+def mismo_sitio(url, sitio):
+    """Si la URL es del sitio o de uno de sus subdominios."""
+    host = sitio_de(url)
+    return host == sitio or host.endswith("." + sitio)
+
+
+class Rastreador:
+    """
+    Sigue los enlaces del mismo sitio empezando por los que más prometen.
+
+    La frontera es un montículo ordenado por la puntuación del enlace
+    (palabras clave y páginas legales o corporativas, ver
+    `puntuar_enlaces`) y por profundidad; las URLs ya vistas se descartan
+    normalizadas. Se visitan como mucho `max_paginas` páginas por sitio, a
+    `max_profundidad` clics de la portada y `paralelas` a la vez, con el
+    motor y los límites del lote, así que rastrear más hondo no multiplica
+    el tiempo total. El rastreo termina en cuanto una página da un
+    resultado que cumple `es_hallazgo`.
+    """
+
+    def __init__(self, motor, palabras, max_profundidad=2, max_paginas=10, paralelas=3, backend="auto", es_hallazgo=bool):
+        self.motor = motor
+        self.palabras = tuple(palabras)
+        self.max_profundidad = max_profundidad
+        self.max_paginas = max_paginas
+        self.paralelas = paralelas
+        self.backend = backend
+        self.es_hallazgo = es_hallazgo
+
+    async def visitar(self, url, respuesta, analizar, pool, semaforo, planificador, crear_detector=None):
+        """Descarga (si hace falta) y analiza una página; devuelve (url, análisis, enlaces) o None."""
+        if respuesta is None:
+            respuesta = await self.motor.descargar([url], semaforo, planificador, crear_detector)
+            if respuesta is None:
+                return None
+        funcion = partial(analizar_con_enlaces, analizar=analizar, palabras=self.palabras, backend=self.backend)
+        analisis, enlaces = await asyncio.get_running_loop().run_in_executor(
+            pool, funcion, respuesta.contenido, respuesta.url, respuesta.codificacion
+        )
+        return respuesta.url, analisis, enlaces
+
+    async def rastrear(self, clave, candidatos, analizar, pool, semaforo, planificador, crear_detector=None,
+                       raiz=None, robots=None, pagina_raiz=None):
+        """
+        Rastrea el sitio de un trabajo del pipeline.
+
+        Args:
+            clave (object): Clave del trabajo.
+            candidatos (list): URLs candidatas de la portada.
+            analizar (callable): Análisis de cada página, el mismo del pipeline.
+            pool (Executor): Pool de procesos de análisis.
+            semaforo, planificador: Límites de descarga del lote.
+            crear_detector (callable): Detector para cortar la lectura, como en el motor.
+            raiz (Respuesta): Portada ya descargada, si la hay.
+            robots (RobotFileParser): Reglas del sitio; los enlaces prohibidos no se siguen.
+            pagina_raiz (tuple): Lo que devolvió `visitar` para la portada, si ya se analizó.
+
+        Returns:
+            ResultadoPipeline: El de la primera página que es un hallazgo o, si
+            no hay ninguna, el de la portada.
+        """
+        raiz = raiz or await self.motor.descargar(candidatos, semaforo, planificador, crear_detector)
+        if raiz is None:
+            return ResultadoPipeline(clave, error="Error al acceder")
+
+        sitio = sitio_de(raiz.url)
+        vistas = {normalizar_url(raiz.url)}
+        frontera = []
+        orden = itertools.count()
+        visitadas = 1
+        portada = None
+        visitar = partial(
+            self.visitar,
+            analizar=analizar,
+            pool=pool,
+            semaforo=semaforo,
+            planificador=planificador,
+            crear_detector=crear_detector,
+        )
+        if pagina_raiz is None:
+            primera = asyncio.ensure_future(visitar(raiz.url, raiz))
+        else:
+            primera = asyncio.get_running_loop().create_future()
+            primera.set_result(pagina_raiz)
+        pendientes = {primera: 0}
+
+        try:
+            while pendientes:
+                hechas, _ = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in hechas:
+                    profundidad = pendientes.pop(tarea)
+                    try:
+                        pagina = tarea.result()
+                    except Exception as e:
+                        logging.error(f"Error al analizar una página de {raiz.url}: {e!r}")
+                        if portada is None:
+                            return ResultadoPipeline(clave, raiz.url, error=f"Error al analizar: {e}")
+                        continue
+                    if pagina is None:
+                        continue
+
+                    url, analisis, enlaces = pagina
+                    resultado = ResultadoPipeline(clave, url, analisis)
+                    portada = portada or resultado
+                    if self.es_hallazgo(analisis):
+                        return resultado
+
+                    if profundidad < self.max_profundidad:
+                        for puntuacion, enlace in enlaces:
+                            # Los enlaces mal formados no son del sitio: se descartan antes de normalizarlos
+                            if not mismo_sitio(enlace, sitio):
+                                continue
+                            normalizada = normalizar_url(enlace)
+                            if (
+                                normalizada in vistas
+                                or urlsplit(enlace).path.lower().endswith(_EXTENSIONES_IGNORADAS)
+                                or (robots and not robots.can_fetch(self.motor.config.headers.get("User-Agent", "*"), enlace))
+                            ):
+                                continue
+                            vistas.add(normalizada)
+                            heapq.heappush(frontera, (-puntuacion, profundidad + 1, next(orden), enlace))
+
+                while frontera and len(pendientes) < self.paralelas and visitadas < self.max_paginas:
+                    _, profundidad, _, enlace = heapq.heappop(frontera)
+                    visitadas += 1
+                    pendientes[asyncio.ensure_future(visitar(enlace, None))] = profundidad
+            return portada
+        finally:
+            for tarea in pendientes:
+                tarea.cancel()
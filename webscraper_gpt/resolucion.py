@@ -0,0 +1,163 @@
+"""Resolución DNS asíncrona con caché, también de los dominios que no existen."""
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+
+from aiohttp.abc import AbstractResolver
+
+try:
+    import aiodns  # opcional, resuelve sin ocupar hilos
+except ImportError:
+    aiodns = None
+
+# Errores que significan que el dominio no existe (no que el DNS haya fallado)
+_NO_EXISTE_GETADDRINFO = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+_NO_EXISTE_ARES = {1, 4}  # ARES_ENODATA, ARES_ENOTFOUND
+
+
+class ResolutorDNS:
+    """
+    Resuelve nombres de host en el bucle del transporte y recuerda la respuesta.
+
+    Muchas URLs de las exportaciones antiguas del CRM apuntan a dominios que
+    ya no existen: la respuesta negativa (NXDOMAIN o sin registros) se guarda
+    `ttl_negativo` segundos para no volver a preguntar, y las positivas
+    `ttl` segundos. Los fallos pasajeros (tiempo agotado, SERVFAIL) no se
+    guardan y devuelven None: la descarga lo intenta igualmente. Las
+    consultas simultáneas del mismo host comparten una sola petición.
+
+    Usa `aiodns` si está instalado y, si no, `getaddrinfo` del bucle.
+    """
+
+    def __init__(self, ttl=300, ttl_negativo=3600, timeout=3, max_paralelas=100, max_entradas=100_000):
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.timeout = timeout
+        self.max_paralelas = max_paralelas
+        self.max_entradas = max_entradas
+        self._cache = {}
+        self._en_curso = {}
+        self._aiodns = None
+        self._semaforo = None
+        self.consultas = 0
+        self.aciertos = 0
+        self.inexistentes = 0
+        self.fallos = 0
+
+    async def _consultar_aiodns(self, host):
+        if self._aiodns is None:
+            self._aiodns = aiodns.DNSResolver(timeout=self.timeout, tries=2)
+        direcciones = []
+        for familia in (socket.AF_INET, socket.AF_INET6):
+            try:
+                respuesta = await self._aiodns.gethostbyname(host, familia)
+            except aiodns.error.DNSError as e:
+                if e.args and e.args[0] in _NO_EXISTE_ARES:
+                    continue
+                raise
+            direcciones += [(familia, direccion) for direccion in respuesta.addresses]
+        return direcciones
+
+    async def _consultar_getaddrinfo(self, host):
+        try:
+            informacion = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno in _NO_EXISTE_GETADDRINFO:
+                return []
+            raise
+        return list(dict.fromkeys((familia, direccion[0]) for familia, _, _, _, direccion in informacion))
+
+    async def _consultar(self, host):
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_paralelas)
+        consultar = self._consultar_aiodns if aiodns else self._consultar_getaddrinfo
+        self.consultas += 1
+        try:
+            async with self._semaforo:
+                direcciones = await asyncio.wait_for(consultar(host), self.timeout * 2)
+        except Exception as e:
+            self.fallos += 1
+            logging.warning(f"DNS sin respuesta para {host}: {e!r}")
+            return None
+
+        if len(self._cache) >= self.max_entradas:
+            self._cache.clear()
+        if direcciones:
+            self._cache[host] = (time.monotonic() + self.ttl, tuple(direcciones))
+        else:
+            self.inexistentes += 1
+            logging.info(f"El dominio {host} no existe: se omite la descarga")
+            self._cache[host] = (time.monotonic() + self.ttl_negativo, ())
+        return tuple(direcciones)
+
+    async def resolver(self, host):
+        """
+        Direcciones de un host.
+
+        Args:
+            host (str): Nombre de host o IP.
+
+        Returns:
+            tuple: Pares (familia, IP); vacía si el dominio no existe y None si
+            el DNS no respondió.
+        """
+        host = (host or "").lower().rstrip(".")
+        if not host:
+            return ()
+        try:
+            ip = ipaddress.ip_address(host)
+            return ((socket.AF_INET6 if ip.version == 6 else socket.AF_INET, host),)
+        except ValueError:
+            pass
+
+        entrada = self._cache.get(host)
+        if entrada and entrada[0] > time.monotonic():
+            self.aciertos += 1
+            return entrada[1]
+        if host not in self._en_curso:
+            tarea = asyncio.ensure_future(self._consultar(host))
+            self._en_curso[host] = tarea
+            tarea.add_done_callback(lambda _: self._en_curso.pop(host, None))
+        return await asyncio.shield(self._en_curso[host])
+
+    async def existe(self, host):
+        """Si el host resuelve; en caso de duda (DNS sin respuesta) se supone que sí."""
+        return await self.resolver(host) != ()
+
+    def resumen(self):
+        return (
+            f"DNS: {self.consultas} consultas, {self.aciertos} respuestas desde la caché, "
+            f"{self.inexistentes} dominios inexistentes, {self.fallos} sin respuesta."
+        )
+
+
+class ResolutorAiohttp(AbstractResolver):
+    """Adaptador para que el conector de aiohttp use la caché de `ResolutorDNS`."""
+
+    def __init__(self, resolutor):
+        self.resolutor = resolutor
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        direcciones = await self.resolutor.resolver(host)
+        if direcciones is None:
+            raise OSError(f"DNS sin respuesta para {host}")
+        resultado = [
+            {
+                "hostname": host,
+                "host": ip,
+                "port": port,
+                "family": familia,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+            for familia, ip in direcciones
+            if family in (socket.AF_UNSPEC, familia)
+        ]
+        if not resultado:
+            raise OSError(f"El dominio {host} no existe")
+        return resultado
+
+    async def close(self):
+        pass
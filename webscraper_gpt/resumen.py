@@ -0,0 +1,147 @@
+"""Resumen map-reduce de los fragmentos de una página con el LLM."""
+import re
+from dataclasses import dataclass
+
+from webscraper_gpt.despachador import combinar, encadenar, enviar_a, estimar_tokens, futuro_resuelto
+
+PLANTILLA_MAPA = """Lee el siguiente fragmento de la página {url}:
+\"\"\"{fragmento}\"\"\"
+La consulta es: "{consulta}".
+Si el fragmento contiene información relacionada con la consulta, resúmela en pocas frases e incluye los enlaces útiles que aparezcan.
+Si no contiene nada relacionado, responde únicamente: {marca}
+"""
+
+PLANTILLA_REDUCCION = """Estos son extractos de la página {url} relacionados con la consulta "{consulta}":
+
+{extractos}
+
+Responde exactamente con dos líneas:
+VEREDICTO: sí o no, según si la página contiene información relacionada con la consulta
+RESUMEN: la información más relevante y los enlaces útiles, en un máximo de 1000 caracteres
+"""
+
+SIN_INFORMACION = "No se encontró información relevante relacionada con la consulta"
+
+# Respuesta fija que el mapa pide para un fragmento sin nada relacionado. Solo se descarta
+# esta marca: una respuesta libre como "No hay un canal..., pero sí un buzón ético" es un hallazgo
+MARCA_VACIO = "SIN_INFORMACION"
+_NEGATIVA = re.compile(rf"^\W*{MARCA_VACIO}\W*$", re.IGNORECASE)
+_VEREDICTO = re.compile(r"VEREDICTO\s*:\s*(s[ií]|no)\b", re.IGNORECASE)
+_RESUMEN = re.compile(r"RESUMEN\s*:\s*(.*)", re.IGNORECASE | re.DOTALL)
+
+
+@dataclass(frozen=True)
+class ConfiguracionResumen:
+    """Tamaño de los fragmentos y presupuesto de tokens de cada fila."""
+    tam_fragmento: int = 800
+    solape: int = 80
+    max_fragmentos: int = 4
+    max_tokens_fila: int = 6000
+    max_tokens_mapa: int = 150
+    max_tokens_reduccion: int = 300
+
+
+@dataclass
+class ResumenPagina:
+    """Veredicto y resumen final de una página."""
+    relevante: bool
+    resumen: str
+
+
+def es_negativa(respuesta):
+    """Si la respuesta de un fragmento está vacía o es la marca `MARCA_VACIO`."""
+    return not respuesta.strip() or bool(_NEGATIVA.match(respuesta.strip()))
+
+
+class ResumidorMapReduce:
+    """
+    Resume una página en dos fases.
+
+    1. Mapa: cada fragmento se envía al LLM a la vez que los demás; las
+       respuestas con la marca `MARCA_VACIO` se descartan sin más.
+    2. Reducción: una única llamada recibe los extractos positivos y devuelve
+       el veredicto y el resumen de la fila. Con un solo extracto positivo
+       no hace falta: se usa tal cual.
+
+    Los fragmentos que no caben en `max_tokens_fila` (contando la reducción)
+    no se envían.
+    """
+
+    def __init__(self, llm, config=None):
+        self.llm = llm
+        self.config = config or ConfiguracionResumen()
+        self.llamadas = 0
+        self.tokens = 0
+        self.descartados = 0
+
+    def _presupuesto(self, fragmentos, consulta, url):
+        """Prompts del mapa que caben en el presupuesto de la fila, reservando la reducción."""
+        config = self.config
+        reduccion = estimar_tokens(PLANTILLA_REDUCCION.format(url=url, consulta=consulta, extractos="")) + config.max_tokens_reduccion
+        prompts, gastado = [], 0
+        for fragmento in fragmentos[:config.max_fragmentos]:
+            prompt = PLANTILLA_MAPA.format(url=url, fragmento=fragmento, consulta=consulta, marca=MARCA_VACIO)
+            coste = estimar_tokens(prompt) + config.max_tokens_mapa
+            # Cada extracto positivo también entra en el prompt de la reducción
+            if gastado + coste + reduccion + config.max_tokens_mapa > config.max_tokens_fila:
+                break
+            prompts.append(prompt)
+            gastado += coste
+            reduccion += config.max_tokens_mapa
+        return prompts
+
+    def _llamar(self, prompt, max_tokens):
+        self.llamadas += 1
+        self.tokens += estimar_tokens(prompt) + max_tokens
+        return enviar_a(self.llm, prompt, max_tokens)
+
+    def _reducir(self, respuestas, consulta, url):
+        extractos = [respuesta.strip() for respuesta in respuestas if not es_negativa(respuesta)]
+        self.descartados += len(respuestas) - len(extractos)
+        if not extractos:
+            return futuro_resuelto(ResumenPagina(False, SIN_INFORMACION))
+        if len(extractos) == 1:
+            return futuro_resuelto(ResumenPagina(True, extractos[0]))
+
+        prompt = PLANTILLA_REDUCCION.format(
+            url=url,
+            consulta=consulta,
+            extractos="\n\n".join(f"- {extracto}" for extracto in extractos),
+        )
+        return combinar([self._llamar(prompt, self.config.max_tokens_reduccion)], lambda respuestas: self._interpretar(respuestas[0]))
+
+    @staticmethod
+    def _interpretar(respuesta):
+        veredicto = _VEREDICTO.search(respuesta)
+        resumen = _RESUMEN.search(respuesta)
+        texto = resumen.group(1).strip() if resumen else respuesta.strip()
+        relevante = not veredicto.group(1).lower().startswith("n") if veredicto else not es_negativa(texto)
+        return ResumenPagina(relevante, texto if relevante else SIN_INFORMACION)
+
+    def enviar(self, fragmentos, consulta, url):
+        """
+        Lanza el resumen de una página sin esperar a las respuestas.
+
+        Args:
+            fragmentos (list): Fragmentos de la página, ya seleccionados.
+            consulta (str): Lo que el usuario quiere encontrar.
+            url (str): URL de la página, para el prompt.
+
+        Returns:
+            concurrent.futures.Future: Se completa con un ResumenPagina.
+        """
+        prompts = self._presupuesto(list(fragmentos), consulta, url)
+        if not prompts:
+            return futuro_resuelto(ResumenPagina(False, SIN_INFORMACION))
+        mapa = combinar([self._llamar(prompt, self.config.max_tokens_mapa) for prompt in prompts], list)
+        return encadenar(mapa, lambda respuestas: self._reducir(respuestas, consulta, url))
+
+    def resumir(self, fragmentos, consulta, url):
+        """Como `enviar`, pero espera y devuelve el ResumenPagina."""
+        return self.enviar(fragmentos, consulta, url).result()
+
+    def resumen(self):
+        return (
+            f"Resumen map-reduce: {self.llamadas} llamadas al LLM, ~{self.tokens} tokens estimados, "
+            f"{self.descartados} fragmentos sin información descartados antes de la reducción."
+        )
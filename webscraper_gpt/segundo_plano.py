@@ -0,0 +1,236 @@
+"""Ejecución de procesos en segundo plano con un estado de progreso compacto."""
+import bisect
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from webscraper_gpt.procesamiento import Cancelado
+
+# Estados de un trabajo
+EN_COLA = "en cola"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+CANCELADO = "cancelado"
+FALLIDO = "error"
+
+
+class Progreso:
+    """
+    Contadores de un trabajo, actualizados por el hilo que lo ejecuta.
+
+    Solo guarda lo necesario para pintar el estado: totales, los últimos
+    errores y mensajes (en colas acotadas) y una fila por resultado para la
+    tabla paginada. Los resultados se guardan por fila junto con la lista
+    ordenada de filas (y la de filas con error), así que pintar una página
+    no recorre ni ordena todos los resultados.
+    """
+
+    def __init__(self, max_errores=20, max_mensajes=50):
+        self.total = None
+        self.procesadas = 0
+        self.reanudadas = 0
+        self.errores = 0
+        self.inicio = None
+        self.fin = None
+        self.ultimos_errores = deque(maxlen=max_errores)
+        self.mensajes = deque(maxlen=max_mensajes)
+        self.resultados = {}
+        self._filas = []
+        self._filas_error = []
+        self.detener = threading.Event()
+        self._cerrojo = threading.Lock()
+
+    def empezar(self, total=None):
+        self.total = total
+        self.inicio = time.monotonic()
+
+    def reanudada(self, fila, valores):
+        """Fila copiada del diario, sin procesar."""
+        with self._cerrojo:
+            self.reanudadas += 1
+            self._anotar(fila, valores, False)
+
+    def fila(self, fila, valores, error=False):
+        """Fila procesada en este trabajo; `error` si falló la descarga o la IA."""
+        with self._cerrojo:
+            self.procesadas += 1
+            self._anotar(fila, valores, error)
+            if error:
+                self.errores += 1
+                self.ultimos_errores.append(f"Fila {fila}: " + " | ".join(str(valor) for valor in valores if valor))
+
+    def _anotar(self, fila, valores, error):
+        # Las filas llegan casi en orden: insertar en la lista ordenada es casi siempre añadir al final
+        anterior = self.resultados.get(fila)
+        if anterior is None:
+            bisect.insort(self._filas, fila)
+        if error and not (anterior and anterior[1]):
+            bisect.insort(self._filas_error, fila)
+        elif not error and anterior and anterior[1]:
+            self._filas_error.remove(fila)
+        self.resultados[fila] = (tuple(valores), error)
+
+    def mensaje(self, texto):
+        self.mensajes.append(texto)
+
+    def cancelar(self):
+        """Pide parar: el trabajo se detiene al escribir la siguiente fila."""
+        self.detener.set()
+
+    @property
+    def hechas(self):
+        return self.procesadas + self.reanudadas
+
+    @property
+    def transcurrido(self):
+        if self.inicio is None:
+            return 0.0
+        return (self.fin or time.monotonic()) - self.inicio
+
+    @property
+    def velocidad(self):
+        """Filas procesadas por segundo (sin contar las reanudadas)."""
+        return self.procesadas / self.transcurrido if self.transcurrido else 0.0
+
+    @property
+    def eta(self):
+        """Segundos estimados hasta terminar, o None si aún no se puede estimar."""
+        if not self.total or not self.velocidad or self.fin is not None:
+            return None
+        return max(self.total - self.hechas, 0) / self.velocidad
+
+    @property
+    def fraccion(self):
+        return min(self.hechas / self.total, 1.0) if self.total else 0.0
+
+    def pagina(self, numero, tam=100, solo_errores=False):
+        """
+        Resultados de una página de la tabla, ordenados por fila.
+
+        Args:
+            numero (int): Página, empezando en 1.
+            tam (int): Filas por página.
+            solo_errores (bool): Mostrar solo las filas en las que falló la descarga o la IA.
+
+        Returns:
+            tuple: (lista de (fila, valores, error), número total de páginas).
+        """
+        with self._cerrojo:
+            filas = self._filas_error if solo_errores else self._filas
+            paginas = max((len(filas) + tam - 1) // tam, 1)
+            numero = min(max(numero, 1), paginas)
+            return [(fila, *self.resultados[fila]) for fila in filas[(numero - 1) * tam:numero * tam]], paginas
+
+
+class TrabajoFondo:
+    """Un proceso lanzado en segundo plano sobre una copia en memoria del Excel subido."""
+
+    def __init__(self, proceso, contenido, ejecucion=None, descripcion=""):
+        self.id = uuid.uuid4().hex[:8]
+        self.proceso = proceso
+        self.ejecucion = ejecucion
+        self.descripcion = descripcion
+        self.progreso = Progreso()
+        self.estado = EN_COLA
+        self.error = None
+        self.ruta_salida = None
+        self.resumen = []
+        self.creado = time.time()
+        self._contenido = contenido
+        # Los mensajes de cada fila van al progreso, no a la página
+        proceso.informar = self.progreso.mensaje
+
+    @property
+    def activo(self):
+        return self.estado in (EN_COLA, EJECUTANDO)
+
+    def ejecutar(self):
+        if self.progreso.detener.is_set():
+            # Cancelado mientras esperaba en la cola
+            self.estado = CANCELADO
+            self._contenido = None
+            return
+        self.estado = EJECUTANDO
+        try:
+            self.ruta_salida = self.proceso.ejecutar(io.BytesIO(self._contenido), self.ejecucion, progreso=self.progreso)
+            self.resumen = ([self.ejecucion.resumen()] if self.ejecucion else []) + self.proceso.resumen()
+            self.estado = TERMINADO
+        except Cancelado:
+            self.estado = CANCELADO
+        except Exception as e:
+            logging.exception(f"Error en el trabajo {self.id}")
+            self.error = str(e)
+            self.estado = FALLIDO
+        finally:
+            self.progreso.fin = time.monotonic()
+            self._contenido = None
+
+    def cancelar(self):
+        self.progreso.cancelar()
+
+    def borrar_salida(self):
+        if self.ruta_salida and os.path.exists(self.ruta_salida):
+            os.remove(self.ruta_salida)
+        self.ruta_salida = None
+
+
+class GestorTrabajos:
+    """
+    Trabajos del proceso, cada uno en su hilo y con un id para consultarlo.
+
+    Como mucho `max_simultaneos` se ejecutan a la vez (comparten el pool de
+    conexiones y el de procesos); el resto espera en cola. Los terminados se
+    olvidan, y se borra su Excel de salida, pasadas `retencion` segundos.
+    """
+
+    def __init__(self, max_simultaneos=2, retencion=24 * 3600):
+        self.retencion = retencion
+        self._trabajos = {}
+        self._semaforo = threading.Semaphore(max_simultaneos)
+        self._cerrojo = threading.Lock()
+
+    def lanzar(self, proceso, contenido, ejecucion=None, descripcion=""):
+        """
+        Lanza un proceso en segundo plano.
+
+        Args:
+            proceso (Proceso): Proceso ya configurado.
+            contenido (bytes): Excel de entrada; se copia porque el archivo subido no sobrevive a la sesión.
+            ejecucion (Ejecucion): Ejecución del diario.
+            descripcion (str): Texto para identificarlo en la interfaz.
+
+        Returns:
+            TrabajoFondo: El trabajo, ya en cola.
+        """
+        self.limpiar()
+        trabajo = TrabajoFondo(proceso, contenido, ejecucion, descripcion)
+        with self._cerrojo:
+            self._trabajos[trabajo.id] = trabajo
+
+        def ejecutar():
+            with self._semaforo:
+                trabajo.ejecutar()
+
+        threading.Thread(target=ejecutar, name=f"trabajo-{trabajo.id}", daemon=True).start()
+        return trabajo
+
+    def obtener(self, id_trabajo):
+        with self._cerrojo:
+            return self._trabajos.get(id_trabajo)
+
+    def trabajos(self):
+        """Todos los trabajos, del más reciente al más antiguo."""
+        with self._cerrojo:
+            return sorted(self._trabajos.values(), key=lambda trabajo: trabajo.creado, reverse=True)
+
+    def limpiar(self):
+        limite = time.time() - self.retencion
+        with self._cerrojo:
+            antiguos = [trabajo for trabajo in self._trabajos.values() if not trabajo.activo and trabajo.creado < limite]
+            for trabajo in antiguos:
+                trabajo.borrar_salida()
+                del self._trabajos[trabajo.id]
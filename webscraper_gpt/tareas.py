@@ -0,0 +1,91 @@
+"""
+Análisis de páginas que el pipeline ejecuta en sus procesos.
+
+Todas las funciones aceptan un `documento` ya extraído para no volver a
+analizar el HTML cuando otra etapa (el rastreo) ya lo hizo.
+"""
+from functools import lru_cache
+
+from webscraper_gpt.analisis import extraer_documento
+from webscraper_gpt.coincidencias import BuscadorPalabras, normalizar, obtener_enlaces_relevantes, puntuar_enlaces
+from webscraper_gpt.fragmentos import SelectorFragmentos, fragmentar
+
+
+@lru_cache(maxsize=8)
+def _buscador(palabras):
+    """Compila el buscador una sola vez por proceso y lista de palabras."""
+    return BuscadorPalabras(palabras)
+
+
+def analizar_palabras_clave(contenido, url, codificacion, palabras, backend="auto", documento=None):
+    """
+    Busca las palabras clave en el texto visible de la página.
+
+    Args:
+        contenido (bytes): HTML descargado.
+        url (str): URL final de la página.
+        codificacion (str): Charset de la cabecera Content-Type, si lo hay.
+        palabras (tuple): Palabras clave del usuario.
+        backend (str): Analizador HTML a usar.
+        documento (Documento): Texto y enlaces ya extraídos de `contenido`, si los hay.
+
+    Returns:
+        tuple: (palabra encontrada, enlace cuyo texto la contiene o None), o None si no hay ninguna.
+    """
+    buscador = _buscador(palabras)
+    documento = documento or extraer_documento(contenido, url, codificacion, backend)
+
+    # La palabra que aparece antes en la lista del usuario, como en la búsqueda original
+    coincidencia = buscador.preferida(buscador.buscar(documento.texto))
+    if not coincidencia:
+        return None
+    clave = normalizar(coincidencia.palabra)
+    enlace = next((href for texto, href in documento.enlaces if clave in normalizar(texto)), None)
+    return coincidencia.palabra, enlace
+
+
+def analizar_enlaces(contenido, url, codificacion, palabras, backend="auto", con_texto=False, documento=None):
+    """
+    Obtiene los enlaces de la página relacionados con las palabras clave.
+
+    Returns:
+        list: URLs de los enlaces relevantes, o pares (texto, URL) con `con_texto`.
+    """
+    documento = documento or extraer_documento(contenido, url, codificacion, backend)
+    return obtener_enlaces_relevantes(documento.enlaces, _buscador(palabras), con_texto)
+
+
+def analizar_fragmentos(contenido, url, codificacion, palabras, backend="auto", tam_fragmento=800, solape=80, mejores=4,
+                        documento=None, descartar_vacios=True):
+    """
+    Divide el texto visible de la página en fragmentos y elige los de más palabras clave.
+
+    Aquí no hay embeddings (el modelo o la API viven en el proceso
+    principal): con `descartar_vacios` a False se devuelven también
+    fragmentos sin palabras clave, para que el proceso principal los
+    vuelva a puntuar por similitud con la consulta.
+
+    Returns:
+        list: Como mucho `mejores` fragmentos, en el orden del texto.
+    """
+    documento = documento or extraer_documento(contenido, url, codificacion, backend)
+    selector = SelectorFragmentos(_buscador(palabras), mejores=mejores, descartar_vacios=descartar_vacios)
+    return selector.seleccionar(fragmentar(documento.texto, tam_fragmento, solape), "")
+
+
+def analizar_con_enlaces(contenido, url, codificacion, analizar, palabras, backend="auto"):
+    """
+    Análisis de una página durante el rastreo: el de la página más sus enlaces a seguir.
+
+    La página se extrae una sola vez y el mismo `Documento` se pasa a
+    `analizar` y sirve para puntuar los enlaces.
+
+    Args:
+        analizar (callable): Análisis de la página, como en el pipeline; debe aceptar `documento`.
+        palabras (tuple): Palabras clave para puntuar los enlaces.
+
+    Returns:
+        tuple: (resultado de `analizar`, lista de pares (puntuación, URL)).
+    """
+    documento = extraer_documento(contenido, url, codificacion, backend)
+    return analizar(contenido, url, codificacion, documento=documento), puntuar_enlaces(documento.enlaces, palabras)
@@ -0,0 +1,103 @@
+"""Transporte HTTP compartido por todas las páginas de una ejecución."""
+import asyncio
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+
+import aiohttp
+
+from webscraper_gpt.resolucion import ResolutorAiohttp, ResolutorDNS
+
+
+@dataclass(frozen=True)
+class ConfiguracionTransporte:
+    """Tamaño del pool de conexiones y tiempos de keep-alive."""
+    tam_pool: int = 100
+    tam_pool_por_host: int = 10
+    keepalive: float = 30
+    ttl_dns: int = 300
+    ttl_dns_negativo: int = 3600
+
+
+class Transporte:
+    """
+    Bucle asyncio en un hilo propio con una única sesión aiohttp.
+
+    Streamlit vuelve a ejecutar cada página en cada interacción, así que la
+    sesión no puede vivir dentro del script: vive aquí, y todas las descargas
+    reutilizan las mismas conexiones TCP/TLS mientras el proceso esté activo.
+    Lo mismo el `resolutor` DNS, que recuerda también los dominios inexistentes.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ConfiguracionTransporte()
+        self.resolutor = ResolutorDNS(ttl=self.config.ttl_dns, ttl_negativo=self.config.ttl_dns_negativo)
+        self._bucle = asyncio.new_event_loop()
+        self._hilo = threading.Thread(target=self._bucle.run_forever, name="transporte-http", daemon=True)
+        self._hilo.start()
+        self._sesion = self.ejecutar(self._crear_sesion())
+
+    async def _crear_sesion(self):
+        conector = aiohttp.TCPConnector(
+            limit=self.config.tam_pool,
+            limit_per_host=self.config.tam_pool_por_host,
+            keepalive_timeout=self.config.keepalive,
+            ttl_dns_cache=self.config.ttl_dns,
+            resolver=ResolutorAiohttp(self.resolutor),
+        )
+        return aiohttp.ClientSession(connector=conector)
+
+    @property
+    def sesion(self):
+        return self._sesion
+
+    @property
+    def bucle(self):
+        return self._bucle
+
+    def ejecutar(self, corrutina):
+        """Ejecuta una corrutina en el bucle del transporte y espera su resultado."""
+        return asyncio.run_coroutine_threadsafe(corrutina, self._bucle).result()
+
+    def cerrar(self):
+        """Cierra la sesión y detiene el bucle."""
+        if self._bucle.is_closed():
+            return
+        self.ejecutar(self._sesion.close())
+        self._bucle.call_soon_threadsafe(self._bucle.stop)
+        self._hilo.join()
+        self._bucle.close()
+
+
+_transportes = {}
+_cerrojo = threading.Lock()
+
+
+def obtener_transporte(config=None):
+    """
+    Devuelve el transporte del proceso para una configuración, creándolo la primera vez.
+
+    Hay uno por configuración y ninguno se cierra hasta que termina el
+    proceso: otras sesiones o trabajos en segundo plano pueden estar usando
+    el anterior, y los motores guardan una referencia al suyo.
+
+    Args:
+        config (ConfiguracionTransporte): Configuración deseada o None para la por defecto.
+
+    Returns:
+        Transporte: Transporte compartido.
+    """
+    config = config or ConfiguracionTransporte()
+    with _cerrojo:
+        if config not in _transportes:
+            if _transportes:
+                logging.info("Creando otro pool de conexiones para la nueva configuración.")
+            _transportes[config] = Transporte(config)
+        return _transportes[config]
+
+
+@atexit.register
+def _cerrar_transporte():
+    for transporte in _transportes.values():
+        transporte.cerrar()